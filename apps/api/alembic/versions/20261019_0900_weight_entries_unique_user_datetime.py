@@ -0,0 +1,74 @@
+"""weight_entries unique (user_id, datetime_utc)
+
+Revision ID: 20261019_0900
+Revises: 20260217_2030
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_0900"
+down_revision = "20260217_2030"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Rows that repeat a reading exactly (same user, instant, weight and note) carry
+    # nothing the earliest created copy doesn't: keep that one, drop the rest.
+    bind.execute(
+        sa.text(
+            """
+            DELETE FROM weight_entries w
+            USING weight_entries keep
+            WHERE w.user_id = keep.user_id
+              AND w.datetime_utc = keep.datetime_utc
+              AND w.weight_kg = keep.weight_kg
+              AND w.note IS NOT DISTINCT FROM keep.note
+              AND (w.created_at, w.id) > (keep.created_at, keep.id)
+            """
+        )
+    )
+
+    # Readings at the same instant that disagree are user data we can't choose
+    # between; leave them for the operator to resolve.
+    conflicts = bind.execute(
+        sa.text(
+            """
+            SELECT count(*) FROM (
+                SELECT 1 FROM weight_entries
+                GROUP BY user_id, datetime_utc
+                HAVING count(*) > 1
+            ) AS c
+            """
+        )
+    ).scalar_one()
+    if conflicts:
+        raise RuntimeError(
+            f"Refusing to add uq_weight_entries_user_datetime_utc: {conflicts} (user_id, datetime_utc) "
+            "pairs have weight entries with different weight_kg or note. Merge or delete them, then rerun."
+        )
+
+    # The unique constraint's index replaces the plain composite index.
+    op.drop_index("ix_weight_entries_user_id_datetime_utc", table_name="weight_entries")
+    op.create_unique_constraint(
+        "uq_weight_entries_user_datetime_utc",
+        "weight_entries",
+        ["user_id", "datetime_utc"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_weight_entries_user_datetime_utc", "weight_entries", type_="unique")
+    op.create_index(
+        "ix_weight_entries_user_id_datetime_utc",
+        "weight_entries",
+        ["user_id", "datetime_utc"],
+        unique=False,
+    )
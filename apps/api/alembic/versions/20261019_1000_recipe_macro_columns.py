@@ -0,0 +1,74 @@
+"""recipes: denormalized total / per-serving macro columns
+
+Revision ID: 20261019_1000
+Revises: 20261019_0900
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_1000"
+down_revision = "20261019_0900"
+branch_labels = None
+depends_on = None
+
+
+_MACRO_COLUMNS = (
+    "total_kcal",
+    "total_protein",
+    "total_carbs",
+    "total_fat",
+    "kcal_per_serving",
+    "protein_per_serving",
+    "carbs_per_serving",
+    "fat_per_serving",
+)
+
+
+def upgrade() -> None:
+    for name in _MACRO_COLUMNS:
+        op.add_column(
+            "recipes",
+            sa.Column(name, sa.Numeric(12, 2), nullable=False, server_default="0"),
+        )
+
+    # Backfill existing recipes. Foods are scoped to the recipe owner (global or
+    # owned), matching the runtime computation in crud.recipes.refresh_recipe_macros.
+    op.execute(
+        sa.text(
+            """
+            UPDATE recipes r
+            SET total_kcal = ROUND(agg.kcal, 2),
+                total_protein = ROUND(agg.protein, 2),
+                total_carbs = ROUND(agg.carbs, 2),
+                total_fat = ROUND(agg.fat, 2),
+                kcal_per_serving = ROUND(agg.kcal / r.servings, 2),
+                protein_per_serving = ROUND(agg.protein / r.servings, 2),
+                carbs_per_serving = ROUND(agg.carbs / r.servings, 2),
+                fat_per_serving = ROUND(agg.fat / r.servings, 2)
+            FROM (
+                SELECT ri.recipe_id,
+                       SUM(f.kcal_100g * ri.grams / 100) AS kcal,
+                       SUM(f.protein_100g * ri.grams / 100) AS protein,
+                       SUM(f.carbs_100g * ri.grams / 100) AS carbs,
+                       SUM(f.fat_100g * ri.grams / 100) AS fat
+                FROM recipe_items ri
+                JOIN recipes owner ON owner.id = ri.recipe_id
+                JOIN foods f
+                  ON f.id = ri.food_id
+                 AND (f.user_id IS NULL OR f.user_id = owner.user_id)
+                GROUP BY ri.recipe_id
+            ) agg
+            WHERE agg.recipe_id = r.id
+            """
+        )
+    )
+
+
+def downgrade() -> None:
+    for name in reversed(_MACRO_COLUMNS):
+        op.drop_column("recipes", name)
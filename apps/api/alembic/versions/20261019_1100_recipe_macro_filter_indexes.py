@@ -0,0 +1,46 @@
+"""recipes: protein density column + per-user macro filter indexes
+
+Revision ID: 20261019_1100
+Revises: 20261019_1000
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_1100"
+down_revision = "20261019_1000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "recipes",
+        sa.Column("protein_per_100kcal", sa.Numeric(12, 2), nullable=False, server_default="0"),
+    )
+    op.execute(
+        sa.text(
+            """
+            UPDATE recipes
+            SET protein_per_100kcal = CASE
+                WHEN total_kcal > 0 THEN ROUND(total_protein * 100 / total_kcal, 2)
+                ELSE 0
+            END
+            """
+        )
+    )
+
+    op.create_index("ix_recipes_user_protein_per_serving", "recipes", ["user_id", "protein_per_serving"])
+    op.create_index("ix_recipes_user_kcal_per_serving", "recipes", ["user_id", "kcal_per_serving"])
+    op.create_index("ix_recipes_user_protein_per_100kcal", "recipes", ["user_id", "protein_per_100kcal"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_recipes_user_protein_per_100kcal", table_name="recipes")
+    op.drop_index("ix_recipes_user_kcal_per_serving", table_name="recipes")
+    op.drop_index("ix_recipes_user_protein_per_serving", table_name="recipes")
+    op.drop_column("recipes", "protein_per_100kcal")
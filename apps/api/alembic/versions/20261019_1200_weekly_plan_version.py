@@ -0,0 +1,28 @@
+"""weekly_plans: version counter for derived-data caches
+
+Revision ID: 20261019_1200
+Revises: 20261019_1100
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_1200"
+down_revision = "20261019_1100"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "weekly_plans",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("weekly_plans", "version")
@@ -0,0 +1,25 @@
+"""weekly_plans: snapshot of the macro split a plan was generated with
+
+Revision ID: 20261019_1400
+Revises: 20261019_1300
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_1400"
+down_revision = "20261019_1300"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("weekly_plans", sa.Column("macro_split_json", sa.String(200), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("weekly_plans", "macro_split_json")
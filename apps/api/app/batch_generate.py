@@ -0,0 +1,225 @@
+"""Batch weekly-plan generation for every active user.
+
+Run from apps/api:
+
+    python -m app.batch_generate [--week-start 2026-10-26] [--chunk-size 500] [--workers 4]
+
+Active users are users with at least one recipe and a target in effect on the week's
+Monday (crud.targets.pick_active_user_target). Users are streamed in chunks by id
+(keyset pagination); for each chunk the recipes and targets of all its users are
+read with one query each, the solves are fanned out over a process pool, and the
+plans are written with one bulk INSERT per table and committed.
+
+Users that already have a plan for the week are skipped, so an interrupted run is
+resumed by simply running it again. Memory stays flat: nothing outlives its chunk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import functools
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.logging import get_logger
+from app.core.planner import PlanSolution, optimize_week
+from app.crud import plans as crud_plans
+from app.crud.targets import pick_active_user_target
+from app.models.recipe import Recipe
+from app.models.user import User
+from app.models.user_target import UserTarget
+from app.models.weekly_plan import WeeklyPlan
+from app.schemas.plans import GenerateWeeklyPlanRequest, MacroGrams
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+@dataclass
+class BatchStats:
+    users: int = 0
+    plans_created: int = 0
+    skipped: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def plans_per_second(self) -> float:
+        return self.plans_created / self.seconds if self.seconds else 0.0
+
+
+def _grams(value: Decimal) -> int:
+    return int(value.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+async def _next_user_ids(
+    *, session: AsyncSession, week_start: date, after: uuid.UUID | None, limit: int
+) -> list[uuid.UUID]:
+    stmt = (
+        select(User.id)
+        .where(
+            exists().where(Recipe.user_id == User.id),
+            exists().where(UserTarget.user_id == User.id),
+            ~exists().where(WeeklyPlan.user_id == User.id, WeeklyPlan.week_start == week_start),
+        )
+        .order_by(User.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(User.id > after)
+    res = await session.execute(stmt)
+    return list(res.scalars().all())
+
+
+async def _generate_chunk(
+    *, session: AsyncSession, user_ids: list[uuid.UUID], week_start: date, executor: Executor | None
+) -> tuple[int, int]:
+    """Generate and insert plans for `user_ids`; returns (created, skipped)."""
+
+    targets_by_user: dict[uuid.UUID, list[UserTarget]] = defaultdict(list)
+    res = await session.execute(
+        select(UserTarget).where(
+            UserTarget.user_id.in_(user_ids),
+            UserTarget.effective_date.is_(None) | (UserTarget.effective_date <= week_start),
+        )
+    )
+    for t in res.scalars().all():
+        targets_by_user[t.user_id].append(t)
+
+    recipes_by_user: dict[uuid.UUID, list] = defaultdict(list)
+    res = await session.execute(
+        select(
+            Recipe.user_id,
+            Recipe.id,
+            Recipe.kcal_per_serving,
+            Recipe.protein_per_serving,
+            Recipe.carbs_per_serving,
+            Recipe.fat_per_serving,
+        )
+        .where(Recipe.user_id.in_(user_ids))
+        .order_by(Recipe.user_id, Recipe.id)
+    )
+    for row in res.all():
+        recipes_by_user[row.user_id].append(row)
+
+    jobs: list[tuple[uuid.UUID, GenerateWeeklyPlanRequest, crud_plans.RecipePool]] = []
+    for user_id in user_ids:
+        target = pick_active_user_target(targets_by_user.get(user_id, []), at_date=week_start)
+        if target is None or target.kcal_target <= 0 or not recipes_by_user.get(user_id):
+            continue
+        payload = GenerateWeeklyPlanRequest(
+            week_start=week_start,
+            target_kcal=target.kcal_target,
+            macro_grams=MacroGrams(
+                protein_g=_grams(target.protein_g),
+                carbs_g=_grams(target.carbs_g),
+                fat_g=_grams(target.fat_g),
+            ),
+        )
+        jobs.append((user_id, payload, crud_plans.RecipePool(recipes_by_user[user_id])))
+
+    async def solve(**kwargs) -> PlanSolution:
+        if executor is None:
+            return optimize_week(**kwargs)
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(optimize_week, **kwargs))
+
+    # Same pipeline as the generate endpoint, so results match it; the solves run
+    # concurrently over the executor.
+    all_slots = await asyncio.gather(
+        *(
+            crud_plans.plan_week_slots(user_id=user_id, payload=payload, pool=pool, solve=solve)
+            for user_id, payload, pool in jobs
+        )
+    )
+    plans = [(user_id, payload, slots) for (user_id, payload, _), slots in zip(jobs, all_slots)]
+    created = await crud_plans.insert_generated_weekly_plans(session=session, plans=plans)
+    return created, len(user_ids) - len(jobs)
+
+
+async def run_batch(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    *,
+    week_start: date,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    executor: Executor | None = None,
+) -> BatchStats:
+    """Generate `week_start` plans for all active users that don't have one yet."""
+
+    if week_start.weekday() != 0:
+        raise ValueError("week_start must be a Monday")
+
+    stats = BatchStats()
+    started = time.perf_counter()
+    after: uuid.UUID | None = None
+    while True:
+        async with sessionmaker() as session:
+            user_ids = await _next_user_ids(session=session, week_start=week_start, after=after, limit=chunk_size)
+            if not user_ids:
+                break
+            created, skipped = await _generate_chunk(
+                session=session, user_ids=user_ids, week_start=week_start, executor=executor
+            )
+            await session.commit()
+
+        after = user_ids[-1]
+        stats.chunks += 1
+        stats.users += len(user_ids)
+        stats.plans_created += created
+        stats.skipped += skipped
+        stats.seconds = time.perf_counter() - started
+        logger.info(
+            "batch generate %s: chunk %d, %d users, %d plans (%.1f plans/s), resume after %s",
+            week_start,
+            stats.chunks,
+            stats.users,
+            stats.plans_created,
+            stats.plans_per_second,
+            after,
+        )
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def _next_monday(today: date) -> date:
+    return today + timedelta(days=7 - today.weekday())
+
+
+def main() -> None:
+    from app.core.logging import setup_logging
+    from app.core.settings import get_settings
+    from app.db.session import get_sessionmaker
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--week-start", type=date.fromisoformat, default=_next_monday(date.today()))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default: CPU count, 0: inline)")
+    args = parser.parse_args()
+
+    setup_logging(level=get_settings().log_level)
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers != 0 else None
+    try:
+        stats = asyncio.run(
+            run_batch(get_sessionmaker(), week_start=args.week_start, chunk_size=args.chunk_size, executor=executor)
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    print(
+        f"{stats.plans_created} plans for {stats.users} users ({stats.skipped} skipped) "
+        f"in {stats.seconds:.1f}s: {stats.plans_per_second:.1f} plans/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Per-process write coalescing for bursty last-write-wins updates.
+
+Requests for the same key that arrive within `window_s` of each other are merged
+(per item, the last submitted value wins) and written by a single flush. The first
+request of a batch is its leader: it waits out the window, then runs the flush with
+its own callback (i.e. its own DB session) on behalf of every request in the batch.
+All requests of a batch return only after that flush finished, and all of them
+raise if it failed, so nothing is acknowledged before it is durably written.
+
+Flushes for one key are serialized (FIFO lock), so a later batch can never land
+before an earlier one. Coalescing is per worker process; across workers, writes
+behave exactly as without coalescing.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Hashable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+FlushFn = Callable[[dict[Hashable, Any]], Awaitable[None]]
+
+
+@dataclass
+class CoalescerStats:
+    requests: int = 0
+    flushes: int = 0
+    failed_flushes: int = 0
+    items_submitted: int = 0
+    items_written: int = 0
+    flush_seconds_total: float = 0.0
+    flush_seconds_max: float = 0.0
+
+    @property
+    def coalescing_ratio(self) -> float:
+        """Requests per flush (1.0 means no coalescing happened)."""
+
+        return self.requests / self.flushes if self.flushes else 0.0
+
+    @property
+    def flush_seconds_avg(self) -> float:
+        return self.flush_seconds_total / self.flushes if self.flushes else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "requests": self.requests,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "items_submitted": self.items_submitted,
+            "items_written": self.items_written,
+            "coalescing_ratio": round(self.coalescing_ratio, 3),
+            "flush_seconds_avg": round(self.flush_seconds_avg, 6),
+            "flush_seconds_max": round(self.flush_seconds_max, 6),
+        }
+
+
+@dataclass
+class _Batch:
+    items: dict[Hashable, Any] = field(default_factory=dict)
+    requests: int = 0
+    done: asyncio.Future[None] | None = None
+
+
+class WriteCoalescer:
+    def __init__(self, *, window_s: float = 0.025) -> None:
+        if window_s < 0:
+            raise ValueError("window_s must be >= 0")
+        self.window_s = window_s
+        self.stats = CoalescerStats()
+        self._pending: dict[Hashable, _Batch] = {}
+        # key -> (flush lock, number of leaders using it); dropped when unused.
+        self._locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+
+    async def submit(self, key: Hashable, items: Mapping[Hashable, Any], flush: FlushFn) -> None:
+        """Merge `items` into the pending batch for `key`; return once it is written."""
+
+        self.stats.requests += 1
+        self.stats.items_submitted += len(items)
+
+        batch = self._pending.get(key)
+        if batch is not None:
+            # Follower: the batch's leader flushes for us.
+            batch.items.update(items)
+            batch.requests += 1
+            assert batch.done is not None
+            await asyncio.shield(batch.done)
+            return
+
+        batch = _Batch(items=dict(items), requests=1, done=asyncio.get_running_loop().create_future())
+        self._pending[key] = batch
+        lock, users = self._locks.get(key, (asyncio.Lock(), 0))
+        self._locks[key] = (lock, users + 1)
+        try:
+            if self.window_s:
+                await asyncio.sleep(self.window_s)
+            async with lock:
+                # Close the batch: later arrivals start the next one.
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+                await self._flush(batch, flush)
+        except BaseException as e:
+            # Includes cancellation of the leader: followers must not hang or be
+            # acknowledged for a write that did not happen.
+            if self._pending.get(key) is batch:
+                del self._pending[key]
+            if not batch.done.done():
+                batch.done.set_exception(e if isinstance(e, Exception) else RuntimeError("flush cancelled"))
+                batch.done.exception()  # mark retrieved when there are no followers
+            raise
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+        batch.done.set_result(None)
+
+    async def _flush(self, batch: _Batch, flush: FlushFn) -> None:
+        started = time.perf_counter()
+        try:
+            await flush(batch.items)
+        except BaseException:
+            self.stats.failed_flushes += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stats.flushes += 1
+            self.stats.flush_seconds_total += elapsed
+            self.stats.flush_seconds_max = max(self.stats.flush_seconds_max, elapsed)
+        self.stats.items_written += len(batch.items)
@@ -0,0 +1,99 @@
+"""Static k-d tree for exact k-nearest-neighbour queries on small-dimensional points.
+
+Pure Python with flat storage: coordinates live in one `array('d')` and the tree is
+implicit in a permutation of point indices (each node is a slice split at its
+median, numbered heap-style so only its split value is stored), so there are no node
+objects and memory stays at roughly 30 bytes per point plus the caller's ids. Leaves hold up to `LEAF_SIZE` points and are scanned linearly.
+
+Build is O(n log^2 n) (a sort per level); queries visit O(log n + k) nodes on
+well-spread data. Distances are squared Euclidean.
+"""
+
+from __future__ import annotations
+
+import heapq
+from array import array
+from collections.abc import Callable, Hashable, Sequence
+
+LEAF_SIZE = 16
+
+
+class KDTree:
+    def __init__(self, points: Sequence[Sequence[float]], ids: Sequence[Hashable]) -> None:
+        if len(points) != len(ids):
+            raise ValueError("points and ids must have the same length")
+        self.dims = len(points[0]) if points else 0
+        self.ids = list(ids)
+        self._coords = array("d", (c for p in points for c in p))
+        self._perm = array("l", range(len(points)))
+        self._splits: dict[int, float] = {}
+        self._build(len(points))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _build(self, n: int) -> None:
+        # Explicit stack of (node, lo, hi, depth): no recursion limit concerns.
+        stack = [(1, 0, n, 0)]
+        coords, perm, dims, splits = self._coords, self._perm, self.dims, self._splits
+        while stack:
+            node, lo, hi, depth = stack.pop()
+            if hi - lo <= LEAF_SIZE:
+                continue
+            axis = depth % dims
+            perm[lo:hi] = array("l", sorted(perm[lo:hi], key=lambda i: coords[i * dims + axis]))
+            mid = (lo + hi) // 2
+            # Read before the children reorder their slices.
+            splits[node] = coords[perm[mid] * dims + axis]
+            stack.append((2 * node, lo, mid, depth + 1))
+            stack.append((2 * node + 1, mid, hi, depth + 1))
+
+    def query(
+        self,
+        point: Sequence[float],
+        k: int,
+        *,
+        exclude: Callable[[Hashable], bool] | None = None,
+    ) -> list[tuple[float, Hashable]]:
+        """The `k` nearest (squared distance, id) pairs, nearest first.
+
+        Points whose id `exclude` returns True for are skipped (e.g. the query item).
+        """
+
+        if k <= 0 or not self.ids:
+            return []
+        coords, perm, dims, ids, splits = self._coords, self._perm, self.dims, self.ids, self._splits
+        q = tuple(point)
+        # Max-heap of the best k so far, as (-distance, index).
+        best: list[tuple[float, int]] = []
+
+        def visit(node: int, lo: int, hi: int, depth: int) -> None:
+            if hi - lo <= LEAF_SIZE:
+                for j in range(lo, hi):
+                    i = perm[j]
+                    base = i * dims
+                    d = 0.0
+                    for a in range(dims):
+                        diff = coords[base + a] - q[a]
+                        d += diff * diff
+                    if len(best) < k:
+                        if exclude is None or not exclude(ids[i]):
+                            heapq.heappush(best, (-d, i))
+                    elif d < -best[0][0]:
+                        if exclude is None or not exclude(ids[i]):
+                            heapq.heapreplace(best, (-d, i))
+                return
+
+            mid = (lo + hi) // 2
+            diff = q[depth % dims] - splits[node]
+            if diff < 0:
+                visit(2 * node, lo, mid, depth + 1)
+                if len(best) < k or diff * diff < -best[0][0]:
+                    visit(2 * node + 1, mid, hi, depth + 1)
+            else:
+                visit(2 * node + 1, mid, hi, depth + 1)
+                if len(best) < k or diff * diff < -best[0][0]:
+                    visit(2 * node, lo, mid, depth + 1)
+
+        visit(1, 0, len(ids), 0)
+        return sorted((-neg_d, ids[i]) for neg_d, i in best)
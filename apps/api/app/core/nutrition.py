@@ -0,0 +1,154 @@
+"""Fixed-point macro arithmetic shared by diary, recipes, plans and the calculator.
+
+Every stored quantity (per-100 g macros, grams, servings) is a Numeric with two
+decimals, so it is exactly representable as an integer number of centi-units
+(1/100). Scaling a per-100 g value by grams multiplies two centi integers, which
+gives the exact line amount in micro-units (1/1_000_000). Lines are summed exactly
+in micro-units and rounded to centi-units once, half away from zero, at the
+boundary (`micro_to_centi` / `divide_to_centi`).
+
+That makes totals independent of where they are computed: a recipe and the same
+foods logged in the diary always agree to the cent.
+"""
+
+from __future__ import annotations
+
+import math
+from collections.abc import Sequence
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any
+
+# Column order of every macro vector in this module.
+MACRO_FIELDS = ("kcal", "protein", "carbs", "fat")
+
+CENTI = 100
+# centi * centi / 100 g -> micro-units (value * 10**6) of the scaled macro.
+MICRO_PER_CENTI = 10_000
+
+# (kcal, protein, carbs, fat) as integers.
+MacroVector = tuple[int, int, int, int]
+
+ZERO: MacroVector = (0, 0, 0, 0)
+
+_CENT = Decimal("0.01")
+_HUNDRED = Decimal(CENTI)
+
+
+def to_centi(value: Any) -> int:
+    """Convert a Decimal/float/int/str amount to integer centi-units (half away from zero)."""
+
+    if isinstance(value, Decimal):
+        # Fast path: stored values have at most two decimals, so scaling is exact.
+        scaled = value * _HUNDRED
+        exact = int(scaled)
+        if scaled == exact:
+            return exact
+        return int(value.quantize(_CENT, rounding=ROUND_HALF_UP).scaleb(2))
+    if isinstance(value, int):
+        return value * CENTI
+    if isinstance(value, float):
+        # Inputs carry at most two decimals; rounding absorbs binary representation error.
+        scaled = value * CENTI
+        return int(math.floor(scaled + 0.5)) if scaled >= 0 else -int(math.floor(-scaled + 0.5))
+    return to_centi(Decimal(str(value)))
+
+
+def centi_to_decimal(value: int) -> Decimal:
+    return Decimal(value).scaleb(-2)
+
+
+def centi_to_float(value: int) -> float:
+    return value / CENTI
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """Integer division rounding half away from zero."""
+
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    if numerator >= 0:
+        return (2 * numerator + denominator) // (2 * denominator)
+    return -((-2 * numerator + denominator) // (2 * denominator))
+
+
+def micro_to_centi(vector: Sequence[int]) -> MacroVector:
+    return tuple(div_round(v, MICRO_PER_CENTI) for v in vector)  # type: ignore[return-value]
+
+
+def divide_to_centi(vector: Sequence[int], divisor_centi: int) -> MacroVector:
+    """Divide micro-unit amounts by a centi-unit divisor (e.g. servings), rounding to centi."""
+
+    d = divisor_centi * MICRO_PER_CENTI // CENTI
+    return tuple(div_round(v, d) for v in vector)  # type: ignore[return-value]
+
+
+def food_vector(food: Any) -> MacroVector:
+    """Per-100 g macros of a `Food` (or anything with the *_100g attributes) in centi-units."""
+
+    return (
+        to_centi(food.kcal_100g),
+        to_centi(food.protein_100g),
+        to_centi(food.carbs_100g),
+        to_centi(food.fat_100g),
+    )
+
+
+def scale_line(per_100g: MacroVector, grams_centi: int) -> MacroVector:
+    """Exact macros (micro-units) of `grams_centi` of a food with `per_100g` centi macros."""
+
+    k, p, c, f = per_100g
+    return (k * grams_centi, p * grams_centi, c * grams_centi, f * grams_centi)
+
+
+def scale_lines(per_100g: Sequence[MacroVector], grams_centi: Sequence[int]) -> tuple[list[MacroVector], MacroVector]:
+    """Scale per-100 g vectors by grams and sum them, in one pass.
+
+    Returns (per-line vectors, totals), both exact in micro-units; round with
+    `micro_to_centi` / `divide_to_centi` at the output boundary.
+    """
+
+    if len(per_100g) != len(grams_centi):
+        raise ValueError("per_100g and grams must have the same length")
+
+    lines: list[MacroVector] = []
+    append = lines.append
+    tk = tp = tc = tf = 0
+    for (k, p, c, f), g in zip(per_100g, grams_centi):
+        lk, lp, lc, lf = k * g, p * g, c * g, f * g
+        append((lk, lp, lc, lf))
+        tk += lk
+        tp += lp
+        tc += lc
+        tf += lf
+    return lines, (tk, tp, tc, tf)
+
+
+def servings_product_to_centi(vector: Sequence[int]) -> MacroVector:
+    """Round per-serving centi macros x centi servings (units of 1/10_000) to centi-units."""
+
+    return tuple(div_round(v, CENTI) for v in vector)  # type: ignore[return-value]
+
+
+def sum_vectors(vectors: Sequence[Sequence[int]]) -> MacroVector:
+    tk = tp = tc = tf = 0
+    for k, p, c, f in vectors:
+        tk += k
+        tp += p
+        tc += c
+        tf += f
+    return (tk, tp, tc, tf)
+
+
+def scale_grams(grams_centi: int, numerator_centi: int, denominator_centi: int) -> int:
+    """grams * numerator / denominator in centi-units (e.g. planned servings / recipe servings)."""
+
+    return div_round(grams_centi * numerator_centi, denominator_centi)
+
+
+def protein_per_100kcal(total_micro: Sequence[int]) -> int:
+    """Protein grams per 100 kcal, in centi-units (0 when there are no calories)."""
+
+    kcal, protein = total_micro[0], total_micro[1]
+    if kcal <= 0:
+        return 0
+    return div_round(protein * 100 * CENTI, kcal)
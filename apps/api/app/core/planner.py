@@ -0,0 +1,334 @@
+"""Weekly meal-plan optimizer.
+
+Chooses a recipe and a serving multiplier for every (day, slot) of a week so that each
+day's kcal/protein/carbs/fat land as close as possible to that day's targets:
+
+1. Greedy construction: slots are filled in order, each against its share of what is
+   left of the day's target. For every candidate recipe the best serving multiplier
+   has a closed form (weighted least squares in one variable), so a candidate is
+   scored in O(1).
+2. Local search: random unlocked slots are revisited, trying a sample of recipes and
+   re-fitting servings against the rest of the day; strictly improving moves are kept.
+
+Everything random comes from `random.Random(seed)`, and the search stops after
+`max_iterations` moves or `stall_limit` non-improving moves in a row, so a given seed
+and input always produce the same plan however loaded the machine is. The wall-clock
+`time_budget_s` is only a guard against runaway inputs: it is an order of magnitude
+above a normal solve, and when it fires the result is no longer reproducible, which
+is logged and reported as `timed_out`.
+
+Pure Python over tuples: the per-serving macro "matrix" is a list of 4-tuples indexed
+by candidate. `optimize_week_async` runs the solver in a process pool when one is
+configured (`configure_solver_pool`), so CPU-bound solves don't block the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import heapq
+import random
+import time
+from collections.abc import Iterable, Mapping, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Relative weight of each macro's squared relative deviation in a day's cost.
+KCAL_WEIGHT = 1.0
+MACRO_WEIGHT = 0.5
+
+# Serving multipliers are kept to friendly steps within sane bounds.
+MIN_SERVINGS = 0.5
+MAX_SERVINGS = 3.0
+SERVINGS_STEP = 0.25
+
+# Share of the day's target each slot aims for during greedy construction
+# (breakfast, lunch, dinner, snack).
+DEFAULT_SLOT_SHARES = (0.25, 0.35, 0.30, 0.10)
+
+# Variety: cost of reusing a recipe within the week / within the same day.
+WEEK_REPEAT_PENALTY = 0.002
+DAY_REPEAT_PENALTY = 0.02
+
+# Candidates scored per slot during construction / per local-search move.
+GREEDY_SAMPLE_SIZE = 256
+MOVE_SAMPLE_SIZE = 16
+
+# The runaway guard reads the clock once per this many local-search moves.
+DEADLINE_CHECK_INTERVAL = 64
+
+Vector = tuple[float, float, float, float]
+
+
+@dataclass(frozen=True)
+class DayTargets:
+    kcal: float
+    protein: float | None = None
+    carbs: float | None = None
+    fat: float | None = None
+
+    def vector(self) -> Vector:
+        return (self.kcal, self.protein or 0.0, self.carbs or 0.0, self.fat or 0.0)
+
+    def weights(self) -> Vector:
+        """Per-macro weights normalized by target**2, so deviations are relative."""
+
+        def w(target: float | None, weight: float) -> float:
+            return weight / (target * target) if target else 0.0
+
+        return (
+            w(self.kcal, KCAL_WEIGHT),
+            w(self.protein, MACRO_WEIGHT),
+            w(self.carbs, MACRO_WEIGHT),
+            w(self.fat, MACRO_WEIGHT),
+        )
+
+
+@dataclass
+class PlanSolution:
+    # assignments[day][slot] = (candidate index, servings)
+    assignments: list[list[tuple[int, float]]]
+    cost: float
+    iterations: int = 0
+    timed_out: bool = False
+    day_totals: list[Vector] = field(default_factory=list)
+
+
+def _snap_servings(s: float) -> float:
+    if s < MIN_SERVINGS:
+        s = MIN_SERVINGS
+    elif s > MAX_SERVINGS:
+        s = MAX_SERVINGS
+    return round(s / SERVINGS_STEP) * SERVINGS_STEP
+
+
+def _fit(v: Vector, residual: Vector, w: Vector) -> tuple[float, float]:
+    """Best snapped servings for per-serving macros `v` against `residual`, and its cost."""
+
+    v0, v1, v2, v3 = v
+    r0, r1, r2, r3 = residual
+    w0, w1, w2, w3 = w
+    den = w0 * v0 * v0 + w1 * v1 * v1 + w2 * v2 * v2 + w3 * v3 * v3
+    if den <= 0.0:
+        s = 1.0
+    else:
+        s = _snap_servings((w0 * v0 * r0 + w1 * v1 * r1 + w2 * v2 * r2 + w3 * v3 * r3) / den)
+    d0 = s * v0 - r0
+    d1 = s * v1 - r1
+    d2 = s * v2 - r2
+    d3 = s * v3 - r3
+    return s, w0 * d0 * d0 + w1 * d1 * d1 + w2 * d2 * d2 + w3 * d3 * d3
+
+
+def _fixed_cost(v: Vector, servings: float, residual: Vector, w: Vector) -> float:
+    c = 0.0
+    for a, r, wk in zip(v, residual, w):
+        d = servings * a - r
+        c += wk * d * d
+    return c
+
+
+def _day_cost(total: Vector, target: Vector, w: Vector) -> float:
+    c = 0.0
+    for t, g, wk in zip(total, target, w):
+        d = t - g
+        c += wk * d * d
+    return c
+
+
+def optimize_week(
+    *,
+    recipe_macros: Sequence[Vector],
+    day_targets: Sequence[DayTargets],
+    locked: Mapping[tuple[int, int], tuple[int, float]] | None = None,
+    prior_uses: Mapping[int, int] | None = None,
+    slot_shares: Sequence[float] = DEFAULT_SLOT_SHARES,
+    seed: int = 0,
+    time_budget_s: float = 2.0,
+    max_iterations: int = 1500,
+    stall_limit: int = 400,
+) -> PlanSolution:
+    """Optimize a plan; see the module docstring.
+
+    `recipe_macros[i]` are per-serving (kcal, protein, carbs, fat) of candidate i.
+    `locked[(day, slot)] = (candidate index, servings)` slots are kept as-is but count
+    towards their day's totals. `prior_uses[i]` counts uses of candidate i in earlier
+    plans (e.g. previous weeks); they are penalized like uses within this week.
+    """
+
+    n = len(recipe_macros)
+    if n == 0:
+        raise ValueError("No recipes available to generate a plan")
+
+    deadline = time.perf_counter() + time_budget_s
+    rng = random.Random(seed)
+    locked = dict(locked or {})
+    n_days = len(day_targets)
+    n_slots = len(slot_shares)
+
+    targets = [t.vector() for t in day_targets]
+    weights = [t.weights() for t in day_targets]
+    all_candidates = range(n)
+
+    prior = [0] * n
+    for idx, count in (prior_uses or {}).items():
+        if 0 <= idx < n:
+            prior[idx] = count
+    uses = list(prior)
+    day_uses: list[dict[int, int]] = [{} for _ in range(n_days)]
+    assignments: list[list[tuple[int, float]]] = [[(0, 0.0)] * n_slots for _ in range(n_days)]
+
+    def contrib(idx: int, servings: float) -> Vector:
+        v = recipe_macros[idx]
+        return (v[0] * servings, v[1] * servings, v[2] * servings, v[3] * servings)
+
+    def add_use(day: int, idx: int, delta: int) -> None:
+        uses[idx] += delta
+        day_uses[day][idx] = day_uses[day].get(idx, 0) + delta
+
+    def repeat_penalty(day: int, idx: int) -> float:
+        # Marginal variety cost of adding one more use of `idx` on `day`.
+        return WEEK_REPEAT_PENALTY * uses[idx] + DAY_REPEAT_PENALTY * day_uses[day].get(idx, 0)
+
+    def sample(k: int) -> Sequence[int]:
+        return all_candidates if n <= k else rng.sample(all_candidates, k)
+
+    # -- Greedy construction -------------------------------------------------------
+    day_totals: list[Vector] = []
+    for day in range(n_days):
+        total = (0.0, 0.0, 0.0, 0.0)
+        for slot in range(n_slots):
+            if (day, slot) in locked:
+                idx, servings = locked[(day, slot)]
+                assignments[day][slot] = (idx, servings)
+                add_use(day, idx, 1)
+                total = tuple(a + b for a, b in zip(total, contrib(idx, servings)))  # type: ignore[assignment]
+
+        open_slots = [s for s in range(n_slots) if (day, s) not in locked]
+        remaining_share = sum(slot_shares[s] for s in open_slots)
+        w = weights[day]
+        for slot in open_slots:
+            frac = slot_shares[slot] / remaining_share if remaining_share > 0 else 1.0
+            remaining_share -= slot_shares[slot]
+            residual = tuple((t - a) * frac for t, a in zip(targets[day], total))
+
+            best_idx, best_s, best_cost = -1, 1.0, float("inf")
+            for idx in sample(GREEDY_SAMPLE_SIZE):
+                s, cost = _fit(recipe_macros[idx], residual, w)  # type: ignore[arg-type]
+                cost += repeat_penalty(day, idx)
+                if cost < best_cost:
+                    best_idx, best_s, best_cost = idx, s, cost
+
+            assignments[day][slot] = (best_idx, best_s)
+            add_use(day, best_idx, 1)
+            total = tuple(a + b for a, b in zip(total, contrib(best_idx, best_s)))  # type: ignore[assignment]
+        day_totals.append(total)
+
+    # -- Local search --------------------------------------------------------------
+    movable = [(d, s) for d in range(n_days) for s in range(n_slots) if (d, s) not in locked]
+    iterations = 0
+    stall = 0
+    timed_out = False
+    while movable and iterations < max_iterations and stall < stall_limit:
+        if iterations % DEADLINE_CHECK_INTERVAL == 0 and time.perf_counter() > deadline:
+            timed_out = True
+            logger.warning(
+                "optimize_week hit its %.2fs time guard after %d moves (%d recipes); result is not reproducible",
+                time_budget_s,
+                iterations,
+                n,
+            )
+            break
+        iterations += 1
+
+        day, slot = movable[rng.randrange(len(movable))]
+        cur_idx, cur_s = assignments[day][slot]
+        target, w = targets[day], weights[day]
+        cur = contrib(cur_idx, cur_s)
+        rest = tuple(a - b for a, b in zip(day_totals[day], cur))
+        residual = tuple(t - r for t, r in zip(target, rest))
+
+        # Cost of the current choice, with this slot's own use excluded from the penalty.
+        add_use(day, cur_idx, -1)
+        base = _fixed_cost(recipe_macros[cur_idx], cur_s, residual, w) + repeat_penalty(day, cur_idx)  # type: ignore[arg-type]
+
+        best_idx, best_s, best_cost = cur_idx, cur_s, base
+        for idx in (cur_idx, *sample(MOVE_SAMPLE_SIZE)):
+            s, cost = _fit(recipe_macros[idx], residual, w)  # type: ignore[arg-type]
+            cost += repeat_penalty(day, idx)
+            if cost < best_cost - 1e-12:
+                best_idx, best_s, best_cost = idx, s, cost
+
+        add_use(day, best_idx, 1)
+        if best_idx == cur_idx and best_s == cur_s:
+            stall += 1
+            continue
+        stall = 0
+        assignments[day][slot] = (best_idx, best_s)
+        new = contrib(best_idx, best_s)
+        day_totals[day] = tuple(r + x for r, x in zip(rest, new))  # type: ignore[assignment]
+
+    cost = sum(_day_cost(day_totals[d], targets[d], weights[d]) for d in range(n_days))
+    # Pairs among prior uses belong to earlier plans, not to this solution.
+    cost += sum(WEEK_REPEAT_PENALTY * (u * (u - 1) - p * (p - 1)) / 2 for u, p in zip(uses, prior))
+    cost += sum(DAY_REPEAT_PENALTY * c * (c - 1) / 2 for du in day_uses for c in du.values())
+    return PlanSolution(
+        assignments=assignments,
+        cost=cost,
+        iterations=iterations,
+        timed_out=timed_out,
+        day_totals=day_totals,
+    )
+
+
+def rank_slot_candidates(
+    *,
+    recipe_macros: Sequence[Vector],
+    target: DayTargets,
+    rest: Vector,
+    candidates: Iterable[int],
+    k: int,
+) -> list[tuple[int, float, float]]:
+    """Best `k` candidates for one slot of a day whose other meals total `rest`.
+
+    Each candidate gets its best snapped servings (same closed form as the optimizer)
+    and is scored by the day's resulting cost against `target`. Returns
+    (candidate index, servings, cost), best first.
+    """
+
+    residual = tuple(t - r for t, r in zip(target.vector(), rest))
+    w = target.weights()
+    scored = ((idx, *_fit(recipe_macros[idx], residual, w)) for idx in candidates)  # type: ignore[arg-type]
+    return heapq.nsmallest(k, scored, key=lambda c: (c[2], c[0]))
+
+
+_solver_pool: Executor | None = None
+
+
+def configure_solver_pool(workers: int) -> None:
+    """Run `optimize_week_async` in `workers` processes (0: inline on the event loop)."""
+
+    global _solver_pool
+    shutdown_solver_pool()
+    if workers > 0:
+        _solver_pool = ProcessPoolExecutor(max_workers=workers)
+
+
+def shutdown_solver_pool() -> None:
+    global _solver_pool
+    if _solver_pool is not None:
+        _solver_pool.shutdown(wait=False, cancel_futures=True)
+        _solver_pool = None
+
+
+async def optimize_week_async(**kwargs) -> PlanSolution:
+    """`optimize_week` in the solver pool if configured, else inline."""
+
+    if _solver_pool is None:
+        return optimize_week(**kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_solver_pool, functools.partial(optimize_week, **kwargs))
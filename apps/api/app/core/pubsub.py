@@ -0,0 +1,133 @@
+"""In-process pub/sub with an optional Postgres LISTEN/NOTIFY bridge.
+
+Subscribers get a bounded queue per subscription. A subscriber that falls behind is
+not allowed to block publishers: its queue is drained and it receives a single
+`RESYNC` marker instead, after which it should re-read full state.
+
+Without the bridge, messages only reach subscribers in the publishing worker. With
+it, publishers emit `pg_notify(PG_CHANNEL, ...)` inside their transaction (so
+nothing is announced unless it commits), and every worker's bridge re-publishes
+the notifications it receives locally, including the publishing worker's own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+from collections.abc import AsyncIterator
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Single Postgres channel; the app-level channel travels in the payload.
+PG_CHANNEL = "foodie_events"
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+PG_MAX_PAYLOAD_BYTES = 7900
+
+RESYNC = object()
+
+_SUBSCRIBER_QUEUE_SIZE = 64
+
+
+class Subscription:
+    def __init__(self, channel: str) -> None:
+        self.channel = channel
+        self._queue: asyncio.Queue[object] = asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+
+    def _offer(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC)
+
+    async def get(self) -> object:
+        """Next message (str) or `RESYNC`."""
+
+        return await self._queue.get()
+
+
+class PubSub:
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self.bridged = False
+
+    def publish_local(self, channel: str, message: str) -> int:
+        """Deliver to this process's subscribers; returns how many received it."""
+
+        subs = self._subscribers.get(channel, ())
+        for sub in subs:
+            sub._offer(message)
+        return len(subs)
+
+    def subscribe(self, channel: str) -> Subscription:
+        sub = Subscription(channel)
+        self._subscribers.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.channel)
+        if subs is None:
+            return
+        subs.discard(sub)
+        if not subs:
+            del self._subscribers[sub.channel]
+
+    @contextlib.asynccontextmanager
+    async def subscription(self, channel: str) -> AsyncIterator[Subscription]:
+        sub = self.subscribe(channel)
+        try:
+            yield sub
+        finally:
+            self.unsubscribe(sub)
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self._subscribers.get(channel, ()))
+
+
+def bridge_payload(channel: str, message: str) -> str | None:
+    """NOTIFY payload for a message, or None if it is too large to send as one."""
+
+    payload = json.dumps({"c": channel, "m": message}, separators=(",", ":"))
+    return payload if len(payload.encode()) <= PG_MAX_PAYLOAD_BYTES else None
+
+
+async def run_postgres_bridge(pubsub: PubSub, dsn: str, *, reconnect_delay_s: float = 1.0) -> None:
+    """LISTEN on `PG_CHANNEL` and re-publish notifications locally until cancelled.
+
+    `dsn` is a libpq URL (no SQLAlchemy `+driver` suffix). Reconnects on failure;
+    local subscribers are not told about gaps, which is acceptable because SSE
+    clients resync from a snapshot on reconnect.
+    """
+
+    import psycopg  # Optional at import time: only needed when the bridge is enabled.
+
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(dsn, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {PG_CHANNEL}")
+                pubsub.bridged = True
+                async for notify in conn.notifies():
+                    try:
+                        data = json.loads(notify.payload)
+                        pubsub.publish_local(data["c"], data["m"])
+                    except (ValueError, KeyError, TypeError):
+                        logger.warning("ignoring malformed %s notification", PG_CHANNEL)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("pubsub postgres bridge failed; reconnecting")
+        finally:
+            pubsub.bridged = False
+        await asyncio.sleep(reconnect_delay_s)
+
+
+_pubsub = PubSub()
+
+
+def get_pubsub() -> PubSub:
+    return _pubsub
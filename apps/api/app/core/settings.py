@@ -57,6 +57,30 @@ class Settings(BaseSettings):
     # Required: no default, to avoid accidentally running against localhost in containers.
     database_url: str = Field(validation_alias="DATABASE_URL")
 
+    # Grocery check PUTs for the same (user, week) arriving within this window are
+    # merged into one write per worker process; 0 flushes each request on its own.
+    grocery_checks_coalesce_window_ms: int = Field(
+        default=25,
+        ge=0,
+        validation_alias="GROCERY_CHECKS_COALESCE_WINDOW_MS",
+    )
+
+    # Fan grocery check events out across workers via Postgres LISTEN/NOTIFY
+    # (app.core.pubsub). Off: events only reach SSE clients on the same worker.
+    pubsub_pg_bridge: bool = Field(default=False, validation_alias="PUBSUB_PG_BRIDGE")
+
+    # Run a background job worker (app.worker) inside each API process. Only used on
+    # Postgres; on SQLite jobs run inline in the request.
+    jobs_worker: bool = Field(default=True, validation_alias="JOBS_WORKER")
+    jobs_poll_interval_ms: int = Field(default=1000, ge=10, validation_alias="JOBS_POLL_INTERVAL_MS")
+
+    # Processes for the plan optimizer (app.core.planner); 0 runs it on the event loop.
+    planner_process_workers: int = Field(default=0, ge=0, validation_alias="PLANNER_PROCESS_WORKERS")
+
+    # Build the similar-foods index (app.crud.foods) in the background at startup
+    # instead of on the first request. Only used on Postgres.
+    food_index_warmup: bool = Field(default=True, validation_alias="FOOD_INDEX_WARMUP")
+
     def cors_origins_list(self) -> list[str]:
         value = self.cors_origins
         if not value:
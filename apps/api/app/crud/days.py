@@ -7,6 +7,16 @@ from datetime import date
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.nutrition import (
+    ZERO,
+    MacroVector,
+    centi_to_float,
+    food_vector,
+    micro_to_centi,
+    scale_line,
+    sum_vectors,
+    to_centi,
+)
 from app.models.day import Day
 from app.models.food import Food
 from app.models.meal_entry import MealEntry, MealType
@@ -83,31 +93,35 @@ async def list_meal_entries_with_foods_for_day(
     return day, list(res.all())
 
 
-def compute_entry_macros(*, grams: float, food: Food | None) -> dict[str, float]:
+_DAY_MACRO_KEYS = ("kcal", "protein_g", "carbs_g", "fat_g")
+
+
+def _entry_macros_micro(*, grams, food: Food | None) -> MacroVector:
     if food is None:
-        return {"kcal": 0.0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0}
+        return ZERO
+    return scale_line(food_vector(food), to_centi(grams))
 
-    factor = float(grams) / 100.0
-    return {
-        "kcal": float(food.kcal_100g) * factor,
-        "protein_g": float(food.protein_100g) * factor,
-        "carbs_g": float(food.carbs_100g) * factor,
-        "fat_g": float(food.fat_100g) * factor,
-    }
+
+def _macros_out(micro: MacroVector) -> dict[str, float]:
+    return {k: centi_to_float(v) for k, v in zip(_DAY_MACRO_KEYS, micro_to_centi(micro))}
+
+
+def compute_entry_macros(*, grams: float, food: Food | None) -> dict[str, float]:
+    """Macros of one diary entry, rounded to 2 decimals by the shared fixed-point core."""
+
+    return _macros_out(_entry_macros_micro(grams=grams, food=food))
 
 
 def compute_meal_and_day_totals(
     *,
     entries: list[tuple[MealEntry, Food | None]],
 ) -> tuple[dict[MealType, dict[str, float]], dict[str, float]]:
-    meal_totals: dict[MealType, dict[str, float]] = defaultdict(lambda: {"kcal": 0.0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0})
-    day_totals = {"kcal": 0.0, "protein_g": 0.0, "carbs_g": 0.0, "fat_g": 0.0}
-
+    # Sum exact per-entry amounts and round each total once, so a day matches a recipe
+    # made of the same foods.
+    by_meal: dict[MealType, list[MacroVector]] = defaultdict(list)
     for entry, food in entries:
-        macros = compute_entry_macros(grams=float(entry.grams), food=food)
-        mt = entry.meal_type
-        for k in day_totals:
-            meal_totals[mt][k] += macros[k]
-            day_totals[k] += macros[k]
+        by_meal[entry.meal_type].append(_entry_macros_micro(grams=entry.grams, food=food))
 
+    meal_totals = {mt: _macros_out(sum_vectors(vs)) for mt, vs in by_meal.items()}
+    day_totals = _macros_out(sum_vectors([v for vs in by_meal.values() for v in vs]))
     return meal_totals, day_totals
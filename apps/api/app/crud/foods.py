@@ -1,15 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import heapq
+import math
+import time
 import uuid
+from dataclasses import dataclass
+from datetime import datetime
 
-from sqlalchemy import and_, delete, exists, or_, select, update
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+from app.core.knn import KDTree
+from app.core.logging import get_logger
+from app.crud.plan_versions import bump_weekly_plan_versions_for_food
 from app.models.day import Day
 from app.models.food import Food
 from app.models.meal_entry import MealEntry
 from app.models.user_food_favorite import UserFoodFavorite
 
+logger = get_logger(__name__)
+
 
 async def create_food_for_user(
     *,
@@ -188,6 +199,24 @@ async def get_food_for_user_scope(
     return res.scalar_one_or_none()
 
 
+async def get_foods_for_user_scope(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    food_ids: list[uuid.UUID],
+) -> dict[uuid.UUID, Food]:
+    """Fetch global + user-owned foods by id in one query; out-of-scope ids are absent."""
+
+    if not food_ids:
+        return {}
+    stmt = select(Food).where(
+        Food.id.in_(set(food_ids)),
+        or_(Food.user_id.is_(None), Food.user_id == user_id),
+    )
+    res = await session.execute(stmt)
+    return {f.id: f for f in res.scalars().all()}
+
+
 async def update_food_for_user_owned(
     *,
     session: AsyncSession,
@@ -229,6 +258,16 @@ async def update_food_for_user_owned(
     if food is None:
         return None
     await session.flush()
+
+    if values.keys() & {"kcal_100g", "protein_100g", "carbs_100g", "fat_100g"}:
+        # Local import: crud.recipes depends on this module.
+        from app.crud.recipes import refresh_recipe_macros_for_food
+
+        await refresh_recipe_macros_for_food(session=session, food_id=food.id)
+
+    # Name/brand feed grocery item keys; any edit invalidates plans using the food.
+    await bump_weekly_plan_versions_for_food(session=session, food_id=food.id)
+
     return food
 
 
@@ -236,3 +275,144 @@ async def _get_owned_food(*, session: AsyncSession, user_id: uuid.UUID, food_id:
     stmt = select(Food).where(Food.id == food_id, Food.user_id == user_id)
     res = await session.execute(stmt)
     return res.scalar_one_or_none()
+
+
+# --- Similar foods (nearest neighbours by macro profile) ---
+#
+# A food's profile is the share of its energy coming from protein, carbs and fat
+# (4/4/9 kcal per gram), so foods compare by composition regardless of energy
+# density or serving size. Foods without calories have no profile.
+#
+# Global foods are indexed once per worker process in a k-d tree. The tree is
+# revalidated against a cheap fingerprint (row count + newest updated_at) at most
+# every GLOBAL_FOOD_INDEX_TTL_SECONDS and rebuilt off the event loop when the global
+# catalog changed; meanwhile requests keep using the previous tree. The first build
+# runs at startup (warm_global_food_index) so requests don't wait for it. A user's own
+# foods are few and change often, so they are scanned per request and merged in.
+GLOBAL_FOOD_INDEX_TTL_SECONDS = 60.0
+
+MacroProfile = tuple[float, float, float]
+
+
+@dataclass
+class _GlobalFoodIndex:
+    tree: KDTree
+    fingerprint: tuple[int, datetime | None]
+    checked_at: float
+
+
+_global_food_index: _GlobalFoodIndex | None = None
+_global_food_index_lock = asyncio.Lock()
+
+
+def clear_global_food_index() -> None:
+    global _global_food_index, _global_food_index_lock
+    _global_food_index = None
+    _global_food_index_lock = asyncio.Lock()
+
+
+def macro_profile(*, kcal_100g, protein_100g, carbs_100g, fat_100g) -> MacroProfile | None:
+    kcal = float(kcal_100g)
+    if kcal <= 0:
+        return None
+    return (float(protein_100g) * 4 / kcal, float(carbs_100g) * 4 / kcal, float(fat_100g) * 9 / kcal)
+
+
+def _profile_columns():
+    return (Food.id, Food.kcal_100g, Food.protein_100g, Food.carbs_100g, Food.fat_100g)
+
+
+def _profiles(rows) -> tuple[list[uuid.UUID], list[MacroProfile]]:
+    ids: list[uuid.UUID] = []
+    points: list[MacroProfile] = []
+    for row in rows:
+        profile = macro_profile(
+            kcal_100g=row.kcal_100g, protein_100g=row.protein_100g, carbs_100g=row.carbs_100g, fat_100g=row.fat_100g
+        )
+        if profile is not None:
+            ids.append(row.id)
+            points.append(profile)
+    return ids, points
+
+
+def _build_global_food_index(rows) -> KDTree:
+    # Profiles and tree together: both are pure Python over the whole catalog.
+    ids, points = _profiles(rows)
+    return KDTree(points, ids)
+
+
+async def _global_food_index_tree(*, session: AsyncSession) -> KDTree:
+    global _global_food_index
+
+    index = _global_food_index
+    if index is not None and (
+        time.monotonic() - index.checked_at < GLOBAL_FOOD_INDEX_TTL_SECONDS or _global_food_index_lock.locked()
+    ):
+        return index.tree
+
+    async with _global_food_index_lock:
+        index = _global_food_index
+        if index is not None and time.monotonic() - index.checked_at < GLOBAL_FOOD_INDEX_TTL_SECONDS:
+            return index.tree
+
+        res = await session.execute(select(func.count(), func.max(Food.updated_at)).where(Food.user_id.is_(None)))
+        count, newest = res.one()
+        fingerprint = (int(count), newest)
+        if index is not None and index.fingerprint == fingerprint:
+            index.checked_at = time.monotonic()
+            return index.tree
+
+        res = await session.execute(select(*_profile_columns()).where(Food.user_id.is_(None)))
+        tree = await asyncio.to_thread(_build_global_food_index, res.all())
+        _global_food_index = _GlobalFoodIndex(tree=tree, fingerprint=fingerprint, checked_at=time.monotonic())
+        return tree
+
+
+async def warm_global_food_index(sessionmaker: async_sessionmaker[AsyncSession]) -> None:
+    """Build the global food index ahead of the first similarity request."""
+
+    try:
+        async with sessionmaker() as session:
+            tree = await _global_food_index_tree(session=session)
+    except Exception:
+        # Not fatal: the first similarity request builds it instead.
+        logger.exception("global food index warm-up failed")
+        return
+    logger.info("global food index ready (%d foods)", len(tree))
+
+
+async def list_similar_foods_for_user(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    food_id: uuid.UUID,
+    k: int = 10,
+) -> list[tuple[Food, float]]:
+    """The `k` global or user-owned foods closest to `food_id` by macro profile.
+
+    Returns (food, distance) pairs, nearest first; distance is Euclidean between
+    energy-share vectors (0 = identical split). Raises LookupError if the food is
+    not in the user's scope and ValueError if it has no calories to compare by.
+    """
+
+    food = await get_food_for_user_scope(session=session, user_id=user_id, food_id=food_id)
+    if food is None:
+        raise LookupError("Food not found")
+    profile = macro_profile(
+        kcal_100g=food.kcal_100g, protein_100g=food.protein_100g, carbs_100g=food.carbs_100g, fat_100g=food.fat_100g
+    )
+    if profile is None:
+        raise ValueError("Food has no calories to compare by")
+
+    tree = await _global_food_index_tree(session=session)
+    candidates = tree.query(profile, k, exclude=lambda i: i == food_id)
+
+    res = await session.execute(select(*_profile_columns()).where(Food.user_id == user_id, Food.id != food_id))
+    for own_id, point in zip(*_profiles(res.all())):
+        d = sum((a - b) ** 2 for a, b in zip(point, profile))
+        candidates.append((d, own_id))
+
+    nearest = heapq.nsmallest(k, candidates)
+    # Also drops ids a not yet revalidated global index still holds for deleted foods.
+    foods = await get_foods_for_user_scope(session=session, user_id=user_id, food_ids=[i for _, i in nearest])
+    return [(foods[i], math.sqrt(d)) for d, i in nearest if i in foods]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+import uuid
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.job import Job, JobStatus
+
+# A running job whose worker has not finished it within the lease is presumed dead
+# (crashed/killed worker) and can be claimed again, up to MAX_JOB_ATTEMPTS times.
+JOB_LEASE_SECONDS = 600
+MAX_JOB_ATTEMPTS = 3
+
+_MAX_ERROR_LENGTH = 2000
+
+
+async def create_job(*, session: AsyncSession, user_id: uuid.UUID, kind: str, payload: dict[str, Any]) -> Job:
+    job = Job(
+        id=uuid.uuid4(),
+        user_id=user_id,
+        kind=kind,
+        status=JobStatus.queued,
+        payload_json=json.dumps(payload, separators=(",", ":")),
+        attempts=0,
+    )
+    session.add(job)
+    await session.flush()
+    return job
+
+
+async def get_job_for_user(*, session: AsyncSession, user_id: uuid.UUID, job_id: uuid.UUID) -> Job | None:
+    res = await session.execute(select(Job).where(Job.id == job_id, Job.user_id == user_id))
+    return res.scalar_one_or_none()
+
+
+async def claim_next_job(*, session: AsyncSession, now: datetime | None = None) -> Job | None:
+    """Mark the oldest runnable job as running and return it (None if there is none).
+
+    Uses `FOR UPDATE SKIP LOCKED` so concurrent workers never claim the same job and
+    never wait on each other. The caller commits to release the row lock.
+    """
+
+    now = now or datetime.now(UTC)
+    lease_expired = and_(Job.status == JobStatus.running, Job.started_at < now - timedelta(seconds=JOB_LEASE_SECONDS))
+
+    # Expired leases that ran out of attempts are not retried again.
+    await session.execute(
+        update(Job)
+        .where(lease_expired, Job.attempts >= MAX_JOB_ATTEMPTS)
+        .values(status=JobStatus.failed, error="job lease expired", finished_at=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    res = await session.execute(
+        select(Job)
+        .where(or_(Job.status == JobStatus.queued, and_(lease_expired, Job.attempts < MAX_JOB_ATTEMPTS)))
+        .order_by(Job.created_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job = res.scalar_one_or_none()
+    if job is None:
+        return None
+
+    mark_job_running(job, now=now)
+    await session.flush()
+    return job
+
+
+def mark_job_running(job: Job, *, now: datetime | None = None) -> None:
+    job.status = JobStatus.running
+    job.attempts += 1
+    job.started_at = now or datetime.now(UTC)
+
+
+async def complete_job(*, session: AsyncSession, job: Job, result: dict[str, Any]) -> None:
+    job.status = JobStatus.succeeded
+    job.result_json = json.dumps(result, separators=(",", ":"))
+    job.error = None
+    job.finished_at = datetime.now(UTC)
+    await session.flush()
+
+
+async def fail_job(*, session: AsyncSession, job: Job, error: str) -> None:
+    job.status = JobStatus.failed
+    job.error = error[:_MAX_ERROR_LENGTH]
+    job.finished_at = datetime.now(UTC)
+    await session.flush()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterable
+
+from sqlalchemy import ColumnElement, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.recipe import RecipeItem
+from app.models.weekly_plan import WeeklyPlan, WeeklyPlanDay, WeeklyPlanMeal
+
+
+# Recipe and food writes bump the version of every weekly plan using them, so caches
+# keyed by (plan_id, version) (e.g. the grocery list) miss instead of going stale.
+# Kept out of crud.plans so crud.recipes / crud.foods can import it without a cycle.
+
+
+async def _bump_plans_where(*, session: AsyncSession, meal_filter: ColumnElement[bool]) -> None:
+    plan_ids = (
+        select(WeeklyPlanDay.weekly_plan_id)
+        .join(WeeklyPlanMeal, WeeklyPlanMeal.weekly_plan_day_id == WeeklyPlanDay.id)
+        .where(meal_filter)
+    )
+    await session.execute(
+        update(WeeklyPlan)
+        .where(WeeklyPlan.id.in_(plan_ids))
+        .values(version=WeeklyPlan.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def bump_weekly_plan_versions_for_recipes(*, session: AsyncSession, recipe_ids: Iterable[uuid.UUID]) -> None:
+    ids = list(recipe_ids)
+    if ids:
+        await _bump_plans_where(session=session, meal_filter=WeeklyPlanMeal.recipe_id.in_(ids))
+
+
+async def bump_weekly_plan_versions_for_food(*, session: AsyncSession, food_id: uuid.UUID) -> None:
+    recipe_ids = select(RecipeItem.recipe_id).where(RecipeItem.food_id == food_id)
+    await _bump_plans_where(session=session, meal_filter=WeeklyPlanMeal.recipe_id.in_(recipe_ids))
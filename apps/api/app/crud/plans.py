@@ -1,23 +1,44 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
 import uuid
-from collections import defaultdict
+from collections import Counter, defaultdict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from datetime import date, timedelta
 from decimal import Decimal
 
-from sqlalchemy import delete, func, select
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import ColumnElement, Numeric, and_, case, delete, exists, func, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.cache import CacheBackend, LRUCache
+from app.core.coalescing import WriteCoalescer
+from app.core.nutrition import (
+    ZERO,
+    MacroVector,
+    centi_to_decimal,
+    scale_grams,
+    scale_line,
+    servings_product_to_centi,
+    sum_vectors,
+    to_centi,
+)
+from app.core.planner import DayTargets, PlanSolution, Vector, optimize_week_async, rank_slot_candidates
+from app.core.pubsub import PG_CHANNEL, bridge_payload, get_pubsub
+from app.core.settings import get_settings
 from app.crud.foods import get_food_for_user_scope
 from app.crud.recipes import get_recipe_for_user
+from app.db.dialect import is_postgres, random_uuid, upsert_insert
+from app.models.day import Day
 from app.models.food import Food
 from app.models.grocery_list_item_check import GroceryListItemCheck
-from app.models.meal_entry import MealType
-from app.models.recipe import Recipe
+from app.models.meal_entry import MealEntry, MealType
+from app.models.recipe import Recipe, RecipeItem
+from app.models.recipe_tag import RecipeTag, RecipeTagLink
 from app.models.weekly_plan import WeeklyPlan, WeeklyPlanDay, WeeklyPlanMeal
 from app.schemas.plans import GenerateWeeklyPlanRequest, SwapWeeklyPlanMealRequest
 
@@ -30,18 +51,89 @@ _MEAL_SLOTS: tuple[MealType, ...] = (
 )
 
 
+class StalePlanPreviewError(ValueError):
+    """The plan an accept would commit differs from the one that was previewed."""
+
+
 def _stable_seed(*, user_id: uuid.UUID, week_start: date, target_kcal: int) -> int:
     # Keep deterministic across runs/processes.
     # user_id is a uuid; use int value to avoid hash randomization.
     return (user_id.int ^ (week_start.toordinal() << 8) ^ (target_kcal << 1)) & 0xFFFFFFFF
 
 
-def _pick_index(*, seed: int, day_idx: int, meal_idx: int, n: int) -> int:
-    # Small linear congruential mix for deterministic "random-like" selection.
-    if n <= 0:
-        return 0
-    x = (seed + (day_idx + 1) * 1103515245 + (meal_idx + 1) * 12345) & 0x7FFFFFFF
-    return x % n
+# Training days get more energy; the extra kcal is assigned to carbs when carbs are targeted.
+TRAINING_DAY_KCAL_FACTOR = 1.10
+
+
+def _day_targets(payload: GenerateWeeklyPlanRequest) -> list[DayTargets]:
+    """Per-day kcal/macro targets for the optimizer (Monday..Sunday)."""
+
+    training_dates = {td.date for td in (payload.training_schedule or [])}
+    out: list[DayTargets] = []
+    for day_idx in range(7):
+        base_kcal = float(payload.target_kcal)
+        kcal = base_kcal * TRAINING_DAY_KCAL_FACTOR if payload.week_start + timedelta(days=day_idx) in training_dates else base_kcal
+
+        protein = carbs = fat = None
+        if payload.macro_split_pct is not None:
+            split = payload.macro_split_pct
+            protein = kcal * split.protein_pct / 100 / 4
+            carbs = kcal * split.carbs_pct / 100 / 4
+            fat = kcal * split.fat_pct / 100 / 9
+        elif payload.macro_grams is not None:
+            grams = payload.macro_grams
+            protein = float(grams.protein_g) if grams.protein_g is not None else None
+            fat = float(grams.fat_g) if grams.fat_g is not None else None
+            if grams.carbs_g is not None:
+                carbs = float(grams.carbs_g) + (kcal - base_kcal) / 4
+
+        out.append(DayTargets(kcal=kcal, protein=protein, carbs=carbs, fat=fat))
+    return out
+
+
+def _plan_inputs(plan: WeeklyPlan) -> GenerateWeeklyPlanRequest:
+    """The generation inputs a plan was made from, rebuilt from its snapshot columns."""
+
+    macro_split_pct = json.loads(plan.macro_split_json) if plan.macro_split_json else None
+    macro_grams = None
+    if macro_split_pct is None and (plan.protein_g, plan.carbs_g, plan.fat_g) != (None, None, None):
+        macro_grams = {"protein_g": plan.protein_g, "carbs_g": plan.carbs_g, "fat_g": plan.fat_g}
+    return GenerateWeeklyPlanRequest(
+        week_start=plan.week_start,
+        target_kcal=plan.target_kcal,
+        macro_split_pct=macro_split_pct,
+        macro_grams=macro_grams,
+        training_schedule=json.loads(plan.training_schedule_json) if plan.training_schedule_json else None,
+    )
+
+
+def _recipe_vector(recipe: Recipe) -> Vector:
+    return (
+        float(recipe.kcal_per_serving),
+        float(recipe.protein_per_serving),
+        float(recipe.carbs_per_serving),
+        float(recipe.fat_per_serving),
+    )
+
+
+def _bump_version(plan: WeeklyPlan) -> None:
+    # SQL-side increment: the in-memory value may be stale after bulk bumps
+    # (crud.plan_versions), and concurrent writers are serialized by the row lock.
+    plan.version = WeeklyPlan.version + 1
+
+
+async def get_weekly_plan_version_for_user(
+    *, session: AsyncSession, user_id: uuid.UUID, week_start: date
+) -> tuple[uuid.UUID, int] | None:
+    """(plan_id, version) of the user's plan for the week, without loading its children."""
+
+    res = await session.execute(
+        select(WeeklyPlan.id, WeeklyPlan.version).where(
+            WeeklyPlan.user_id == user_id, WeeklyPlan.week_start == week_start
+        )
+    )
+    row = res.one_or_none()
+    return (row[0], row[1]) if row is not None else None
 
 
 async def get_weekly_plan_for_user(
@@ -51,11 +143,57 @@ async def get_weekly_plan_for_user(
         select(WeeklyPlan)
         .where(WeeklyPlan.user_id == user_id, WeeklyPlan.week_start == week_start)
         .options(selectinload(WeeklyPlan.days).selectinload(WeeklyPlanDay.meals))
+        # Targeted edits (UPDATE .. RETURNING) don't touch already loaded plans.
+        .execution_options(populate_existing=True)
     )
     res = await session.execute(stmt)
     return res.scalar_one_or_none()
 
 
+async def weekly_plan_macro_totals(
+    *, session: AsyncSession, user_id: uuid.UUID, plans: list[WeeklyPlan]
+) -> list[tuple[dict[uuid.UUID, MacroVector], MacroVector]]:
+    """Per-day and whole-week macros of loaded plans, in centi-units.
+
+    Uses the recipes' stored per-serving macros (one query for all recipes in the
+    plans) x planned servings. Sums are exact; days and the week are each rounded
+    once, so the week total is not a sum of rounded days.
+    """
+
+    recipe_ids = {m.recipe_id for plan in plans for d in plan.days for m in d.meals}
+    per_serving: dict[uuid.UUID, MacroVector] = {}
+    if recipe_ids:
+        res = await session.execute(
+            select(
+                Recipe.id,
+                Recipe.kcal_per_serving,
+                Recipe.protein_per_serving,
+                Recipe.carbs_per_serving,
+                Recipe.fat_per_serving,
+            ).where(Recipe.user_id == user_id, Recipe.id.in_(recipe_ids))
+        )
+        for rid, kcal, protein, carbs, fat in res.all():
+            per_serving[rid] = (to_centi(kcal), to_centi(protein), to_centi(carbs), to_centi(fat))
+    return _plans_macro_totals(plans, per_serving)
+
+
+def _plans_macro_totals(
+    plans: list[WeeklyPlan], per_serving: dict[uuid.UUID, MacroVector]
+) -> list[tuple[dict[uuid.UUID, MacroVector], MacroVector]]:
+    out: list[tuple[dict[uuid.UUID, MacroVector], MacroVector]] = []
+    for plan in plans:
+        day_totals: dict[uuid.UUID, MacroVector] = {}
+        day_exact: list[MacroVector] = []
+        for d in plan.days:
+            exact = sum_vectors(
+                [scale_line(per_serving.get(m.recipe_id, ZERO), to_centi(m.servings)) for m in d.meals]
+            )
+            day_exact.append(exact)
+            day_totals[d.id] = servings_product_to_centi(exact)
+        out.append((day_totals, servings_product_to_centi(sum_vectors(day_exact))))
+    return out
+
+
 async def delete_weekly_plan_for_user(*, session: AsyncSession, user_id: uuid.UUID, week_start: date) -> None:
     stmt = (
         delete(WeeklyPlan)
@@ -99,23 +237,157 @@ async def _list_recipes_for_generation(*, session: AsyncSession, user_id: uuid.U
     return list(res.scalars().all())
 
 
-async def generate_weekly_plan_for_user(
-    *, session: AsyncSession, user_id: uuid.UUID, payload: GenerateWeeklyPlanRequest
-) -> tuple[WeeklyPlan, dict[str, int]]:
-    """Generate or regenerate a weekly plan.
+class RecipePool:
+    """Candidate recipes as optimizer input, built once per generation request.
 
-    The caller controls the transaction scope (FastAPI request or test fixture).
-    We must *not* open a new transaction here because tests run inside an
-    already-open transaction.
+    Takes Recipe objects or rows with the same id and per-serving macro columns.
+    """
+
+    def __init__(self, recipes: list[Recipe]) -> None:
+        self.vectors: list[Vector] = [_recipe_vector(r) for r in recipes]
+        self.ids: list[uuid.UUID] = [r.id for r in recipes]
+        self._index = {rid: i for i, rid in enumerate(self.ids)}
+        # Exact per-serving macros (centi-units) for plan totals.
+        self.per_serving: dict[uuid.UUID, MacroVector] = {
+            r.id: (
+                to_centi(r.kcal_per_serving),
+                to_centi(r.protein_per_serving),
+                to_centi(r.carbs_per_serving),
+                to_centi(r.fat_per_serving),
+            )
+            for r in recipes
+        }
+
+    def copy(self) -> RecipePool:
+        """Independent copy (`index_of` may append), e.g. of a cached pool."""
+
+        pool = object.__new__(RecipePool)
+        pool.vectors = list(self.vectors)
+        pool.ids = list(self.ids)
+        pool._index = dict(self._index)
+        pool.per_serving = self.per_serving
+        return pool
+
+    def index_of(self, recipe_id: uuid.UUID) -> int:
+        idx = self._index.get(recipe_id)
+        if idx is None:
+            # Not a candidate (should not happen: recipes are the user's own); keep it
+            # without macros so a locked slot using it is still preserved.
+            idx = len(self.vectors)
+            self._index[recipe_id] = idx
+            self.vectors.append((0.0, 0.0, 0.0, 0.0))
+            self.ids.append(recipe_id)
+        return idx
+
+
+@dataclass
+class _WeekBuild:
+    plan: WeeklyPlan
+    summary: dict[str, int]
+    days: list[WeeklyPlanDay]
+    meals_by_day: dict[uuid.UUID, list[WeeklyPlanMeal]]
+    new_rows: list[WeeklyPlan | WeeklyPlanDay | WeeklyPlanMeal]
+    stale_rows: list[WeeklyPlanDay | WeeklyPlanMeal]
+    uses: Counter[int]
+
+
+def _locked_meals(plan: WeeklyPlan | None) -> dict[tuple[date, MealType], tuple[uuid.UUID, Decimal]]:
+    if plan is None:
+        return {}
+    return {
+        (d.date, m.meal_type): (m.recipe_id, Decimal(m.servings))
+        for d in plan.days
+        for m in d.meals
+        if m.locked
+    }
+
+
+# (meal_type, recipe_id, servings, locked) of one slot.
+_Slot = tuple[MealType, uuid.UUID, Decimal, bool]
+
+# Runs the optimizer: called with optimize_week's keyword arguments.
+WeekSolver = Callable[..., Awaitable[PlanSolution]]
+
+
+async def plan_week_slots(
+    *,
+    user_id: uuid.UUID,
+    payload: GenerateWeeklyPlanRequest,
+    pool: RecipePool,
+    locked_by_key: dict[tuple[date, MealType], tuple[uuid.UUID, Decimal]] | None = None,
+    prior_uses: Counter[int] | None = None,
+    solve: WeekSolver = optimize_week_async,
+) -> list[list[_Slot]]:
+    """Per day (Monday..Sunday), the meal of every slot for a user's generation inputs.
+
+    Locked meals are kept as they are and count towards their day's totals; the
+    other slots are the optimizer's picks. Seeded by user, week and kcal target, so
+    the same inputs give the same week wherever `solve` runs it (e.g. a process pool).
     """
 
-    await _pg_advisory_xact_lock(session=session, user_id=user_id, week_start=payload.week_start)
+    locked_by_key = locked_by_key or {}
+    locked_slots: dict[tuple[int, int], tuple[int, float]] = {}
+    for (day_date, meal_type), (recipe_id, servings) in locked_by_key.items():
+        idx = pool.index_of(recipe_id)
+        day_idx = (day_date - payload.week_start).days
+        if 0 <= day_idx < 7:
+            locked_slots[(day_idx, _MEAL_SLOTS.index(meal_type))] = (idx, float(servings))
+
+    solution = await solve(
+        recipe_macros=pool.vectors,
+        day_targets=_day_targets(payload),
+        locked=locked_slots,
+        seed=_stable_seed(user_id=user_id, week_start=payload.week_start, target_kcal=payload.target_kcal),
+        prior_uses=prior_uses,
+    )
 
-    recipes = await _list_recipes_for_generation(session=session, user_id=user_id)
-    if not recipes:
-        raise ValueError("No recipes available to generate a plan")
+    days: list[list[_Slot]] = []
+    for day_idx in range(7):
+        day_date = payload.week_start + timedelta(days=day_idx)
+        slots: list[_Slot] = []
+        for meal_idx, meal_type in enumerate(_MEAL_SLOTS):
+            locked = locked_by_key.get((day_date, meal_type))
+            if locked is not None:
+                slots.append((meal_type, locked[0], locked[1], True))
+            else:
+                idx, planned_servings = solution.assignments[day_idx][meal_idx]
+                servings = Decimal(str(planned_servings)).quantize(Decimal("0.01"))
+                slots.append((meal_type, pool.ids[idx], servings, False))
+        days.append(slots)
+    return days
 
-    seed = _stable_seed(user_id=user_id, week_start=payload.week_start, target_kcal=payload.target_kcal)
+
+def weekly_plan_preview_token(*, user_id: uuid.UUID, payload: GenerateWeeklyPlanRequest, slots: list[list[_Slot]]) -> str:
+    """Digest of a generated week and everything it was generated from.
+
+    Generation is deterministic (seeded by user, week and kcal target, and the
+    optimizer stops on move counts, never on wall time), so the same inputs over the
+    same recipes and locked meals give the same token however busy the worker is;
+    anything that changes the outcome changes it.
+    """
+
+    inputs = payload.model_dump(mode="json", include=set(GenerateWeeklyPlanRequest.model_fields))
+    data = {
+        "seed": _stable_seed(user_id=user_id, week_start=payload.week_start, target_kcal=payload.target_kcal),
+        "inputs": inputs,
+        "slots": [[[mt.value, str(rid), str(servings), locked] for mt, rid, servings, locked in day] for day in slots],
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(",", ":")).encode()).hexdigest()[:32]
+
+
+def _build_week(
+    *,
+    user_id: uuid.UUID,
+    payload: GenerateWeeklyPlanRequest,
+    plan: WeeklyPlan | None,
+    pool: RecipePool,
+    slots: list[list[_Slot]],
+) -> _WeekBuild:
+    """Diff one week's `slots` against `plan` (its days/meals loaded), in memory.
+
+    Nothing is flushed: the caller adds `new_rows`, deletes `stale_rows` and flushes
+    once for all weeks of the request.
+    """
 
     macro_grams = payload.macro_grams
     protein_g = macro_grams.protein_g if macro_grams is not None else None
@@ -128,179 +400,441 @@ async def generate_weekly_plan_for_user(
         else None
     )
     preferences_json = json.dumps(payload.preferences) if payload.preferences is not None else None
-
-    # Lock existing plan row if present so we can update in place.
-    existing_stmt = (
-        select(WeeklyPlan)
-        .where(WeeklyPlan.user_id == user_id, WeeklyPlan.week_start == payload.week_start)
-        .options(selectinload(WeeklyPlan.days).selectinload(WeeklyPlanDay.meals))
-        .with_for_update()
+    macro_split_json = (
+        json.dumps(payload.macro_split_pct.model_dump(), sort_keys=True) if payload.macro_split_pct is not None else None
     )
-    existing_res = await session.execute(existing_stmt)
-    plan = existing_res.scalar_one_or_none()
 
-    locked_by_key: dict[tuple[date, MealType], tuple[uuid.UUID, Decimal]] = {}
-    locked_total = 0
+    existing_days: dict[date, WeeklyPlanDay] | None = None
+    new_rows: list[WeeklyPlan | WeeklyPlanDay | WeeklyPlanMeal] = []
 
     if plan is None:
         plan = WeeklyPlan(
+            id=uuid.uuid4(),
             user_id=user_id,
             week_start=payload.week_start,
             target_kcal=payload.target_kcal,
             protein_g=protein_g,
             carbs_g=carbs_g,
             fat_g=fat_g,
+            macro_split_json=macro_split_json,
             training_schedule_json=training_schedule_json,
             preferences_json=preferences_json,
         )
-        session.add(plan)
-        await session.flush()  # allocate plan.id
+        # Flushed together with the children below.
+        new_rows.append(plan)
     else:
-        # Reload locked meals from DB to ensure we see out-of-band updates
-        # (tests modify rows via raw SQL on the same connection).
-        locked_stmt = (
-            select(WeeklyPlanDay.date, WeeklyPlanMeal.meal_type, WeeklyPlanMeal.recipe_id, WeeklyPlanMeal.servings)
-            .join(WeeklyPlanMeal, WeeklyPlanMeal.weekly_plan_day_id == WeeklyPlanDay.id)
-            .where(WeeklyPlanDay.weekly_plan_id == plan.id, WeeklyPlanMeal.locked.is_(True))
-        )
-        locked_res = await session.execute(locked_stmt)
-        for day_date, meal_type, recipe_id, servings in locked_res.all():
-            locked_by_key[(day_date, meal_type)] = (recipe_id, Decimal(servings))
-        locked_total = len(locked_by_key)
+        existing_days = {d.date: d for d in plan.days}
 
-        # Update plan metadata in place.
+        # Update plan metadata in place (unchanged values emit no UPDATE).
         plan.target_kcal = payload.target_kcal
         plan.protein_g = protein_g
         plan.carbs_g = carbs_g
         plan.fat_g = fat_g
+        plan.macro_split_json = macro_split_json
         plan.training_schedule_json = training_schedule_json
         plan.preferences_json = preferences_json
 
-        # Replace children in the same transaction while keeping the plan row intact.
-        await session.execute(
-            delete(WeeklyPlanMeal)
-            .where(
-                WeeklyPlanMeal.weekly_plan_day_id.in_(
-                    select(WeeklyPlanDay.id).where(WeeklyPlanDay.weekly_plan_id == plan.id)
-                )
-            )
-            .execution_options(synchronize_session=False)
-        )
-        await session.execute(
-            delete(WeeklyPlanDay)
-            .where(WeeklyPlanDay.weekly_plan_id == plan.id)
-            .execution_options(synchronize_session=False)
-        )
-        await session.flush()
-
-    # Summary counters (computed vs deterministic choice).
     locked_kept = 0
-    locked_changed = 0
     unlocked_changed = 0
-
+    meals_changed = False
+
+    # Diff the new assignment against the existing rows: unchanged slots are left
+    # alone, changed slots are updated in place (meal ids stay stable), and only
+    # structural differences become INSERTs/DELETEs. New rows get client-side UUIDs
+    # so they go out as one multi-row INSERT per table in a single flush, and the
+    # response is built from these objects without refresh queries.
+    stale_rows: list[WeeklyPlanDay | WeeklyPlanMeal] = []
+    days: list[WeeklyPlanDay] = []
+    meals_by_day: dict[uuid.UUID, list[WeeklyPlanMeal]] = {}
+    uses: Counter[int] = Counter()
     for day_idx in range(7):
-        d = WeeklyPlanDay(weekly_plan_id=plan.id, date=payload.week_start + timedelta(days=day_idx))
-        session.add(d)
-        await session.flush()
-
-        for meal_idx, meal_type in enumerate(_MEAL_SLOTS):
-            key = (d.date, meal_type)
-            locked = locked_by_key.get(key)
-
-            chosen = recipes[_pick_index(seed=seed, day_idx=day_idx, meal_idx=meal_idx, n=len(recipes))]
-            chosen_recipe_id = chosen.id
-
-            if locked is not None:
-                recipe_id, servings = locked
-                locked_flag = True
-
-                if recipe_id == chosen_recipe_id:
-                    locked_kept += 1
-                else:
-                    locked_changed += 1
-            else:
-                recipe_id = chosen_recipe_id
-                servings = Decimal("1.00")
-                locked_flag = False
-                unlocked_changed += 1
-
-            session.add(
-                WeeklyPlanMeal(
+        day_date = payload.week_start + timedelta(days=day_idx)
+        d = existing_days.pop(day_date, None) if existing_days is not None else None
+        if d is None:
+            d = WeeklyPlanDay(id=uuid.uuid4(), weekly_plan_id=plan.id, date=day_date)
+            new_rows.append(d)
+            existing_meals: dict[MealType, WeeklyPlanMeal] = {}
+        else:
+            existing_meals = {m.meal_type: m for m in d.meals}
+        days.append(d)
+        meals_by_day[d.id] = []
+
+        for meal_type, recipe_id, servings, locked_flag in slots[day_idx]:
+            if locked_flag:
+                locked_kept += 1
+            uses[pool.index_of(recipe_id)] += 1
+
+            m = existing_meals.pop(meal_type, None)
+            if m is None:
+                m = WeeklyPlanMeal(
+                    id=uuid.uuid4(),
                     weekly_plan_day_id=d.id,
                     meal_type=meal_type,
                     recipe_id=recipe_id,
                     servings=servings,
                     locked=locked_flag,
                 )
-            )
-
-    await session.flush()
-
-    # Ensure relationships are loaded for the response without doing an extra query.
-    await session.refresh(plan)
-    await session.refresh(plan, attribute_names=["days"])
-    for d in plan.days:
-        await session.refresh(d, attribute_names=["meals"])
-
+                new_rows.append(m)
+                if not locked_flag:
+                    unlocked_changed += 1
+            elif m.recipe_id != recipe_id or m.servings != servings or m.locked != locked_flag:
+                m.recipe_id = recipe_id
+                m.servings = servings
+                m.locked = locked_flag
+                meals_changed = True
+                if not locked_flag:
+                    unlocked_changed += 1
+            meals_by_day[d.id].append(m)
+
+        stale_rows.extend(existing_meals.values())
+    if existing_days is not None:
+        stale_rows.extend(existing_days.values())
+        if meals_changed or stale_rows or new_rows:
+            # New plans start at version 1 (column default).
+            _bump_version(plan)
+
+    # Locked meals are inputs to the optimizer, so they are always kept;
+    # unlocked_changed counts slots whose recipe or servings were (re)written.
     summary = {
         "locked_kept": locked_kept,
-        "locked_changed": locked_changed,
+        "locked_changed": 0,
         "unlocked_changed": unlocked_changed,
     }
-    # Sanity: if there were no locked meals, kept/changed must be 0.
-    if locked_total == 0:
-        summary["locked_kept"] = 0
-        summary["locked_changed"] = 0
-
-    return plan, summary
+    return _WeekBuild(
+        plan=plan,
+        summary=summary,
+        days=days,
+        meals_by_day=meals_by_day,
+        new_rows=new_rows,
+        stale_rows=stale_rows,
+        uses=uses,
+    )
 
 
-async def swap_weekly_plan_meal_for_user(
+async def generate_weekly_plans_for_user(
     *,
     session: AsyncSession,
     user_id: uuid.UUID,
-    week_start: date,
-    payload: SwapWeeklyPlanMealRequest,
-) -> WeeklyPlan:
-    await _pg_advisory_xact_lock(session=session, user_id=user_id, week_start=week_start)
+    payload: GenerateWeeklyPlanRequest,
+    weeks: int = 1,
+    cross_week_variety: bool = False,
+    expected_preview_token: str | None = None,
+) -> list[tuple[WeeklyPlan, dict[str, int]]]:
+    """Generate or regenerate `weeks` consecutive weekly plans from `payload.week_start`.
+
+    All weeks share one recipe pool and one transaction; advisory locks are taken in
+    week order (so overlapping range requests cannot deadlock), existing plans are
+    loaded with one query, and all new rows go out in a single flush. With
+    `cross_week_variety`, recipe use in earlier weeks counts against reuse in later
+    ones. With `expected_preview_token`, the first week must come out exactly as
+    previewed (see preview_weekly_plan_for_user), else StalePlanPreviewError.
 
-    if payload.date < week_start or payload.date > (week_start + timedelta(days=6)):
-        raise ValueError("date must be within the specified week")
+    The caller controls the transaction scope (FastAPI request or test fixture).
+    We must *not* open a new transaction here because tests run inside an
+    already-open transaction.
+    """
+
+    week_starts = [payload.week_start + timedelta(weeks=i) for i in range(weeks)]
+    for week_start in week_starts:
+        await _pg_advisory_xact_lock(session=session, user_id=user_id, week_start=week_start)
+
+    recipes = await _list_recipes_for_generation(session=session, user_id=user_id)
+    if not recipes:
+        raise ValueError("No recipes available to generate a plan")
+    pool = RecipePool(recipes)
 
-    # Load plan first so we can differentiate 404 (missing plan/slot) from 422 (validation).
-    plan_stmt = (
+    # Lock existing plan rows so we can update them in place. Their days and meals are
+    # loaded with them (fresh from the DB) so regeneration can diff against them.
+    existing_stmt = (
         select(WeeklyPlan)
-        .where(WeeklyPlan.user_id == user_id, WeeklyPlan.week_start == week_start)
+        .where(WeeklyPlan.user_id == user_id, WeeklyPlan.week_start.in_(week_starts))
         .options(selectinload(WeeklyPlan.days).selectinload(WeeklyPlanDay.meals))
         .with_for_update()
+        .execution_options(populate_existing=True)
     )
-    plan_res = await session.execute(plan_stmt)
-    plan = plan_res.scalar_one_or_none()
-    if plan is None:
-        raise LookupError("Weekly plan not found")
+    existing_res = await session.execute(existing_stmt)
+    existing_by_week = {p.week_start: p for p in existing_res.scalars().all()}
+
+    builds: list[_WeekBuild] = []
+    prior_uses: Counter[int] = Counter()
+    for week_start in week_starts:
+        week_payload = payload if week_start == payload.week_start else payload.model_copy(update={"week_start": week_start})
+        plan = existing_by_week.get(week_start)
+        locked_by_key = _locked_meals(plan)
+        slots = await plan_week_slots(
+            user_id=user_id,
+            payload=week_payload,
+            pool=pool,
+            locked_by_key=locked_by_key,
+            prior_uses=prior_uses if cross_week_variety else None,
+        )
+        if expected_preview_token is not None and week_start == payload.week_start:
+            if weekly_plan_preview_token(user_id=user_id, payload=week_payload, slots=slots) != expected_preview_token:
+                raise StalePlanPreviewError("Plan preview is out of date; preview again")
+        build = _build_week(user_id=user_id, payload=week_payload, plan=plan, pool=pool, slots=slots)
+        prior_uses.update(build.uses)
+        builds.append(build)
+
+    for build in builds:
+        for row in build.stale_rows:
+            await session.delete(row)
+        session.add_all(build.new_rows)
+    await session.flush()
 
-    day = next((d for d in plan.days if d.date == payload.date), None)
-    if day is None:
-        raise LookupError("Weekly plan day not found")
+    # Attach the children as loaded collections (no SQL, no change history).
+    for build in builds:
+        set_committed_value(build.plan, "days", build.days)
+        for d in build.days:
+            set_committed_value(d, "meals", build.meals_by_day[d.id])
+
+    return [(build.plan, build.summary) for build in builds]
+
+
+async def generate_weekly_plan_for_user(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    payload: GenerateWeeklyPlanRequest,
+    expected_preview_token: str | None = None,
+) -> tuple[WeeklyPlan, dict[str, int]]:
+    """Generate or regenerate a weekly plan (see generate_weekly_plans_for_user)."""
+
+    [result] = await generate_weekly_plans_for_user(
+        session=session,
+        user_id=user_id,
+        payload=payload,
+        expected_preview_token=expected_preview_token,
+    )
+    return result
+
+
+_RECIPE_POOL_CACHE_SIZE = 256
+_recipe_pool_cache: CacheBackend = LRUCache(maxsize=_RECIPE_POOL_CACHE_SIZE)
+
+
+def get_recipe_pool_cache() -> CacheBackend:
+    return _recipe_pool_cache
+
+
+async def _cached_recipe_pool(*, session: AsyncSession, user_id: uuid.UUID) -> RecipePool:
+    """The user's recipe pool, rebuilt only when their recipes changed.
+
+    Validated by one aggregate query: every recipe write (including macro refreshes
+    after food edits) moves `updated_at` and usually the macro sums, and adds/deletes
+    move the count. A stale hit is harmless beyond the preview itself: accepting
+    re-solves from fresh rows and rejects a preview that no longer matches.
+    """
+
+    res = await session.execute(
+        select(
+            func.count(Recipe.id),
+            func.max(Recipe.updated_at),
+            func.sum(Recipe.kcal_per_serving),
+            func.sum(Recipe.protein_per_serving),
+            func.sum(Recipe.carbs_per_serving),
+            func.sum(Recipe.fat_per_serving),
+        ).where(Recipe.user_id == user_id)
+    )
+    count, *fingerprint = res.one()
+    if not count:
+        raise ValueError("No recipes available to generate a plan")
+
+    key = (user_id, count, *(str(v) for v in fingerprint))
+    pool: RecipePool | None = _recipe_pool_cache.get(key)
+    if pool is None:
+        pool = RecipePool(await _list_recipes_for_generation(session=session, user_id=user_id))
+        _recipe_pool_cache.set(key, pool)
+    return pool.copy()
+
+
+@dataclass
+class WeeklyPlanPreview:
+    # Transient plan with days/meals attached; never added to the session.
+    plan: WeeklyPlan
+    day_totals: dict[uuid.UUID, MacroVector]
+    week_total: MacroVector
+    token: str
+
+
+async def preview_weekly_plan_for_user(
+    *, session: AsyncSession, user_id: uuid.UUID, payload: GenerateWeeklyPlanRequest
+) -> WeeklyPlanPreview:
+    """Generate a week in memory, exactly as generating it now would, writing nothing.
 
-    meal = next((m for m in day.meals if m.meal_type == payload.meal_type), None)
+    No advisory/row locks and no flush: reads are the cached recipe pool check and the
+    existing plan's locked meals. Commit it with generate_weekly_plan_for_user and
+    `expected_preview_token=preview.token`.
+    """
+
+    pool = await _cached_recipe_pool(session=session, user_id=user_id)
+
+    res = await session.execute(
+        select(WeeklyPlanDay.date, WeeklyPlanMeal.meal_type, WeeklyPlanMeal.recipe_id, WeeklyPlanMeal.servings)
+        .join(WeeklyPlanMeal, WeeklyPlanMeal.weekly_plan_day_id == WeeklyPlanDay.id)
+        .join(WeeklyPlan, WeeklyPlan.id == WeeklyPlanDay.weekly_plan_id)
+        .where(
+            WeeklyPlan.user_id == user_id,
+            WeeklyPlan.week_start == payload.week_start,
+            WeeklyPlanMeal.locked.is_(True),
+        )
+    )
+    locked_by_key = {(d, mt): (rid, Decimal(servings)) for d, mt, rid, servings in res.all()}
+
+    slots = await plan_week_slots(user_id=user_id, payload=payload, pool=pool, locked_by_key=locked_by_key)
+    build = _build_week(user_id=user_id, payload=payload, plan=None, pool=pool, slots=slots)
+    set_committed_value(build.plan, "days", build.days)
+    for d in build.days:
+        set_committed_value(d, "meals", build.meals_by_day[d.id])
+
+    [(day_totals, week_total)] = _plans_macro_totals([build.plan], pool.per_serving)
+    return WeeklyPlanPreview(
+        plan=build.plan,
+        day_totals=day_totals,
+        week_total=week_total,
+        token=weekly_plan_preview_token(user_id=user_id, payload=payload, slots=slots),
+    )
+
+
+async def insert_generated_weekly_plans(
+    *,
+    session: AsyncSession,
+    plans: list[tuple[uuid.UUID, GenerateWeeklyPlanRequest, list[list[_Slot]]]],
+) -> int:
+    """Bulk-insert new plans from (user_id, inputs, slots); returns how many were created.
+
+    One executemany INSERT per table, for batch generation. Users that already have a
+    plan for the week are skipped (ON CONFLICT DO NOTHING), never overwritten.
+    """
+
+    if not plans:
+        return 0
+
+    plan_rows: list[dict] = []
+    children: dict[uuid.UUID, tuple[GenerateWeeklyPlanRequest, list[list[_Slot]]]] = {}
+    for user_id, payload, slots in plans:
+        plan_id = uuid.uuid4()
+        grams = payload.macro_grams
+        plan_rows.append(
+            {
+                "id": plan_id,
+                "user_id": user_id,
+                "week_start": payload.week_start,
+                "target_kcal": payload.target_kcal,
+                "protein_g": grams.protein_g if grams is not None else None,
+                "carbs_g": grams.carbs_g if grams is not None else None,
+                "fat_g": grams.fat_g if grams is not None else None,
+                "version": 1,
+            }
+        )
+        children[plan_id] = (payload, slots)
+
+    table = WeeklyPlan.__table__
+    res = await session.execute(
+        upsert_insert(session, table)
+        .on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.week_start])
+        .returning(table.c.id),
+        plan_rows,
+    )
+    created = [row[0] for row in res.all()]
+
+    day_rows: list[dict] = []
+    meal_rows: list[dict] = []
+    for plan_id in created:
+        payload, slots = children[plan_id]
+        for day_idx, day_slots in enumerate(slots):
+            day_id = uuid.uuid4()
+            day_rows.append({"id": day_id, "weekly_plan_id": plan_id, "date": payload.week_start + timedelta(days=day_idx)})
+            for meal_type, recipe_id, servings, locked in day_slots:
+                meal_rows.append(
+                    {
+                        "id": uuid.uuid4(),
+                        "weekly_plan_day_id": day_id,
+                        "meal_type": meal_type,
+                        "recipe_id": recipe_id,
+                        "servings": servings,
+                        "locked": locked,
+                    }
+                )
+    if day_rows:
+        await session.execute(WeeklyPlanDay.__table__.insert(), day_rows)
+        await session.execute(WeeklyPlanMeal.__table__.insert(), meal_rows)
+    return len(created)
+
+
+def _plan_meal_scope(*, user_id: uuid.UUID, week_start: date) -> tuple[ColumnElement[bool], ...]:
+    # UPDATE .. FROM criteria restricting meal rows to the user's plan for the week.
+    return (
+        WeeklyPlanMeal.weekly_plan_day_id == WeeklyPlanDay.id,
+        WeeklyPlanDay.weekly_plan_id == WeeklyPlan.id,
+        WeeklyPlan.user_id == user_id,
+        WeeklyPlan.week_start == week_start,
+    )
+
+
+async def _update_plan_meal(
+    *, session: AsyncSession, user_id: uuid.UUID, week_start: date, where: tuple, values: dict
+) -> WeeklyPlanMeal | None:
+    """Targeted meal edit: one UPDATE scoped to the user's plan, returning the row.
+
+    Bumps the plan version only if a row matched. Returned meals are refreshed in the
+    identity map; loaded plans are not (use populate_existing to re-read them).
+    """
+
+    await _pg_advisory_xact_lock(session=session, user_id=user_id, week_start=week_start)
+
+    res = await session.execute(
+        update(WeeklyPlanMeal)
+        .where(*_plan_meal_scope(user_id=user_id, week_start=week_start), *where)
+        .values(**values)
+        .returning(WeeklyPlanMeal)
+        .execution_options(synchronize_session=False)
+    )
+    meal = res.scalar_one_or_none()
     if meal is None:
-        raise LookupError("Weekly plan meal slot not found")
+        return None
 
-    recipe = await get_recipe_for_user(session=session, user_id=user_id, recipe_id=payload.new_recipe_id)
-    if recipe is None:
-        raise LookupError("Recipe not found")
+    await session.execute(
+        update(WeeklyPlan)
+        .where(WeeklyPlan.user_id == user_id, WeeklyPlan.week_start == week_start)
+        .values(version=WeeklyPlan.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return meal
 
-    meal.recipe_id = recipe.id
-    meal.locked = bool(payload.lock)
-    await session.flush()
 
-    await session.refresh(plan)
-    await session.refresh(plan, attribute_names=["days"])
-    for d in plan.days:
-        await session.refresh(d, attribute_names=["meals"])
+async def swap_weekly_plan_meal_for_user(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    week_start: date,
+    payload: SwapWeeklyPlanMealRequest,
+) -> WeeklyPlanMeal:
+    if payload.date < week_start or payload.date > (week_start + timedelta(days=6)):
+        raise ValueError("date must be within the specified week")
+
+    recipe_owned = (
+        select(Recipe.id).where(Recipe.id == payload.new_recipe_id, Recipe.user_id == user_id).exists()
+    )
+    meal = await _update_plan_meal(
+        session=session,
+        user_id=user_id,
+        week_start=week_start,
+        where=(WeeklyPlanDay.date == payload.date, WeeklyPlanMeal.meal_type == payload.meal_type, recipe_owned),
+        values={
+            "recipe_id": payload.new_recipe_id,
+            "locked": bool(payload.lock),
+            **({"servings": payload.servings} if payload.servings is not None else {}),
+        },
+    )
+    if meal is not None:
+        return meal
 
-    return plan
+    # Nothing matched: work out why (error path only).
+    if not (await session.execute(select(recipe_owned))).scalar():
+        raise LookupError("Recipe not found")
+    if await get_weekly_plan_version_for_user(session=session, user_id=user_id, week_start=week_start) is None:
+        raise LookupError("Weekly plan not found")
+    raise LookupError("Weekly plan meal slot not found")
 
 
 async def set_weekly_plan_meal_lock_for_user(
@@ -310,46 +844,192 @@ async def set_weekly_plan_meal_lock_for_user(
     week_start: date,
     meal_id: uuid.UUID,
     locked: bool,
-) -> WeeklyPlan:
-    await _pg_advisory_xact_lock(session=session, user_id=user_id, week_start=week_start)
-
-    plan_stmt = (
-        select(WeeklyPlan)
-        .where(WeeklyPlan.user_id == user_id, WeeklyPlan.week_start == week_start)
-        .options(selectinload(WeeklyPlan.days).selectinload(WeeklyPlanDay.meals))
-        .with_for_update()
+) -> WeeklyPlanMeal:
+    meal = await _update_plan_meal(
+        session=session,
+        user_id=user_id,
+        week_start=week_start,
+        where=(WeeklyPlanMeal.id == meal_id,),
+        values={"locked": bool(locked)},
     )
-    plan_res = await session.execute(plan_stmt)
-    plan = plan_res.scalar_one_or_none()
-    if plan is None:
+    if meal is not None:
+        return meal
+
+    if await get_weekly_plan_version_for_user(session=session, user_id=user_id, week_start=week_start) is None:
         raise LookupError("Weekly plan not found")
+    raise LookupError("Weekly plan meal not found")
 
-    meal: WeeklyPlanMeal | None = None
-    for d in plan.days:
-        for m in d.meals:
-            if m.id == meal_id:
-                meal = m
-                break
-        if meal is not None:
-            break
 
-    if meal is None:
+@dataclass
+class MealAlternative:
+    recipe_id: uuid.UUID
+    name: str
+    servings: Decimal
+    # Day totals (centi-units) with this recipe in the slot.
+    day_totals: MacroVector
+
+
+async def weekly_plan_meal_alternatives_for_user(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    week_start: date,
+    meal_id: uuid.UUID,
+    tags: list[str] | None = None,
+    limit: int = 10,
+) -> tuple[date, DayTargets, list[MealAlternative]]:
+    """Recipes to swap into a planned meal, best for the day's targets first.
+
+    Every candidate from the cached recipe pool gets its best servings for the slot
+    and is ranked by how far the day would then be from its targets (the optimizer's
+    cost, planner.rank_slot_candidates). Only the day's meals and, with `tags`, the
+    matching recipe ids are read from the DB besides the pool check.
+
+    Returns the day's date, its targets as the generator saw them (training-day
+    kcal, macro split) and the alternatives.
+    """
+
+    day_of_meal = select(WeeklyPlanMeal.weekly_plan_day_id).where(WeeklyPlanMeal.id == meal_id).scalar_subquery()
+    res = await session.execute(
+        select(WeeklyPlan, WeeklyPlanDay.date, WeeklyPlanMeal.id, WeeklyPlanMeal.recipe_id, WeeklyPlanMeal.servings)
+        .join(WeeklyPlanDay, WeeklyPlanDay.weekly_plan_id == WeeklyPlan.id)
+        .join(WeeklyPlanMeal, WeeklyPlanMeal.weekly_plan_day_id == WeeklyPlanDay.id)
+        .where(
+            WeeklyPlan.user_id == user_id,
+            WeeklyPlan.week_start == week_start,
+            WeeklyPlanDay.id == day_of_meal,
+        )
+    )
+    rows = res.all()
+    if not any(row[2] == meal_id for row in rows):
         raise LookupError("Weekly plan meal not found")
+    plan, day_date = rows[0][0], rows[0][1]
+    current_recipe_id = next(row[3] for row in rows if row[2] == meal_id)
+    others = [(row[3], Decimal(row[4])) for row in rows if row[2] != meal_id]
+
+    pool = await _cached_recipe_pool(session=session, user_id=user_id)
+
+    candidates: list[int] | range = range(len(pool.ids))
+    tag_names = sorted({t.strip().lower() for t in tags or [] if t.strip()})
+    if tag_names:
+        tagged = await session.execute(
+            select(RecipeTagLink.recipe_id)
+            .join(RecipeTag, RecipeTag.id == RecipeTagLink.tag_id)
+            .join(Recipe, Recipe.id == RecipeTagLink.recipe_id)
+            .where(Recipe.user_id == user_id, func.lower(RecipeTag.name).in_(tag_names))
+            .group_by(RecipeTagLink.recipe_id)
+            .having(func.count(func.distinct(RecipeTag.id)) >= len(tag_names))
+        )
+        candidates = [pool.index_of(rid) for rid in tagged.scalars().all()]
+    current_idx = pool.index_of(current_recipe_id)
+    candidates = [idx for idx in candidates if idx != current_idx]
+
+    rest = [0.0, 0.0, 0.0, 0.0]
+    rest_exact: list[MacroVector] = []
+    for recipe_id, servings in others:
+        v = pool.vectors[pool.index_of(recipe_id)]
+        for i in range(4):
+            rest[i] += v[i] * float(servings)
+        rest_exact.append(scale_line(pool.per_serving.get(recipe_id, ZERO), to_centi(servings)))
+
+    day_target = _day_targets(_plan_inputs(plan))[(day_date - plan.week_start).days]
+    ranked = rank_slot_candidates(
+        recipe_macros=pool.vectors,
+        target=day_target,
+        rest=tuple(rest),  # type: ignore[arg-type]
+        candidates=candidates,
+        k=limit,
+    )
+    if not ranked:
+        return day_date, day_target, []
+
+    ids = [pool.ids[idx] for idx, _, _ in ranked]
+    names_res = await session.execute(select(Recipe.id, Recipe.name).where(Recipe.user_id == user_id, Recipe.id.in_(ids)))
+    names = dict(names_res.all())
+
+    out: list[MealAlternative] = []
+    for idx, planned_servings, _cost in ranked:
+        recipe_id = pool.ids[idx]
+        if recipe_id not in names:
+            continue  # deleted since the pool was cached
+        servings = Decimal(str(planned_servings)).quantize(Decimal("0.01"))
+        line = scale_line(pool.per_serving.get(recipe_id, ZERO), to_centi(servings))
+        out.append(
+            MealAlternative(
+                recipe_id=recipe_id,
+                name=names[recipe_id],
+                servings=servings,
+                day_totals=servings_product_to_centi(sum_vectors([*rest_exact, line])),
+            )
+        )
+    return day_date, day_target, out
 
-    meal.locked = bool(locked)
-    await session.flush()
 
-    await session.refresh(plan)
-    await session.refresh(plan, attribute_names=["days"])
-    for d in plan.days:
-        await session.refresh(d, attribute_names=["meals"])
+async def weekly_plan_day_macro_totals(
+    *, session: AsyncSession, user_id: uuid.UUID, day_id: uuid.UUID
+) -> tuple[WeeklyPlan, date, MacroVector]:
+    """(plan, day date, day totals in centi-units) for one day, in one query.
+
+    Same arithmetic as weekly_plan_macro_totals, for responses about a single edit.
+    """
+
+    res = await session.execute(
+        select(
+            WeeklyPlan,
+            WeeklyPlanDay.date,
+            WeeklyPlanMeal.servings,
+            Recipe.kcal_per_serving,
+            Recipe.protein_per_serving,
+            Recipe.carbs_per_serving,
+            Recipe.fat_per_serving,
+        )
+        .join(WeeklyPlanDay, WeeklyPlanDay.weekly_plan_id == WeeklyPlan.id)
+        .join(WeeklyPlanMeal, WeeklyPlanMeal.weekly_plan_day_id == WeeklyPlanDay.id)
+        .outerjoin(Recipe, (Recipe.id == WeeklyPlanMeal.recipe_id) & (Recipe.user_id == user_id))
+        .where(WeeklyPlanDay.id == day_id, WeeklyPlan.user_id == user_id)
+    )
+    rows = res.all()
+    if not rows:
+        raise LookupError("Weekly plan day not found")
 
-    return plan
+    lines: list[MacroVector] = []
+    for _plan, _date, servings, *macros in rows:
+        per_serving = ZERO if macros[0] is None else tuple(to_centi(v) for v in macros)
+        lines.append(scale_line(per_serving, to_centi(servings)))  # type: ignore[arg-type]
+    plan, day_date = rows[0][0], rows[0][1]
+    return plan, day_date, servings_product_to_centi(sum_vectors(lines))
 
 
 _slug_ws = re.compile(r"\s+")
 
 
+# Computed grocery lists (without checked state), keyed by (plan_id, plan.version).
+# The default backend is per-process; swap in a shared one with set_grocery_list_cache.
+# Values are lists of GroceryListItemOut, so an out-of-process backend has to
+# serialize them itself.
+GROCERY_LIST_CACHE_SIZE = 512
+
+_grocery_list_cache: CacheBackend = LRUCache(maxsize=GROCERY_LIST_CACHE_SIZE)
+
+
+def get_grocery_list_cache() -> CacheBackend:
+    return _grocery_list_cache
+
+
+def set_grocery_list_cache(backend: CacheBackend) -> None:
+    global _grocery_list_cache
+    _grocery_list_cache = backend
+
+
+def grocery_list_etag(*, plan_id: uuid.UUID, version: int, checked_by_key: dict[str, bool]) -> str:
+    """Weak ETag over everything the grocery response depends on: plan version + checks."""
+
+    checks = hashlib.sha1(
+        "\n".join(f"{k}\t{int(v)}" for k, v in sorted(checked_by_key.items())).encode()
+    ).hexdigest()[:16]
+    return f'W/"{plan_id.hex}-{version}-{checks}"'
+
+
 def grocery_item_key_from_food(*, food: Food) -> str:
     # Stable, low-tech key: normalized food name + brand (if present).
     # This keeps matches stable across regenerated lists, and is user friendly.
@@ -372,79 +1052,108 @@ async def _checked_map_for_week(
     return {k: bool(v) for k, v in res.all()}
 
 
-async def upsert_grocery_item_check(
-    *, session: AsyncSession, user_id: uuid.UUID, week_start: date, item_key: str, checked: bool
-) -> None:
-    """Postgres-safe upsert with sqlite-compatible fallback.
+# Rows per INSERT statement. Each row binds 5 parameters; SQLite builds before 3.32
+# cap a statement at 999, Postgres at 65535.
+_CHECKS_UPSERT_CHUNK_POSTGRES = 2000
+_CHECKS_UPSERT_CHUNK_SQLITE = 150
 
-    Production can receive concurrent PUTs from debounced clients; update-then-insert
-    is racy under concurrency. On Postgres we use `INSERT .. ON CONFLICT DO UPDATE`.
 
-    In tests we run on SQLite; use update-then-insert with an IntegrityError retry.
+async def bulk_upsert_grocery_item_checks(
+    *, session: AsyncSession, user_id: uuid.UUID, week_start: date, items: list[tuple[str, bool]]
+) -> None:
+    """Set checked state for many items with one `INSERT .. ON CONFLICT DO UPDATE`.
+
+    Both Postgres and SQLite support multi-row upserts; inputs are only chunked to
+    stay under the dialect's bind-parameter limit (one statement for normal lists).
     """
 
-    if session.bind is not None and session.bind.dialect.name == "postgresql":
-        from sqlalchemy.dialects.postgresql import insert
+    # Last write per key wins, as with sequential updates. Postgres also refuses to
+    # touch the same row twice in one ON CONFLICT statement.
+    latest = dict(items)
+    if not latest:
+        return
 
-        stmt = insert(GroceryListItemCheck).values(
-            user_id=user_id,
-            week_start=week_start,
-            item_key=item_key,
-            checked=checked,
-        )
+    rows = [
+        {"id": uuid.uuid4(), "user_id": user_id, "week_start": week_start, "item_key": key, "checked": checked}
+        for key, checked in latest.items()
+    ]
+    chunk = _CHECKS_UPSERT_CHUNK_POSTGRES if is_postgres(session) else _CHECKS_UPSERT_CHUNK_SQLITE
+    for i in range(0, len(rows), chunk):
+        stmt = upsert_insert(session, GroceryListItemCheck).values(rows[i : i + chunk])
         stmt = stmt.on_conflict_do_update(
-            constraint="uq_grocery_checks_user_week_key",
-            set_={"checked": checked},
+            index_elements=[
+                GroceryListItemCheck.user_id,
+                GroceryListItemCheck.week_start,
+                GroceryListItemCheck.item_key,
+            ],
+            set_={"checked": stmt.excluded.checked, "updated_at": func.now()},
         )
         await session.execute(stmt)
-        await session.flush()
-        return
 
-    # sqlite (tests) and other dialects: update-first then insert, with retry.
-    update_stmt = (
-        select(GroceryListItemCheck)
-        .where(
-            GroceryListItemCheck.user_id == user_id,
-            GroceryListItemCheck.week_start == week_start,
-            GroceryListItemCheck.item_key == item_key,
-        )
-        .with_for_update()
-    )
-    res = await session.execute(update_stmt)
-    row = res.scalar_one_or_none()
-    if row is not None:
-        row.checked = checked
-        await session.flush()
+
+def grocery_checks_channel(*, user_id: uuid.UUID, week_start: date) -> str:
+    return f"grocery-checks:{user_id}:{week_start.isoformat()}"
+
+
+async def _publish_grocery_check_event(
+    *, session: AsyncSession, user_id: uuid.UUID, week_start: date, event: dict
+) -> None:
+    """Commit the session's writes and announce `event` to SSE subscribers.
+
+    With the Postgres bridge up, the event is sent as a NOTIFY in the same
+    transaction (delivered to every worker on commit only); otherwise it is published
+    in-process after the commit. Events too large for NOTIFY become a resync hint.
+    """
+
+    channel = grocery_checks_channel(user_id=user_id, week_start=week_start)
+    message = json.dumps(event, separators=(",", ":"))
+    pubsub = get_pubsub()
+
+    if pubsub.bridged and is_postgres(session):
+        payload = bridge_payload(channel, message) or bridge_payload(channel, '{"type":"resync"}')
+        await session.execute(select(func.pg_notify(PG_CHANNEL, payload)))
+        await session.commit()
         return
 
-    try:
-        session.add(
-            GroceryListItemCheck(user_id=user_id, week_start=week_start, item_key=item_key, checked=checked)
-        )
-        await session.flush()
-    except IntegrityError:
-        # Concurrent insert won the race; retry as update.
-        await session.rollback()
-        res2 = await session.execute(update_stmt)
-        row2 = res2.scalar_one_or_none()
-        if row2 is None:
-            raise
-        row2.checked = checked
-        await session.flush()
+    await session.commit()
+    pubsub.publish_local(channel, message)
 
 
-async def bulk_upsert_grocery_item_checks(
+_grocery_checks_coalescer: WriteCoalescer | None = None
+
+
+def get_grocery_checks_coalescer() -> WriteCoalescer:
+    global _grocery_checks_coalescer
+    if _grocery_checks_coalescer is None:
+        window_ms = get_settings().grocery_checks_coalesce_window_ms
+        _grocery_checks_coalescer = WriteCoalescer(window_s=window_ms / 1000)
+    return _grocery_checks_coalescer
+
+
+async def coalesced_upsert_grocery_item_checks(
     *, session: AsyncSession, user_id: uuid.UUID, week_start: date, items: list[tuple[str, bool]]
 ) -> None:
-    for item_key, checked in items:
-        await upsert_grocery_item_check(
+    """Durably write check toggles, merged with concurrent toggles for the same week.
+
+    Debounced clients send bursts of PUTs while shopping. Within this worker, PUTs for
+    the same (user_id, week_start) that arrive together are merged last-write-wins per
+    item_key and written by one bulk upsert + commit in the first request's session;
+    every request returns only after that commit (see app.core.coalescing).
+    """
+
+    async def flush(merged: dict) -> None:
+        await bulk_upsert_grocery_item_checks(
+            session=session, user_id=user_id, week_start=week_start, items=list(merged.items())
+        )
+        await _publish_grocery_check_event(
             session=session,
             user_id=user_id,
             week_start=week_start,
-            item_key=item_key,
-            checked=checked,
+            event={"type": "checks", "items": [{"item_key": k, "checked": v} for k, v in merged.items()]},
         )
 
+    await get_grocery_checks_coalescer().submit((user_id, week_start), dict(items), flush)
+
 
 async def grocery_list_for_weekly_plan(
     *, session: AsyncSession, user_id: uuid.UUID, plan: WeeklyPlan
@@ -481,14 +1190,15 @@ async def grocery_list_for_weekly_plan(
         if total_servings <= 0:
             continue
 
-        factor = total_servings / Decimal(r.servings)
+        servings_c = to_centi(total_servings)
+        recipe_servings_c = to_centi(r.servings)
         for item in sorted(r.items, key=lambda i: str(i.id)):
             food = await get_food_for_user_scope(session=session, user_id=user_id, food_id=item.food_id)
             if food is None:
                 raise ValueError(f"Unknown food referenced by recipe item: food_id={item.food_id}")
             foods_by_id[food.id] = food
 
-            grams = (Decimal(item.grams) * factor).quantize(Decimal("0.01"))
+            grams = centi_to_decimal(scale_grams(to_centi(item.grams), servings_c, recipe_servings_c))
             total_grams_by_food_id[food.id] += grams
             breakdown_by_food_id[food.id].append(
                 {
@@ -500,3 +1210,81 @@ async def grocery_list_for_weekly_plan(
             )
 
     return foods_by_id, dict(total_grams_by_food_id), dict(breakdown_by_food_id)
+
+
+@dataclass
+class WeeklyPlanDiaryLog:
+    dates: list[date]
+    entries_created: int
+
+
+async def log_weekly_plan_to_diary_for_user(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    week_start: date,
+    day_date: date | None = None,
+) -> WeeklyPlanDiaryLog:
+    """Copy the planned meals of the week (or of `day_date`) into the user's diary.
+
+    Each planned meal becomes one food entry per recipe item, scaled by planned
+    servings / recipe servings (entries hold a food or a recipe, never both, and only
+    food entries carry macros). Two set-based statements, in the caller's
+    transaction: an `INSERT .. SELECT .. ON CONFLICT DO NOTHING` creating the missing
+    `days` rows, then one `INSERT .. SELECT` of the expanded entries. Meals the diary
+    day already has entries for are left alone, so manual logs are never mixed with
+    the plan and logging twice does not duplicate anything.
+    """
+
+    plan_id = (
+        await session.execute(select(WeeklyPlan.id).where(WeeklyPlan.user_id == user_id, WeeklyPlan.week_start == week_start))
+    ).scalar_one_or_none()
+    if plan_id is None:
+        raise LookupError("Weekly plan not found")
+    if day_date is not None and not week_start <= day_date < week_start + timedelta(days=7):
+        raise ValueError("date must be within the plan week")
+
+    plan_days = [WeeklyPlanDay.weekly_plan_id == plan_id]
+    if day_date is not None:
+        plan_days.append(WeeklyPlanDay.date == day_date)
+    dates = list(
+        (await session.execute(select(WeeklyPlanDay.date).where(*plan_days).order_by(WeeklyPlanDay.date))).scalars()
+    )
+    if not dates:
+        return WeeklyPlanDiaryLog(dates=[], entries_created=0)
+
+    days = Day.__table__
+    await session.execute(
+        upsert_insert(session, days)
+        .from_select(
+            [days.c.id, days.c.user_id, days.c.date],
+            select(random_uuid(session), literal(user_id, Day.user_id.type), WeeklyPlanDay.date).where(*plan_days),
+        )
+        .on_conflict_do_nothing(index_elements=[days.c.user_id, days.c.date])
+    )
+
+    # Entries need grams > 0: a trace ingredient scaled down to under 0.005 g would
+    # round to 0.00 and abort the whole insert, so it is logged as 0.01 g instead.
+    min_grams = literal(Decimal("0.01"), Numeric(8, 2))
+    grams = func.round(RecipeItem.grams * WeeklyPlanMeal.servings / Recipe.servings, 2)
+    already_logged = exists().where(MealEntry.day_id == Day.id, MealEntry.meal_type == WeeklyPlanMeal.meal_type)
+    entries = MealEntry.__table__
+    res = await session.execute(
+        entries.insert().from_select(
+            [entries.c.id, entries.c.day_id, entries.c.meal_type, entries.c.food_id, entries.c.grams],
+            select(
+                random_uuid(session),
+                Day.id,
+                WeeklyPlanMeal.meal_type,
+                RecipeItem.food_id,
+                case((grams < min_grams, min_grams), else_=grams),
+            )
+            .select_from(WeeklyPlanMeal)
+            .join(WeeklyPlanDay, WeeklyPlanDay.id == WeeklyPlanMeal.weekly_plan_day_id)
+            .join(Recipe, Recipe.id == WeeklyPlanMeal.recipe_id)
+            .join(RecipeItem, RecipeItem.recipe_id == Recipe.id)
+            .join(Day, and_(Day.user_id == user_id, Day.date == WeeklyPlanDay.date))
+            .where(*plan_days, ~already_logged),
+        )
+    )
+    return WeeklyPlanDiaryLog(dates=dates, entries_created=res.rowcount)
@@ -3,75 +3,139 @@ from __future__ import annotations
 import uuid
 from decimal import Decimal
 
-from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.core.nutrition import (
+    MacroVector,
+    centi_to_decimal,
+    divide_to_centi,
+    food_vector,
+    micro_to_centi,
+    protein_per_100kcal,
+    scale_lines,
+    to_centi,
+)
 from app.crud.foods import get_food_for_user_scope
+from app.crud.plan_versions import bump_weekly_plan_versions_for_recipes
+from app.db.dialect import upsert_insert
 from app.models.food import Food
 from app.models.recipe import Recipe, RecipeItem
 from app.models.recipe_tag import RecipeTag, RecipeTagLink
 from app.models.user_recipe_favorite import UserRecipeFavorite
 
 
-def _food_contrib(*, food: Food, grams: Decimal) -> dict[str, Decimal]:
-    factor = grams / Decimal("100")
+def recipe_macros(recipe: Recipe) -> tuple[dict[str, Decimal], dict[str, Decimal]]:
+    """Return (total, per_serving) macros from the denormalized recipe columns.
 
-    # Food macros are stored as Numeric in DB and may come back as Decimal.
-    kcal_100g = Decimal(str(food.kcal_100g))
-    protein_100g = Decimal(str(food.protein_100g))
-    carbs_100g = Decimal(str(food.carbs_100g))
-    fat_100g = Decimal(str(food.fat_100g))
+    The columns are kept current by `refresh_recipe_macros`, so reads do no math.
+    """
 
-    return {
-        "kcal": kcal_100g * factor,
-        "protein": protein_100g * factor,
-        "carbs": carbs_100g * factor,
-        "fat": fat_100g * factor,
+    total = {
+        "kcal": Decimal(recipe.total_kcal),
+        "protein": Decimal(recipe.total_protein),
+        "carbs": Decimal(recipe.total_carbs),
+        "fat": Decimal(recipe.total_fat),
     }
+    per_serving = {
+        "kcal": Decimal(recipe.kcal_per_serving),
+        "protein": Decimal(recipe.protein_per_serving),
+        "carbs": Decimal(recipe.carbs_per_serving),
+        "fat": Decimal(recipe.fat_per_serving),
+    }
+    return total, per_serving
 
 
-async def compute_recipe_macros(
-    *,
-    session: AsyncSession,
-    recipe: Recipe,
-    user_id: uuid.UUID,
-) -> tuple[dict[str, Decimal], dict[str, Decimal]]:
-    total: dict[str, Decimal] = {
-        "kcal": Decimal("0"),
-        "protein": Decimal("0"),
-        "carbs": Decimal("0"),
-        "fat": Decimal("0"),
-    }
+async def refresh_recipe_macros(*, session: AsyncSession, recipe_ids: list[uuid.UUID]) -> None:
+    """Recompute the denormalized macro columns of the given recipes.
+
+    Must run in the same transaction as any write that can change a recipe's macros:
+    item add/update/delete, servings change, or a referenced food's macros changing.
+    """
+
+    ids = list(set(recipe_ids))
+    if not ids:
+        return
+
+    # populate_existing: callers may have just changed servings via UPDATE .. RETURNING.
+    res = await session.execute(
+        select(Recipe).where(Recipe.id.in_(ids)).execution_options(populate_existing=True)
+    )
+    recipes = list(res.scalars().all())
 
-    food_ids = [i.food_id for i in recipe.items]
-    foods_by_id: dict[uuid.UUID, Food] = {}
-    if food_ids:
-        # Scope foods to current user: global foods + user-owned foods.
-        stmt = select(Food).where(
-            Food.id.in_(food_ids),
-            or_(Food.user_id.is_(None), Food.user_id == user_id),
+    # Scope foods to the recipe owner: global foods + foods owned by the recipe's user.
+    # Out-of-scope or missing foods are ignored to prevent cross-user leakage.
+    items_stmt = (
+        select(RecipeItem.recipe_id, RecipeItem.grams, Food)
+        .join(Recipe, Recipe.id == RecipeItem.recipe_id)
+        .join(
+            Food,
+            and_(Food.id == RecipeItem.food_id, or_(Food.user_id.is_(None), Food.user_id == Recipe.user_id)),
         )
-        res = await session.execute(stmt)
-        foods_by_id = {f.id: f for f in res.scalars().all()}
+        .where(RecipeItem.recipe_id.in_(ids))
+    )
+    items_res = await session.execute(items_stmt)
+
+    vectors: dict[uuid.UUID, list[MacroVector]] = {rid: [] for rid in ids}
+    grams_by_recipe: dict[uuid.UUID, list[int]] = {rid: [] for rid in ids}
+    food_vectors: dict[uuid.UUID, MacroVector] = {}
+    for recipe_id, grams, food in items_res.all():
+        vec = food_vectors.get(food.id)
+        if vec is None:
+            vec = food_vectors[food.id] = food_vector(food)
+        vectors[recipe_id].append(vec)
+        grams_by_recipe[recipe_id].append(to_centi(grams))
+
+    for recipe in recipes:
+        _, total = scale_lines(vectors[recipe.id], grams_by_recipe[recipe.id])
+        total_c = micro_to_centi(total)
+        per_serving_c = divide_to_centi(total, to_centi(recipe.servings))
+        (
+            recipe.total_kcal,
+            recipe.total_protein,
+            recipe.total_carbs,
+            recipe.total_fat,
+        ) = (centi_to_decimal(v) for v in total_c)
+        (
+            recipe.kcal_per_serving,
+            recipe.protein_per_serving,
+            recipe.carbs_per_serving,
+            recipe.fat_per_serving,
+        ) = (centi_to_decimal(v) for v in per_serving_c)
+        recipe.protein_per_100kcal = centi_to_decimal(protein_per_100kcal(total))
 
-    for item in recipe.items:
-        food = foods_by_id.get(item.food_id)
-        if food is None:
-            # Out-of-scope or missing foods are ignored to prevent cross-user leakage.
-            continue
-        contrib = _food_contrib(food=food, grams=item.grams)
-        for k in total:
-            total[k] += contrib[k]
+    await session.flush()
 
-    servings = Decimal(recipe.servings)
-    per_serving = {k: (total[k] / servings) for k in total}
-    return total, per_serving
+
+async def refresh_recipe_macros_for_food(*, session: AsyncSession, food_id: uuid.UUID) -> None:
+    """Recompute stored macros of every recipe referencing `food_id`.
+
+    Uses the `recipe_items.food_id` index as the food -> recipes reverse lookup.
+    """
+
+    res = await session.execute(select(RecipeItem.recipe_id).where(RecipeItem.food_id == food_id).distinct())
+    await refresh_recipe_macros(session=session, recipe_ids=list(res.scalars().all()))
 
 
 async def create_recipe_for_user(
-    *, session: AsyncSession, user_id: uuid.UUID, name: str, servings: int, tags: list[str] | None = None
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    name: str,
+    servings: int,
+    tags: list[str] | None = None,
+    items: list[tuple[uuid.UUID, Decimal]] | None = None,
 ) -> Recipe:
+    """Create a recipe, optionally with its tags and (food_id, grams) items.
+
+    Raises LookupError if any item references a food outside the user's scope; this
+    is checked before anything is written.
+    """
+
+    if items:
+        await _ensure_foods_in_scope(session=session, user_id=user_id, food_ids=[f for f, _ in items])
+
     recipe = Recipe(user_id=user_id, name=name.strip(), servings=servings)
     session.add(recipe)
     await session.flush()
@@ -79,10 +143,56 @@ async def create_recipe_for_user(
     if tags:
         await set_recipe_tags_for_user(session=session, user_id=user_id, recipe_id=recipe.id, tags=tags)
 
+    if items:
+        await _insert_recipe_items(session=session, recipe_id=recipe.id, items=items)
+        await refresh_recipe_macros(session=session, recipe_ids=[recipe.id])
+
     await session.refresh(recipe)
     return recipe
 
 
+async def _ensure_foods_in_scope(*, session: AsyncSession, user_id: uuid.UUID, food_ids: list[uuid.UUID]) -> None:
+    """Check all foods are global or owned by the user, in a single query."""
+
+    wanted = set(food_ids)
+    if not wanted:
+        return
+    res = await session.execute(
+        select(Food.id).where(Food.id.in_(wanted), or_(Food.user_id.is_(None), Food.user_id == user_id))
+    )
+    if wanted - set(res.scalars().all()):
+        raise LookupError("Food not found")
+
+
+async def _insert_recipe_items(
+    *, session: AsyncSession, recipe_id: uuid.UUID, items: list[tuple[uuid.UUID, Decimal]]
+) -> None:
+    if not items:
+        return
+    await session.execute(
+        insert(RecipeItem).values(
+            [
+                {"id": uuid.uuid4(), "recipe_id": recipe_id, "food_id": food_id, "grams": grams}
+                for food_id, grams in items
+            ]
+        )
+    )
+
+
+# Per-serving protein threshold for the `high_protein` shortcut filter.
+HIGH_PROTEIN_MIN_PER_SERVING = Decimal("25")
+
+# sort name -> (column, descending). Ties are broken by id in the same direction,
+# which makes (column, id) a total order usable for keyset pagination.
+RECIPE_LIST_SORTS = {
+    "created_at": (Recipe.created_at, True),
+    "name": (Recipe.name, False),
+    "kcal_per_serving": (Recipe.kcal_per_serving, False),
+    "protein_per_serving": (Recipe.protein_per_serving, True),
+    "protein_density": (Recipe.protein_per_100kcal, True),
+}
+
+
 async def list_recipes_for_user(
     *,
     session: AsyncSession,
@@ -91,7 +201,28 @@ async def list_recipes_for_user(
     high_protein: bool = False,
     under_30_min: bool = False,
     favorites_only: bool = False,
-) -> list[Recipe]:
+    min_protein_per_serving: Decimal | None = None,
+    max_protein_per_serving: Decimal | None = None,
+    min_kcal_per_serving: Decimal | None = None,
+    max_kcal_per_serving: Decimal | None = None,
+    sort: str = "created_at",
+    limit: int | None = None,
+    after: uuid.UUID | None = None,
+    include_items: bool = True,
+) -> tuple[list[Recipe], uuid.UUID | None]:
+    """List a user's recipes with macro filters evaluated in SQL.
+
+    Macro filters/sorts use the stored per-serving columns (indexed per user), so
+    filtering never loads items or foods.
+
+    Pagination is keyset-based on (sort column, id): `after` is the id of the last
+    recipe of the previous page and the returned cursor is the id to pass for the
+    next page (None on the last page). If the `after` recipe was deleted meanwhile,
+    the listing ends there.
+    """
+
+    sort_col, descending = RECIPE_LIST_SORTS[sort]
+
     stmt = select(Recipe).where(Recipe.user_id == user_id)
 
     if favorites_only:
@@ -110,28 +241,52 @@ async def list_recipes_for_user(
                 .having(func.count(func.distinct(RecipeTag.id)) >= len(set(tag_names)))
             )
 
-    # Postgres: compute protein per serving from recipe items and foods.
-    if high_protein or under_30_min:
-        # NOTE: under_30_min is not yet supported at DB-level (no duration field). Treated as no-op.
-        # Keep the filter for API compatibility.
-        pass
+    if high_protein:
+        stmt = stmt.where(Recipe.protein_per_serving >= HIGH_PROTEIN_MIN_PER_SERVING)
+    if min_protein_per_serving is not None:
+        stmt = stmt.where(Recipe.protein_per_serving >= min_protein_per_serving)
+    if max_protein_per_serving is not None:
+        stmt = stmt.where(Recipe.protein_per_serving <= max_protein_per_serving)
+    if min_kcal_per_serving is not None:
+        stmt = stmt.where(Recipe.kcal_per_serving >= min_kcal_per_serving)
+    if max_kcal_per_serving is not None:
+        stmt = stmt.where(Recipe.kcal_per_serving <= max_kcal_per_serving)
+
+    # NOTE: under_30_min is not yet supported at DB-level (no duration field). Treated as no-op.
+    # Keep the filter for API compatibility.
+
+    if after is not None:
+        # Compare against the anchor row's own column value (scalar subquery) rather than a
+        # client-supplied value, so the cursor stays opaque and type-exact on every backend.
+        anchor = (
+            select(sort_col).where(Recipe.id == after, Recipe.user_id == user_id).scalar_subquery()
+        )
+        if descending:
+            stmt = stmt.where(or_(sort_col < anchor, and_(sort_col == anchor, Recipe.id < after)))
+        else:
+            stmt = stmt.where(or_(sort_col > anchor, and_(sort_col == anchor, Recipe.id > after)))
+
+    if descending:
+        stmt = stmt.order_by(sort_col.desc(), Recipe.id.desc())
+    else:
+        stmt = stmt.order_by(sort_col.asc(), Recipe.id.asc())
 
-    # Eager-load items for macros computation.
-    stmt = stmt.order_by(Recipe.created_at.desc()).options(selectinload(Recipe.items))
+    if limit is not None:
+        # One extra row tells us whether there is a next page.
+        stmt = stmt.limit(limit + 1)
+
+    if include_items:
+        stmt = stmt.options(selectinload(Recipe.items))
 
     res = await session.execute(stmt)
     recipes = list(res.scalars().all())
 
-    if high_protein:
-        # Filter in Python after computing macros to avoid complex DB numeric joins.
-        out: list[Recipe] = []
-        for r in recipes:
-            _, per_serving = await compute_recipe_macros(session=session, recipe=r, user_id=user_id)
-            if per_serving["protein"] >= Decimal("25"):
-                out.append(r)
-        recipes = out
+    next_cursor: uuid.UUID | None = None
+    if limit is not None and len(recipes) > limit:
+        recipes = recipes[:limit]
+        next_cursor = recipes[-1].id
 
-    return recipes
+    return recipes, next_cursor
 
 
 async def get_recipe_for_user(*, session: AsyncSession, user_id: uuid.UUID, recipe_id: uuid.UUID) -> Recipe | None:
@@ -172,6 +327,11 @@ async def update_recipe_for_user(
             return None
         await session.flush()
 
+        if servings is not None:
+            await refresh_recipe_macros(session=session, recipe_ids=[recipe_id])
+        # Name and servings both show up in planned grocery lists.
+        await bump_weekly_plan_versions_for_recipes(session=session, recipe_ids=[recipe_id])
+
     if tags is not None:
         await set_recipe_tags_for_user(session=session, user_id=user_id, recipe_id=recipe_id, tags=tags)
 
@@ -206,9 +366,46 @@ async def add_recipe_item_for_user(
     session.add(item)
     await session.flush()
     await session.refresh(item)
+    await refresh_recipe_macros(session=session, recipe_ids=[recipe.id])
+    await bump_weekly_plan_versions_for_recipes(session=session, recipe_ids=[recipe.id])
     return item
 
 
+async def replace_recipe_items_for_user(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    recipe_id: uuid.UUID,
+    items: list[tuple[uuid.UUID, Decimal]],
+) -> Recipe | None:
+    """Replace a recipe's full item set with `items` ((food_id, grams) pairs).
+
+    Foods are validated in one query (LookupError if any is out of scope), then the
+    change is applied as a delete plus a single multi-row insert and one macro refresh.
+    Returns None if the recipe does not exist for this user.
+    """
+
+    owned = await session.scalar(select(exists().where(Recipe.id == recipe_id, Recipe.user_id == user_id)))
+    if not owned:
+        return None
+
+    await _ensure_foods_in_scope(session=session, user_id=user_id, food_ids=[f for f, _ in items])
+
+    await session.execute(delete(RecipeItem).where(RecipeItem.recipe_id == recipe_id))
+    await _insert_recipe_items(session=session, recipe_id=recipe_id, items=items)
+    await refresh_recipe_macros(session=session, recipe_ids=[recipe_id])
+    await bump_weekly_plan_versions_for_recipes(session=session, recipe_ids=[recipe_id])
+
+    # populate_existing: the identity map may hold the recipe with its old item collection.
+    res = await session.execute(
+        select(Recipe)
+        .where(Recipe.id == recipe_id)
+        .options(selectinload(Recipe.items))
+        .execution_options(populate_existing=True)
+    )
+    return res.scalar_one()
+
+
 async def update_recipe_item_for_user(
     *,
     session: AsyncSession,
@@ -232,6 +429,8 @@ async def update_recipe_item_for_user(
     if item is None:
         return None
     await session.flush()
+    await refresh_recipe_macros(session=session, recipe_ids=[recipe.id])
+    await bump_weekly_plan_versions_for_recipes(session=session, recipe_ids=[recipe.id])
     return item
 
 
@@ -249,31 +448,11 @@ async def delete_recipe_item_for_user(
     stmt = delete(RecipeItem).where(RecipeItem.id == item_id, RecipeItem.recipe_id == recipe.id).returning(RecipeItem.id)
     res = await session.execute(stmt)
     deleted_id = res.scalar_one_or_none()
-    return deleted_id is not None
-
-
-async def get_recipe_macros_for_user(
-    *, session: AsyncSession, user_id: uuid.UUID, recipe_id: uuid.UUID
-) -> tuple[Recipe, dict[str, Decimal], dict[str, Decimal]] | None:
-    recipe = await get_recipe_for_user(session=session, user_id=user_id, recipe_id=recipe_id)
-    if recipe is None:
-        return None
-    total, per_serving = await compute_recipe_macros(session=session, recipe=recipe, user_id=user_id)
-    return recipe, total, per_serving
-
-
-async def get_recipe_favorite_map_for_user(
-    *, session: AsyncSession, user_id: uuid.UUID, recipe_ids: list[uuid.UUID]
-) -> dict[uuid.UUID, bool]:
-    if not recipe_ids:
-        return {}
-    stmt = select(UserRecipeFavorite.recipe_id).where(
-        UserRecipeFavorite.user_id == user_id,
-        UserRecipeFavorite.recipe_id.in_(recipe_ids),
-    )
-    res = await session.execute(stmt)
-    fav_ids = set(res.scalars().all())
-    return {rid: (rid in fav_ids) for rid in recipe_ids}
+    if deleted_id is None:
+        return False
+    await refresh_recipe_macros(session=session, recipe_ids=[recipe.id])
+    await bump_weekly_plan_versions_for_recipes(session=session, recipe_ids=[recipe.id])
+    return True
 
 
 async def set_recipe_favorite(
@@ -290,52 +469,160 @@ async def set_recipe_favorite(
     await session.execute(stmt)
 
 
-async def get_recipe_tag_names_for_user(
-    *, session: AsyncSession, user_id: uuid.UUID, recipe_ids: list[uuid.UUID]
-) -> dict[uuid.UUID, list[str]]:
-    if not recipe_ids:
-        return {}
+class RecipeDetailsLoader:
+    """Request-scoped batch loader for the per-recipe data `RecipeOut` needs.
+
+    Collects recipe ids (`prime`) and fetches tag names and favorite flags for all
+    pending ids with a single combined query on the next `load`, caching results for
+    the rest of the request. Macros need no query: they are read from the recipe's
+    stored columns (see `recipe_macros`).
+    """
+
+    def __init__(self, *, session: AsyncSession, user_id: uuid.UUID) -> None:
+        self._session = session
+        self._user_id = user_id
+        self._pending: set[uuid.UUID] = set()
+        self._tags: dict[uuid.UUID, list[str]] = {}
+        self._favorites: dict[uuid.UUID, bool] = {}
+
+    def prime(self, recipe_ids: list[uuid.UUID]) -> None:
+        self._pending.update(rid for rid in recipe_ids if rid not in self._favorites)
+
+    async def load(self, recipe_ids: list[uuid.UUID] | None = None) -> None:
+        if recipe_ids:
+            self.prime(recipe_ids)
+        ids = self._pending
+        self._pending = set()
+        if not ids:
+            return
+
+        is_favorite = exists().where(
+            UserRecipeFavorite.user_id == self._user_id,
+            UserRecipeFavorite.recipe_id == Recipe.id,
+        )
+        # Recipes are user-owned; scope by recipes.user_id. Recipes without tags still
+        # produce one row (outer join) so their favorite flag is returned.
+        stmt = (
+            select(Recipe.id, RecipeTag.name, is_favorite.label("is_favorite"))
+            .outerjoin(RecipeTagLink, RecipeTagLink.recipe_id == Recipe.id)
+            .outerjoin(RecipeTag, RecipeTag.id == RecipeTagLink.tag_id)
+            .where(Recipe.user_id == self._user_id, Recipe.id.in_(ids))
+            .order_by(RecipeTag.name.asc())
+        )
+        res = await self._session.execute(stmt)
+
+        for rid in ids:
+            self._tags[rid] = []
+            self._favorites[rid] = False
+        for rid, tag_name, fav in res.all():
+            if tag_name is not None:
+                self._tags[rid].append(tag_name)
+            self._favorites[rid] = bool(fav)
+
+    def tags(self, recipe_id: uuid.UUID) -> list[str]:
+        return self._tags.get(recipe_id, [])
 
-    # Recipes are user-owned; enforce scope by joining recipes.
-    stmt = (
-        select(RecipeTagLink.recipe_id, RecipeTag.name)
-        .join(Recipe, Recipe.id == RecipeTagLink.recipe_id)
-        .join(RecipeTag, RecipeTag.id == RecipeTagLink.tag_id)
-        .where(Recipe.user_id == user_id)
-        .where(RecipeTagLink.recipe_id.in_(recipe_ids))
-        .order_by(RecipeTag.name.asc())
-    )
-    res = await session.execute(stmt)
-    out: dict[uuid.UUID, list[str]] = {rid: [] for rid in recipe_ids}
-    for rid, name in res.all():
-        out.setdefault(rid, []).append(name)
-    return out
+    def is_favorite(self, recipe_id: uuid.UUID) -> bool:
+        return self._favorites.get(recipe_id, False)
 
 
-async def set_recipe_tags_for_user(
-    *, session: AsyncSession, user_id: uuid.UUID, recipe_id: uuid.UUID, tags: list[str]
-) -> None:
-    recipe = await get_recipe_for_user(session=session, user_id=user_id, recipe_id=recipe_id)
-    if recipe is None:
-        # Caller handles 404.
-        return
+# Process-wide cache of lowercased tag name -> recipe_tags.id. `recipe_tags` is a small
+# global table whose rows are never deleted, so entries cannot go stale. Only ids read
+# back by a SELECT (i.e. rows another transaction already committed) are cached; tags
+# inserted by the current transaction are tracked in `session.info` and kept out of the
+# cache, so a rolled back insert never leaves a dangling id behind.
+_TAG_ID_CACHE: dict[str, int] = {}
+_TAG_ID_CACHE_MAX_SIZE = 10_000
+_INSERTED_TAG_KEYS = "recipe_tag_keys_inserted"
 
-    normalized = []
-    for t in tags:
-        tt = " ".join(t.strip().split())
-        if not tt:
+
+def clear_tag_id_cache() -> None:
+    _TAG_ID_CACHE.clear()
+
+
+def _cache_tag_ids(session: AsyncSession, ids_by_key: dict[str, int]) -> None:
+    inserted_here = session.info.get(_INSERTED_TAG_KEYS, set())
+    for key, tag_id in ids_by_key.items():
+        if key in inserted_here or len(_TAG_ID_CACHE) >= _TAG_ID_CACHE_MAX_SIZE:
             continue
-        normalized.append(tt)
+        _TAG_ID_CACHE[key] = tag_id
+
+
+def _normalize_tag_names(tags: list[str]) -> list[str]:
+    """Collapse whitespace and deduplicate case-insensitively, keeping the first casing."""
 
-    # Deduplicate case-insensitively, keep first casing.
     seen: set[str] = set()
     deduped: list[str] = []
-    for t in normalized:
-        k = t.lower()
+    for t in tags:
+        tt = " ".join(t.strip().split())
+        if not tt:
+            continue
+        k = tt.lower()
         if k in seen:
             continue
         seen.add(k)
-        deduped.append(t)
+        deduped.append(tt)
+    return deduped
+
+
+async def resolve_tag_ids(*, session: AsyncSession, names: list[str]) -> dict[str, int]:
+    """Return lowercased tag name -> id for `names`, creating missing tags.
+
+    Set-based and conflict-free: one select for the names not already cached, then a
+    single `INSERT .. ON CONFLICT DO NOTHING RETURNING` for the missing ones. Names that
+    lost an insert race to a concurrent transaction are re-selected. Nothing here ever
+    rolls back the caller's transaction.
+    """
+
+    by_key = {n.lower(): n for n in names}
+    ids: dict[str, int] = {k: _TAG_ID_CACHE[k] for k in by_key if k in _TAG_ID_CACHE}
+
+    missing = [k for k in by_key if k not in ids]
+    if missing:
+        res = await session.execute(
+            select(RecipeTag.id, RecipeTag.name).where(func.lower(RecipeTag.name).in_(missing))
+        )
+        selected = {name.lower(): tag_id for tag_id, name in res.all()}
+        _cache_tag_ids(session, selected)
+        ids.update(selected)
+        missing = [k for k in missing if k not in ids]
+
+    if missing:
+        stmt = (
+            upsert_insert(session, RecipeTag)
+            .values([{"name": by_key[k]} for k in missing])
+            .on_conflict_do_nothing(index_elements=[RecipeTag.name])
+            .returning(RecipeTag.id, RecipeTag.name)
+        )
+        res = await session.execute(stmt)
+        inserted = {name.lower(): tag_id for tag_id, name in res.all()}
+        session.info.setdefault(_INSERTED_TAG_KEYS, set()).update(inserted)
+        ids.update(inserted)
+
+        # Names that lost an insert race were committed by a concurrent transaction.
+        raced = [k for k in missing if k not in ids]
+        if raced:
+            res = await session.execute(
+                select(RecipeTag.id, RecipeTag.name).where(func.lower(RecipeTag.name).in_(raced))
+            )
+            selected = {name.lower(): tag_id for tag_id, name in res.all()}
+            _cache_tag_ids(session, selected)
+            ids.update(selected)
+
+    return ids
+
+
+async def set_recipe_tags_for_user(
+    *, session: AsyncSession, user_id: uuid.UUID, recipe_id: uuid.UUID, tags: list[str]
+) -> None:
+    owned = await session.scalar(
+        select(exists().where(Recipe.id == recipe_id, Recipe.user_id == user_id))
+    )
+    if not owned:
+        # Caller handles 404.
+        return
+
+    deduped = _normalize_tag_names(tags)
 
     # Remove existing links.
     await session.execute(delete(RecipeTagLink).where(RecipeTagLink.recipe_id == recipe_id))
@@ -343,35 +630,10 @@ async def set_recipe_tags_for_user(
     if not deduped:
         return
 
-    # Upsert tags by name.
-    # Concurrency: recipe_tags.name is unique, so two concurrent requests could try
-    # to insert the same tag. Handle by retrying after an IntegrityError.
-    stmt = select(RecipeTag).where(func.lower(RecipeTag.name).in_([t.lower() for t in deduped]))
-    res = await session.execute(stmt)
-    existing = {t.name.lower(): t for t in res.scalars().all()}
-
-    tag_ids: list[int] = []
-    for name in deduped:
-        key = name.lower()
-        tag = existing.get(key)
-        if tag is None:
-            tag = RecipeTag(name=name)
-            session.add(tag)
-            try:
-                await session.flush()
-            except Exception as e:
-                # IntegrityError is expected in races; re-select the row.
-                from sqlalchemy.exc import IntegrityError
-
-                if isinstance(e, IntegrityError):
-                    await session.rollback()
-                    res2 = await session.execute(select(RecipeTag).where(func.lower(RecipeTag.name) == key))
-                    tag = res2.scalar_one()
-                else:
-                    raise
-            existing[key] = tag
-        tag_ids.append(tag.id)
-
-    # Create links.
-    for tid in tag_ids:
-        session.add(RecipeTagLink(recipe_id=recipe_id, tag_id=tid))
+    ids = await resolve_tag_ids(session=session, names=deduped)
+    tag_ids = list(dict.fromkeys(ids[t.lower()] for t in deduped))
+
+    # Create links in a single multi-row insert.
+    await session.execute(
+        insert(RecipeTagLink).values([{"recipe_id": recipe_id, "tag_id": tid} for tid in tag_ids])
+    )
@@ -1,17 +1,18 @@
 from __future__ import annotations
 
 import uuid
+from collections.abc import Iterable
 from datetime import date
 from decimal import Decimal
 
-from sqlalchemy import case, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user_target import UserTarget
 
 
-async def get_active_user_target(*, session: AsyncSession, user_id: uuid.UUID, at_date: date | None = None) -> UserTarget | None:
-    """Return the single effective target for a user.
+def pick_active_user_target(targets: Iterable[UserTarget], *, at_date: date | None = None) -> UserTarget | None:
+    """The single effective target among one user's `targets` (already loaded rows).
 
     Deterministic rules:
     - If `at_date` is provided: pick the latest dated target with effective_date <= at_date.
@@ -19,56 +20,32 @@ async def get_active_user_target(*, session: AsyncSession, user_id: uuid.UUID, a
     - If `at_date` is not provided: prefer the single NULL effective_date target.
       If none exists, fall back to the latest dated target.
 
-    Ordering is always explicit and limited to 1 row.
+    Ties are broken by the latest created_at, then the highest id.
     """
 
-    if at_date is None:
-        stmt = (
-            select(UserTarget)
-            .where(UserTarget.user_id == user_id)
-            .order_by(
-                # Prefer NULL effective_date (active/default). Use CASE for dialect-safe
-                # ordering rather than relying on boolean expression ordering.
-                case((UserTarget.effective_date.is_(None), 0), else_=1).asc(),
-                # Then prefer latest dated target
-                UserTarget.effective_date.desc().nulls_last(),
-                # Tie-breaker for determinism
-                UserTarget.created_at.desc(),
-                UserTarget.id.desc(),
-            )
-            .limit(1)
-        )
-        res = await session.execute(stmt)
-        return res.scalar_one_or_none()
-
-    # at_date provided -> latest dated <= at_date, else fallback to NULL
-    stmt = (
-        select(UserTarget)
-        .where(
-            UserTarget.user_id == user_id,
-            (
-                (UserTarget.effective_date.is_not(None) & (UserTarget.effective_date <= at_date))
-                | UserTarget.effective_date.is_(None)
-            ),
-        )
-        .order_by(
-            # Prefer dated matches over NULL fallback. Use CASE for dialect-safe ordering.
-            case(
-                (
-                    UserTarget.effective_date.is_not(None)
-                    & (UserTarget.effective_date <= at_date),
-                    0,
-                ),
-                else_=1,
-            ).asc(),
-            UserTarget.effective_date.desc().nulls_last(),
-            UserTarget.created_at.desc(),
-            UserTarget.id.desc(),
-        )
-        .limit(1)
-    )
+    undated: list[UserTarget] = []
+    dated: list[UserTarget] = []
+    for t in targets:
+        if t.effective_date is None:
+            undated.append(t)
+        elif at_date is None or t.effective_date <= at_date:
+            dated.append(t)
+
+    preferred, fallback = (undated, dated) if at_date is None else (dated, undated)
+    candidates = preferred or fallback
+    if not candidates:
+        return None
+    return max(candidates, key=lambda t: (t.effective_date or date.min, t.created_at, t.id))
+
+
+async def get_active_user_target(*, session: AsyncSession, user_id: uuid.UUID, at_date: date | None = None) -> UserTarget | None:
+    """Return the single effective target for a user (rules: pick_active_user_target)."""
+
+    stmt = select(UserTarget).where(UserTarget.user_id == user_id)
+    if at_date is not None:
+        stmt = stmt.where(UserTarget.effective_date.is_(None) | (UserTarget.effective_date <= at_date))
     res = await session.execute(stmt)
-    return res.scalar_one_or_none()
+    return pick_active_user_target(res.scalars().all(), at_date=at_date)
 
 
 async def upsert_user_target(
@@ -6,8 +6,13 @@ from datetime import datetime
 from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.db.dialect import is_postgres, upsert_insert
 from app.models.weight_entry import WeightEntry
 
+# Rows per multi-row INSERT. Keeps statements well below Postgres' 65535 bind-parameter limit
+# (5 params per row) while still turning a 10k-row import into ~10 statements.
+IMPORT_CHUNK_SIZE = 1000
+
 
 async def create_weight_entry(
     *,
@@ -29,6 +34,49 @@ async def create_weight_entry(
     return entry
 
 
+async def bulk_import_weight_entries(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    rows: list[tuple[datetime, float, str | None]],
+) -> int:
+    """Insert many weigh-ins, skipping any (user_id, datetime_utc) that already exists.
+
+    Rows are `(datetime_utc, weight_kg, note)` and must already be validated/normalized.
+    Returns the number of rows actually inserted.
+
+    Postgres: one multi-row `INSERT .. ON CONFLICT DO NOTHING RETURNING id` per chunk.
+    SQLite (tests): the same statement executed as an executemany per chunk.
+    """
+
+    inserted = 0
+    postgres = is_postgres(session)
+
+    for start in range(0, len(rows), IMPORT_CHUNK_SIZE):
+        chunk = [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "datetime_utc": dt,
+                "weight_kg": weight_kg,
+                "note": note,
+            }
+            for dt, weight_kg, note in rows[start : start + IMPORT_CHUNK_SIZE]
+        ]
+
+        stmt = upsert_insert(session, WeightEntry.__table__).on_conflict_do_nothing(
+            index_elements=["user_id", "datetime_utc"]
+        )
+        if postgres:
+            res = await session.execute(stmt.values(chunk).returning(WeightEntry.__table__.c.id))
+            inserted += len(res.all())
+        else:
+            res = await session.execute(stmt, chunk)
+            inserted += max(res.rowcount, 0)
+
+    return inserted
+
+
 async def list_weight_entries(
     *,
     session: AsyncSession,
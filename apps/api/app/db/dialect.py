@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import ColumnElement, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_name(session: AsyncSession) -> str:
+    """Return the dialect name of the session's bind ("postgresql", "sqlite", ...).
+
+    Production runs on Postgres; tests run on SQLite. Keep dialect checks in one
+    place so set-based write paths can pick the right `INSERT .. ON CONFLICT` flavor.
+    """
+
+    if session.bind is None:
+        return ""
+    return session.bind.dialect.name
+
+
+def is_postgres(session: AsyncSession) -> bool:
+    return dialect_name(session) == "postgresql"
+
+
+def upsert_insert(session: AsyncSession, table: Any):
+    """Dialect-specific `insert()` construct supporting `on_conflict_do_*`.
+
+    Both Postgres and SQLite (>= 3.24) support `ON CONFLICT`, but SQLAlchemy exposes
+    it through dialect-specific constructs.
+    """
+
+    if is_postgres(session):
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def random_uuid(session: AsyncSession) -> ColumnElement[Any]:
+    """SQL expression producing a fresh UUID per row, for `INSERT .. SELECT`.
+
+    Primary keys default to `uuid.uuid4()` on the Python side, which set-based
+    inserts bypass. SQLite stores UUIDs as 32 hex digits, so random bytes will do.
+    """
+
+    if is_postgres(session):
+        return func.gen_random_uuid()
+    return func.lower(func.hex(func.randomblob(16)))
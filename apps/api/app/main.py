@@ -1,3 +1,7 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -7,16 +11,54 @@ from app.core.errors import (
     unhandled_exception_handler,
 )
 from app.core.logging import RequestIdMiddleware, setup_logging
+from app.core.planner import configure_solver_pool, shutdown_solver_pool
+from app.core.pubsub import get_pubsub, run_postgres_bridge
 from app.core.security_headers import SecurityHeadersMiddleware
 from app.core.settings import get_settings
+from app.crud.foods import warm_global_food_index
+from app.db.session import get_sessionmaker
 from app.routes.auth import router as auth_router
 from app.routes.days import router as days_router
 from app.routes.foods import router as foods_router
 from app.routes.health import router as health_router
+from app.routes.jobs import router as jobs_router
+from app.routes.nutrition import router as nutrition_router
 from app.routes.plans import router as plans_router
 from app.routes.recipes import router as recipes_router
 from app.routes.targets import router as targets_router
 from app.routes.weights import router as weights_router
+from app.worker import run_worker
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    settings = get_settings()
+    on_postgres = settings.database_url.startswith("postgresql")
+    tasks: list[asyncio.Task] = []
+    if settings.pubsub_pg_bridge and on_postgres:
+        # libpq URL: drop SQLAlchemy's "+driver" suffix.
+        scheme, rest = settings.database_url.split("://", 1)
+        dsn = f"{scheme.split('+', 1)[0]}://{rest}"
+        tasks.append(asyncio.create_task(run_postgres_bridge(get_pubsub(), dsn)))
+    if settings.jobs_worker and on_postgres:
+        # On other databases jobs run inline in the request (see app.worker).
+        tasks.append(
+            asyncio.create_task(
+                run_worker(get_sessionmaker(), poll_interval_s=settings.jobs_poll_interval_ms / 1000)
+            )
+        )
+    if settings.food_index_warmup and on_postgres:
+        tasks.append(asyncio.create_task(warm_global_food_index(get_sessionmaker())))
+    configure_solver_pool(settings.planner_process_workers)
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        shutdown_solver_pool()
 
 
 def create_app() -> FastAPI:
@@ -24,7 +66,7 @@ def create_app() -> FastAPI:
 
     setup_logging(level=settings.log_level)
 
-    app = FastAPI(title="Foodie API", version="0.1.0")
+    app = FastAPI(title="Foodie API", version="0.1.0", lifespan=_lifespan)
 
 
     # Must be first so request_id is available to exception handlers and logs.
@@ -62,6 +104,8 @@ def create_app() -> FastAPI:
     app.include_router(targets_router)
     app.include_router(recipes_router)
     app.include_router(plans_router)
+    app.include_router(nutrition_router)
+    app.include_router(jobs_router)
 
     return app
 
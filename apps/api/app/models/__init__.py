@@ -4,6 +4,7 @@
 from app.models.day import Day  # noqa: F401
 from app.models.food import Food  # noqa: F401
 from app.models.grocery_list_item_check import GroceryListItemCheck  # noqa: F401
+from app.models.job import Job  # noqa: F401
 from app.models.meal_entry import MealEntry  # noqa: F401
 from app.models.recipe import Recipe, RecipeItem  # noqa: F401
 from app.models.recipe_tag import RecipeTag, RecipeTagLink  # noqa: F401
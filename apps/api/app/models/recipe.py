@@ -5,13 +5,18 @@ from datetime import datetime
 from decimal import Decimal
 
 import sqlalchemy as sa
-from sqlalchemy import CheckConstraint, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import CheckConstraint, DateTime, ForeignKey, Index, Integer, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base
 
 
+def _macro_column() -> Mapped[Decimal]:
+    # Python-side default too, so freshly added rows don't need a refresh to read it.
+    return mapped_column(sa.Numeric(12, 2, asdecimal=True), nullable=False, default=Decimal("0"), server_default="0")
+
+
 class Recipe(Base):
     __tablename__ = "recipes"
     __table_args__ = (
@@ -34,6 +39,21 @@ class Recipe(Base):
     name: Mapped[str] = mapped_column(String(200), nullable=False, index=True)
     servings: Mapped[int] = mapped_column(Integer, nullable=False)
 
+    # Denormalized macros, recomputed on every write that can change them
+    # (items, servings, referenced food macros). See crud.recipes.refresh_recipe_macros.
+    total_kcal: Mapped[Decimal] = _macro_column()
+    total_protein: Mapped[Decimal] = _macro_column()
+    total_carbs: Mapped[Decimal] = _macro_column()
+    total_fat: Mapped[Decimal] = _macro_column()
+
+    kcal_per_serving: Mapped[Decimal] = _macro_column()
+    protein_per_serving: Mapped[Decimal] = _macro_column()
+    carbs_per_serving: Mapped[Decimal] = _macro_column()
+    fat_per_serving: Mapped[Decimal] = _macro_column()
+
+    # Grams of protein per 100 kcal (0 when the recipe has no kcal); backs `sort=protein_density`.
+    protein_per_100kcal: Mapped[Decimal] = _macro_column()
+
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
@@ -96,3 +116,9 @@ class RecipeItem(Base):
     )
 
     recipe: Mapped[Recipe] = relationship(back_populates="items")
+
+
+# Per-user macro filters/sorts on the recipes list (see crud.recipes.list_recipes_for_user).
+Index("ix_recipes_user_protein_per_serving", Recipe.user_id, Recipe.protein_per_serving)
+Index("ix_recipes_user_kcal_per_serving", Recipe.user_id, Recipe.kcal_per_serving)
+Index("ix_recipes_user_protein_per_100kcal", Recipe.user_id, Recipe.protein_per_100kcal)
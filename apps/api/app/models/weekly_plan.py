@@ -35,9 +35,16 @@ class WeeklyPlan(Base):
     carbs_g: Mapped[int | None] = mapped_column(Integer(), nullable=True)
     fat_g: Mapped[int | None] = mapped_column(Integer(), nullable=True)
 
+    # Percent split (macro_split_pct) when macros were given that way; the gram
+    # columns above are only set for macro_grams.
+    macro_split_json: Mapped[str | None] = mapped_column(String(200), nullable=True)
     training_schedule_json: Mapped[str | None] = mapped_column(String(2000), nullable=True)
     preferences_json: Mapped[str | None] = mapped_column(String(4000), nullable=True)
 
+    # Bumped by every write that changes the plan's derived data (meals, lock state,
+    # edits to recipes/foods it uses); caches of that data are keyed by it.
+    version: Mapped[int] = mapped_column(Integer(), nullable=False, default=1, server_default="1")
+
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -3,7 +3,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, ForeignKey, Numeric, String, func
+from sqlalchemy import DateTime, ForeignKey, Numeric, String, UniqueConstraint, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -12,6 +12,10 @@ from app.models.base import Base
 
 class WeightEntry(Base):
     __tablename__ = "weight_entries"
+    __table_args__ = (
+        # One reading per user per instant; lets bulk imports dedupe via ON CONFLICT DO NOTHING.
+        UniqueConstraint("user_id", "datetime_utc", name="uq_weight_entries_user_datetime_utc"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
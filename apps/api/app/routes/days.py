@@ -30,13 +30,8 @@ router = APIRouter(prefix="/days", tags=["days"])
 
 
 def _totals_out(d: dict[str, float]) -> MacroTotals:
-    # Round to 2 decimals for stable JSON/tests.
-    return MacroTotals(
-        kcal=round(d["kcal"], 2),
-        protein_g=round(d["protein_g"], 2),
-        carbs_g=round(d["carbs_g"], 2),
-        fat_g=round(d["fat_g"], 2),
-    )
+    # Values are already rounded to 2 decimals by app.core.nutrition.
+    return MacroTotals(**d)
 
 
 def _entry_out(entry, food) -> MealEntryOut:
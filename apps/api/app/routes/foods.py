@@ -13,13 +13,14 @@ from app.crud.foods import (
     list_favorites_for_user,
     list_foods_for_user,
     list_recent_for_user,
+    list_similar_foods_for_user,
     set_favorite,
     update_food_for_user_owned,
 )
 from app.db.session import get_db_session
 from app.models.user import User
 from app.routes.deps import get_current_user
-from app.schemas.foods import FoodCreate, FoodListOut, FoodOut, FoodUpdate
+from app.schemas.foods import FoodCreate, FoodListOut, FoodOut, FoodUpdate, SimilarFoodListOut, SimilarFoodOut
 
 router = APIRouter(prefix="/foods", tags=["foods"])
 
@@ -87,6 +88,26 @@ async def list_recent(
     return FoodListOut(items=[FoodOut.from_model(i, is_favorite=fav_map.get(i.id, False)) for i in items])
 
 
+@router.get("/{food_id}/similar", response_model=SimilarFoodListOut)
+async def list_similar(
+    food_id: uuid.UUID,
+    k: int = Query(default=10, ge=1, le=50),
+    session: AsyncSession = Depends(get_db_session),
+    user: User = Depends(get_current_user),
+) -> SimilarFoodListOut:
+    try:
+        similar = await list_similar_foods_for_user(session=session, user_id=user.id, food_id=food_id, k=k)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    fav_map = await get_favorite_map_for_user(session=session, user_id=user.id, food_ids=[f.id for f, _ in similar])
+    return SimilarFoodListOut(
+        items=[SimilarFoodOut.from_similar(f, distance=d, is_favorite=fav_map.get(f.id, False)) for f, d in similar]
+    )
+
+
 @router.post("/{food_id}/favorite", status_code=status.HTTP_204_NO_CONTENT)
 async def favorite_food(
     food_id: uuid.UUID,
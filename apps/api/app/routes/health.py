@@ -7,6 +7,7 @@ from sqlalchemy import text
 
 import app.db.session as db_session
 from app.core.logging import get_logger
+from app.crud.plans import get_grocery_checks_coalescer
 
 router = APIRouter(tags=["health"])
 logger = get_logger(__name__)
@@ -24,6 +25,13 @@ async def healthz(_bad: int | None = Query(default=None)) -> dict[str, str]:
     return {"status": "ok"}
 
 
+@router.get("/metricsz")
+async def metricsz() -> dict[str, dict[str, float]]:
+    """In-process counters of this worker (no DB access, no user data)."""
+
+    return {"grocery_checks_coalescer": get_grocery_checks_coalescer().stats.as_dict()}
+
+
 @router.get("/readyz")
 async def readyz(response: Response) -> dict[str, str]:
     """Readiness probe.
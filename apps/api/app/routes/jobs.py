@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import jobs as crud_jobs
+from app.db.session import get_db_session
+from app.models.job import Job
+from app.routes.deps import get_current_user
+from app.schemas.jobs import JobOut
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def job_out(job: Job) -> JobOut:
+    return JobOut(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        result=json.loads(job.result_json) if job.result_json is not None else None,
+        error=job.error,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(
+    job_id: uuid.UUID,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    job = await crud_jobs.get_job_for_user(session=session, user_id=current_user.id, job_id=job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job_out(job)
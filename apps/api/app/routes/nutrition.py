@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.nutrition import (
+    MACRO_FIELDS,
+    MacroVector,
+    centi_to_decimal,
+    divide_to_centi,
+    food_vector,
+    micro_to_centi,
+    scale_lines,
+    to_centi,
+)
+from app.crud import foods as crud_foods
+from app.db.session import get_db_session
+from app.routes.deps import get_current_user
+from app.schemas.nutrition import NutritionCalculateIn, NutritionCalculateOut, NutritionLineOut
+from app.schemas.recipes import Macros
+
+router = APIRouter(prefix="/nutrition", tags=["nutrition"])
+
+
+def _macros(centi: MacroVector) -> Macros:
+    return Macros(**{k: centi_to_decimal(v) for k, v in zip(MACRO_FIELDS, centi)})
+
+
+@router.post("/calculate", response_model=NutritionCalculateOut)
+async def calculate(
+    payload: NutritionCalculateIn,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    """Compute macros for (food_id, grams) lines without persisting anything.
+
+    Meant for live totals in the recipe editor; uses the same kernel and rounding as
+    stored recipe macros, so the numbers match once the recipe is saved.
+    """
+
+    foods = await crud_foods.get_foods_for_user_scope(
+        session=session,
+        user_id=current_user.id,
+        food_ids=[line.food_id for line in payload.lines],
+    )
+    if any(line.food_id not in foods for line in payload.lines):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Food not found")
+
+    vectors = {fid: food_vector(food) for fid, food in foods.items()}
+    line_vectors, total = scale_lines(
+        [vectors[line.food_id] for line in payload.lines],
+        [to_centi(line.grams) for line in payload.lines],
+    )
+
+    per_serving = None
+    if payload.servings is not None:
+        per_serving = _macros(divide_to_centi(total, to_centi(payload.servings)))
+
+    return NutritionCalculateOut(
+        lines=[
+            NutritionLineOut(food_id=line.food_id, grams=line.grams, macros=_macros(micro_to_centi(v)))
+            for line, v in zip(payload.lines, line_vectors)
+        ],
+        total_macros=_macros(micro_to_centi(total)),
+        macros_per_serving=per_serving,
+    )
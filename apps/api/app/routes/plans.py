@@ -1,31 +1,164 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import uuid
+from collections.abc import AsyncIterator, Sequence
 from datetime import date
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import worker
+from app.core.nutrition import centi_to_float
+from app.core.planner import DayTargets
+from app.core.pubsub import RESYNC, get_pubsub
+from app.crud import jobs as crud_jobs
 from app.crud import plans as crud_plans
+from app.db.dialect import is_postgres
 from app.db.session import get_db_session
+from app.models.weekly_plan import WeeklyPlan, WeeklyPlanMeal
 from app.routes.deps import get_current_user
+from app.routes.jobs import job_out
+from app.schemas.days import MacroTotals
+from app.schemas.jobs import JobOut
 from app.schemas.plans import (
+    AcceptWeeklyPlanPreviewRequest,
     GroceryListChecksBulkUpdateRequest,
     GroceryListOut,
     GroceryListItemOut,
+    GenerateWeeklyPlanRangeRequest,
     GenerateWeeklyPlanRequest,
     SwapWeeklyPlanMealRequest,
+    WeeklyPlanDiaryLogOut,
+    WeeklyPlanGenerationSummary,
+    WeeklyPlanMacroDeviation,
+    WeeklyPlanMealAlternativeOut,
+    WeeklyPlanMealAlternativesOut,
+    WeeklyPlanMealEditOut,
+    WeeklyPlanMealOut,
     WeeklyPlanOut,
+    WeeklyPlanPreviewOut,
+    WeeklyPlanRangeOut,
 )
 
 router = APIRouter(prefix="/plans", tags=["plans"])
 
 
-@router.post("/weekly/generate", response_model=WeeklyPlanOut, status_code=status.HTTP_201_CREATED)
+def _totals_out(v: Sequence[int]) -> MacroTotals:
+    return MacroTotals(
+        kcal=centi_to_float(v[0]),
+        protein_g=centi_to_float(v[1]),
+        carbs_g=centi_to_float(v[2]),
+        fat_g=centi_to_float(v[3]),
+    )
+
+
+def _deviation_out(v: Sequence[int], plan: WeeklyPlan, *, days: int) -> WeeklyPlanMacroDeviation:
+    def dev(total: int, target: int | None) -> float | None:
+        return None if target is None else centi_to_float(total - target * days * 100)
+
+    return WeeklyPlanMacroDeviation(
+        kcal=dev(v[0], plan.target_kcal),  # type: ignore[arg-type]
+        protein_g=dev(v[1], plan.protein_g),
+        carbs_g=dev(v[2], plan.carbs_g),
+        fat_g=dev(v[3], plan.fat_g),
+    )
+
+
+def _target_deviation_out(v: Sequence[int], target: DayTargets) -> WeeklyPlanMacroDeviation:
+    # Like _deviation_out, but against one day's optimizer targets (training-day kcal,
+    # macro split), which need not be whole numbers.
+    def dev(total: int, goal: float | None) -> float | None:
+        return None if goal is None else centi_to_float(total - round(goal * 100))
+
+    return WeeklyPlanMacroDeviation(
+        kcal=dev(v[0], target.kcal),  # type: ignore[arg-type]
+        protein_g=dev(v[1], target.protein),
+        carbs_g=dev(v[2], target.carbs),
+        fat_g=dev(v[3], target.fat),
+    )
+
+
+async def _plans_out(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    plans: list[WeeklyPlan],
+    summaries: Sequence[WeeklyPlanGenerationSummary | dict[str, int] | None] | None = None,
+) -> list[WeeklyPlanOut]:
+    macro_totals = await crud_plans.weekly_plan_macro_totals(session=session, user_id=user_id, plans=plans)
+
+    outs: list[WeeklyPlanOut] = []
+    for i, (plan, (day_totals, week_total)) in enumerate(zip(plans, macro_totals)):
+        out = WeeklyPlanOut.model_validate(plan)
+        for day in out.days:
+            totals = day_totals[day.id]
+            day.totals = _totals_out(totals)
+            day.deviation = _deviation_out(totals, plan, days=1)
+        out.totals = _totals_out(week_total)
+        out.deviation = _deviation_out(week_total, plan, days=len(out.days))
+        if summaries is not None and summaries[i] is not None:
+            out.generation_summary = summaries[i]
+        outs.append(out)
+    return outs
+
+
+async def _plan_out(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    plan: WeeklyPlan,
+    summary: WeeklyPlanGenerationSummary | dict[str, int] | None = None,
+) -> WeeklyPlanOut:
+    [out] = await _plans_out(session=session, user_id=user_id, plans=[plan], summaries=[summary])
+    return out
+
+
+async def _enqueue_job(
+    *, session: AsyncSession, user_id: uuid.UUID, kind: str, payload: dict
+) -> JSONResponse:
+    """Queue a job and answer 202 with it; poll `Location` (GET /jobs/{id}) for the result.
+
+    On Postgres a worker (app.worker) picks it up after the commit. Other databases
+    have no `SKIP LOCKED` claim, so the job runs inline and is already finished.
+    """
+
+    job = await crud_jobs.create_job(session=session, user_id=user_id, kind=kind, payload=payload)
+    if not is_postgres(session):
+        await worker.run_job_inline(session=session, job=job)
+    await session.commit()
+    await session.refresh(job)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(job_out(job)),
+        headers={"Location": f"/jobs/{job.id}"},
+    )
+
+
+@router.post(
+    "/weekly/generate",
+    response_model=WeeklyPlanOut,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": JobOut, "description": "Queued as a job (async=true)"}},
+)
 async def generate_weekly_plan(
     payload: GenerateWeeklyPlanRequest,
+    async_: bool = Query(default=False, alias="async"),
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ):
+    if async_:
+        return await _enqueue_job(
+            session=session,
+            user_id=current_user.id,
+            kind=worker.WEEKLY_PLAN_GENERATE,
+            payload=payload.model_dump(mode="json"),
+        )
+
     try:
         plan, summary = await crud_plans.generate_weekly_plan_for_user(
             session=session,
@@ -40,20 +173,141 @@ async def generate_weekly_plan(
     # atomic and tests can control rollback.
     await session.flush()
 
-    out = WeeklyPlanOut.model_validate(plan)
-    out.generation_summary = summary
+    return await _plan_out(session=session, user_id=current_user.id, plan=plan, summary=summary)
+
+
+@router.post("/weekly/generate-range", response_model=WeeklyPlanRangeOut, status_code=status.HTTP_201_CREATED)
+async def generate_weekly_plan_range(
+    payload: GenerateWeeklyPlanRangeRequest,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    try:
+        results = await crud_plans.generate_weekly_plans_for_user(
+            session=session,
+            user_id=current_user.id,
+            payload=payload,
+            weeks=payload.weeks,
+            cross_week_variety=payload.cross_week_variety,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    await session.flush()
+
+    plans = await _plans_out(
+        session=session,
+        user_id=current_user.id,
+        plans=[plan for plan, _ in results],
+        summaries=[summary for _, summary in results],
+    )
+    return WeeklyPlanRangeOut(plans=plans)
+
+
+@router.post("/weekly/generate/preview", response_model=WeeklyPlanPreviewOut)
+async def preview_weekly_plan(
+    payload: GenerateWeeklyPlanRequest,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    """Propose a plan for the inputs without saving anything; see /weekly/generate/accept."""
+
+    try:
+        preview = await crud_plans.preview_weekly_plan_for_user(
+            session=session,
+            user_id=current_user.id,
+            payload=payload,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    plan = preview.plan
+    out = WeeklyPlanPreviewOut.model_validate(
+        {
+            "week_start": plan.week_start,
+            "target_kcal": plan.target_kcal,
+            "protein_g": plan.protein_g,
+            "carbs_g": plan.carbs_g,
+            "fat_g": plan.fat_g,
+            "days": plan.days,
+            "totals": _totals_out(preview.week_total),
+            "deviation": _deviation_out(preview.week_total, plan, days=len(plan.days)),
+            "preview_token": preview.token,
+        }
+    )
+    for day, day_row in zip(out.days, plan.days):
+        totals = preview.day_totals[day_row.id]
+        day.totals = _totals_out(totals)
+        day.deviation = _deviation_out(totals, plan, days=1)
     return out
 
 
-@router.patch("/weekly/{week_start}/meals:swap", response_model=WeeklyPlanOut)
+@router.post("/weekly/generate/accept", response_model=WeeklyPlanOut, status_code=status.HTTP_201_CREATED)
+async def accept_weekly_plan_preview(
+    payload: AcceptWeeklyPlanPreviewRequest,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    """Save the previewed plan; 409 if generating now would no longer give that plan."""
+
+    try:
+        plan, summary = await crud_plans.generate_weekly_plan_for_user(
+            session=session,
+            user_id=current_user.id,
+            payload=payload,
+            expected_preview_token=payload.preview_token,
+        )
+    except crud_plans.StalePlanPreviewError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    await session.flush()
+
+    return await _plan_out(session=session, user_id=current_user.id, plan=plan, summary=summary)
+
+
+# `view=meal` answers a meal edit with just the meal and its day's totals instead of
+# the whole plan.
+MealEditView = Literal["plan", "meal"]
+
+
+async def _meal_edit_out(
+    *,
+    session: AsyncSession,
+    user_id: uuid.UUID,
+    week_start: date,
+    meal: WeeklyPlanMeal,
+    view: MealEditView,
+) -> WeeklyPlanOut | WeeklyPlanMealEditOut:
+    if view == "meal":
+        plan, day_date, totals = await crud_plans.weekly_plan_day_macro_totals(
+            session=session, user_id=user_id, day_id=meal.weekly_plan_day_id
+        )
+        return WeeklyPlanMealEditOut(
+            meal=WeeklyPlanMealOut.model_validate(meal),
+            day_id=meal.weekly_plan_day_id,
+            date=day_date,
+            day_totals=_totals_out(totals),
+            day_deviation=_deviation_out(totals, plan, days=1),
+        )
+
+    plan = await crud_plans.get_weekly_plan_for_user(session=session, user_id=user_id, week_start=week_start)
+    if plan is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
+    return await _plan_out(session=session, user_id=user_id, plan=plan)
+
+
+@router.patch("/weekly/{week_start}/meals:swap", response_model=WeeklyPlanOut | WeeklyPlanMealEditOut)
 async def swap_weekly_plan_meal(
     week_start: date,
     payload: SwapWeeklyPlanMealRequest,
+    view: MealEditView = Query(default="plan"),
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ):
     try:
-        plan = await crud_plans.swap_weekly_plan_meal_for_user(
+        meal = await crud_plans.swap_weekly_plan_meal_for_user(
             session=session,
             user_id=current_user.id,
             week_start=week_start,
@@ -64,23 +318,21 @@ async def swap_weekly_plan_meal(
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
-    await session.flush()
-    return WeeklyPlanOut.model_validate(plan)
+    return await _meal_edit_out(session=session, user_id=current_user.id, week_start=week_start, meal=meal, view=view)
 
 
-@router.patch("/weekly/{week_start}/meals/{meal_id}", response_model=WeeklyPlanOut)
+@router.patch("/weekly/{week_start}/meals/{meal_id}", response_model=WeeklyPlanOut | WeeklyPlanMealEditOut)
 async def toggle_weekly_plan_meal_lock(
     week_start: date,
     meal_id: str,
     *,
     locked: bool,
+    view: MealEditView = Query(default="plan"),
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ):
     try:
-        import uuid
-
-        plan = await crud_plans.set_weekly_plan_meal_lock_for_user(
+        meal = await crud_plans.set_weekly_plan_meal_lock_for_user(
             session=session,
             user_id=current_user.id,
             week_start=week_start,
@@ -92,43 +344,87 @@ async def toggle_weekly_plan_meal_lock(
     except LookupError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
-    await session.flush()
-    return WeeklyPlanOut.model_validate(plan)
+    return await _meal_edit_out(session=session, user_id=current_user.id, week_start=week_start, meal=meal, view=view)
 
 
-@router.get("/weekly/{week_start}", response_model=WeeklyPlanOut)
-async def get_weekly_plan(
+@router.get("/weekly/{week_start}/meals/{meal_id}/alternatives", response_model=WeeklyPlanMealAlternativesOut)
+async def get_weekly_plan_meal_alternatives(
     week_start: date,
+    meal_id: uuid.UUID,
+    tags: list[str] | None = Query(default=None),
+    limit: int = Query(default=10, ge=1, le=50),
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ):
-    plan = await crud_plans.get_weekly_plan_for_user(session=session, user_id=current_user.id, week_start=week_start)
-    if plan is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
-    return WeeklyPlanOut.model_validate(plan)
+    """The user's recipes ranked by how well they keep the meal's day on target."""
 
+    try:
+        day_date, day_target, alternatives = await crud_plans.weekly_plan_meal_alternatives_for_user(
+            session=session,
+            user_id=current_user.id,
+            week_start=week_start,
+            meal_id=meal_id,
+            tags=tags,
+            limit=limit,
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
 
-@router.get("/weekly/{week_start}/grocery-list", response_model=GroceryListOut)
-async def get_weekly_plan_grocery_list(
+    return WeeklyPlanMealAlternativesOut(
+        meal_id=meal_id,
+        date=day_date,
+        alternatives=[
+            WeeklyPlanMealAlternativeOut(
+                recipe_id=a.recipe_id,
+                name=a.name,
+                servings=a.servings,
+                day_totals=_totals_out(a.day_totals),
+                day_deviation=_target_deviation_out(a.day_totals, day_target),
+            )
+            for a in alternatives
+        ],
+    )
+
+
+@router.post("/weekly/{week_start}/log", response_model=WeeklyPlanDiaryLogOut, status_code=status.HTTP_201_CREATED)
+async def log_weekly_plan_to_diary(
     week_start: date,
+    day_date: date | None = Query(default=None, alias="date", description="Log only this day of the week"),
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
-):
-    plan = await crud_plans.get_weekly_plan_for_user(session=session, user_id=current_user.id, week_start=week_start)
-    if plan is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
-
+) -> WeeklyPlanDiaryLogOut:
     try:
-        foods_by_id, totals_by_food_id, breakdown_by_food_id = await crud_plans.grocery_list_for_weekly_plan(
+        log = await crud_plans.log_weekly_plan_to_diary_for_user(
             session=session,
             user_id=current_user.id,
-            plan=plan,
+            week_start=week_start,
+            day_date=day_date,
         )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
     except ValueError as e:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    # Diary writes are committed like POST /days/{date}/entries.
+    await session.commit()
+    return WeeklyPlanDiaryLogOut(week_start=week_start, dates=log.dates, entries_created=log.entries_created)
 
-    checked_by_key = await crud_plans._checked_map_for_week(session=session, user_id=current_user.id, week_start=week_start)
 
+@router.get("/weekly/{week_start}", response_model=WeeklyPlanOut)
+async def get_weekly_plan(
+    week_start: date,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    plan = await crud_plans.get_weekly_plan_for_user(session=session, user_id=current_user.id, week_start=week_start)
+    if plan is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
+    return await _plan_out(session=session, user_id=current_user.id, plan=plan)
+
+
+def _grocery_items(foods_by_id, totals_by_food_id, breakdown_by_food_id) -> list[GroceryListItemOut]:
     items: list[GroceryListItemOut] = []
     for food_id in sorted(totals_by_food_id.keys(), key=lambda x: str(x)):
         food = foods_by_id.get(food_id)
@@ -146,11 +442,63 @@ async def get_weekly_plan_grocery_list(
                 food_id=food_id,
                 food_name=food_name,
                 total_grams=totals_by_food_id[food_id],
-                checked=checked_by_key.get(item_key, False),
                 per_recipe=breakdown_by_food_id.get(food_id, []),
             )
         )
+    return items
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Weak comparison (RFC 9110 8.8.3.2): ignore the W/ prefix on both sides.
+    wanted = etag.removeprefix("W/")
+    return any(t == "*" or t.strip().removeprefix("W/") == wanted for t in if_none_match.split(","))
+
+
+@router.get("/weekly/{week_start}/grocery-list", response_model=GroceryListOut)
+async def get_weekly_plan_grocery_list(
+    week_start: date,
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    ref = await crud_plans.get_weekly_plan_version_for_user(
+        session=session, user_id=current_user.id, week_start=week_start
+    )
+    if ref is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
+    plan_id, version = ref
+
+    # Checked state is not part of the cached list; it is merged in on every read.
+    checked_by_key = await crud_plans._checked_map_for_week(session=session, user_id=current_user.id, week_start=week_start)
+    etag = crud_plans.grocery_list_etag(plan_id=plan_id, version=version, checked_by_key=checked_by_key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
+    cache = crud_plans.get_grocery_list_cache()
+    cached: list[GroceryListItemOut] | None = cache.get((plan_id, version))
+    if cached is None:
+        plan = await crud_plans.get_weekly_plan_for_user(session=session, user_id=current_user.id, week_start=week_start)
+        if plan is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
+
+        try:
+            foods_by_id, totals_by_food_id, breakdown_by_food_id = await crud_plans.grocery_list_for_weekly_plan(
+                session=session,
+                user_id=current_user.id,
+                plan=plan,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+        cached = _grocery_items(foods_by_id, totals_by_food_id, breakdown_by_food_id)
+        cache.set((plan_id, version), cached)
+
+    response.headers.update(headers)
+    items = [it.model_copy(update={"checked": checked_by_key.get(it.item_key, False)}) for it in cached]
     return GroceryListOut(week_start=week_start, items=items)
 
 
@@ -162,11 +510,13 @@ async def bulk_update_grocery_list_checks(
     current_user=Depends(get_current_user),
 ):
     # Ensure plan exists for consistent UX.
-    plan = await crud_plans.get_weekly_plan_for_user(session=session, user_id=current_user.id, week_start=week_start)
-    if plan is None:
+    ref = await crud_plans.get_weekly_plan_version_for_user(
+        session=session, user_id=current_user.id, week_start=week_start
+    )
+    if ref is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
 
-    await crud_plans.bulk_upsert_grocery_item_checks(
+    await crud_plans.coalesced_upsert_grocery_item_checks(
         session=session,
         user_id=current_user.id,
         week_start=week_start,
@@ -174,3 +524,68 @@ async def bulk_update_grocery_list_checks(
     )
 
     return None
+
+
+# Comment line sent when idle so proxies and clients keep the stream open.
+SSE_KEEPALIVE_S = 15.0
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+@router.get("/weekly/{week_start}/grocery-list/checks/events")
+async def stream_grocery_list_checks(
+    week_start: date,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    """Server-Sent Events feed of check-state changes for the week's grocery list.
+
+    Starts with a `snapshot` event (all checked states), then one `checks` event per
+    durable write (deltas only). `resync` means events were lost (slow consumer or
+    oversized batch): re-read the list or reconnect for a fresh snapshot.
+    """
+
+    ref = await crud_plans.get_weekly_plan_version_for_user(
+        session=session, user_id=current_user.id, week_start=week_start
+    )
+    if ref is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
+
+    pubsub = get_pubsub()
+    # Subscribe before reading the snapshot so no write can fall in between.
+    sub = pubsub.subscribe(crud_plans.grocery_checks_channel(user_id=current_user.id, week_start=week_start))
+    try:
+        checked_by_key = await crud_plans._checked_map_for_week(
+            session=session, user_id=current_user.id, week_start=week_start
+        )
+    except BaseException:
+        pubsub.unsubscribe(sub)
+        raise
+    # The stream can stay open for hours; don't hold a pooled connection for it.
+    await session.close()
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            items = [{"item_key": k, "checked": v} for k, v in sorted(checked_by_key.items())]
+            yield _sse("snapshot", {"items": items})
+            while True:
+                try:
+                    message = await asyncio.wait_for(sub.get(), timeout=SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is RESYNC:
+                    yield _sse("resync", {})
+                    continue
+                data = json.loads(message)  # type: ignore[arg-type]
+                yield _sse(data.pop("type"), data)
+        finally:
+            pubsub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
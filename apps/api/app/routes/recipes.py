@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import uuid
+from decimal import Decimal
+from typing import Literal
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.exc import IntegrityError
@@ -13,7 +15,9 @@ from app.schemas.recipes import (
     RecipeCreate,
     RecipeItemCreate,
     RecipeItemOut,
+    RecipeItemsReplace,
     RecipeItemUpdate,
+    RecipeListOut,
     RecipeOut,
     RecipeUpdate,
 )
@@ -21,20 +25,41 @@ from app.schemas.recipes import (
 router = APIRouter(prefix="/recipes", tags=["recipes"])
 
 
-def _recipe_out(*, recipe, total, per_serving, tags: list[str], is_favorite: bool) -> RecipeOut:
-    return RecipeOut(
-        id=recipe.id,
-        user_id=recipe.user_id,
-        name=recipe.name,
-        servings=recipe.servings,
-        tags=tags,
-        is_favorite=is_favorite,
-        created_at=recipe.created_at,
-        updated_at=recipe.updated_at,
-        items=[RecipeItemOut.model_validate(i) for i in recipe.items],
-        total_macros=total,
-        macros_per_serving=per_serving,
-    )
+def get_recipe_loader(
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> crud_recipes.RecipeDetailsLoader:
+    # FastAPI caches dependencies per request, so routes share one loader per request.
+    return crud_recipes.RecipeDetailsLoader(session=session, user_id=current_user.id)
+
+
+async def _recipes_out(
+    loader: crud_recipes.RecipeDetailsLoader, recipes, *, include_items: bool = True
+) -> list[RecipeOut]:
+    await loader.load([r.id for r in recipes])
+    out: list[RecipeOut] = []
+    for recipe in recipes:
+        total, per_serving = crud_recipes.recipe_macros(recipe)
+        out.append(
+            RecipeOut(
+                id=recipe.id,
+                user_id=recipe.user_id,
+                name=recipe.name,
+                servings=recipe.servings,
+                tags=loader.tags(recipe.id),
+                is_favorite=loader.is_favorite(recipe.id),
+                created_at=recipe.created_at,
+                updated_at=recipe.updated_at,
+                items=[RecipeItemOut.model_validate(i) for i in recipe.items] if include_items else None,
+                total_macros=total,
+                macros_per_serving=per_serving,
+            )
+        )
+    return out
+
+
+async def _recipe_out(loader: crud_recipes.RecipeDetailsLoader, recipe) -> RecipeOut:
+    return (await _recipes_out(loader, [recipe]))[0]
 
 
 @router.post("", response_model=RecipeOut, status_code=status.HTTP_201_CREATED)
@@ -42,37 +67,46 @@ async def create_recipe(
     payload: RecipeCreate,
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
+    loader: crud_recipes.RecipeDetailsLoader = Depends(get_recipe_loader),
 ):
-    recipe = await crud_recipes.create_recipe_for_user(
-        session=session,
-        user_id=current_user.id,
-        name=payload.name,
-        servings=payload.servings,
-        tags=payload.tags,
-    )
+    try:
+        recipe = await crud_recipes.create_recipe_for_user(
+            session=session,
+            user_id=current_user.id,
+            name=payload.name,
+            servings=payload.servings,
+            tags=payload.tags,
+            items=[(i.food_id, i.grams) for i in payload.items],
+        )
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Food not found")
     recipe = await crud_recipes.get_recipe_for_user(session=session, user_id=current_user.id, recipe_id=recipe.id)
     if recipe is None:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Recipe creation failed")
-    total, per_serving = await crud_recipes.compute_recipe_macros(session=session, recipe=recipe, user_id=current_user.id)
-    tag_map = await crud_recipes.get_recipe_tag_names_for_user(session=session, user_id=current_user.id, recipe_ids=[recipe.id])
-    fav_map = await crud_recipes.get_recipe_favorite_map_for_user(session=session, user_id=current_user.id, recipe_ids=[recipe.id])
-    return _recipe_out(
-        recipe=recipe,
-        total=total,
-        per_serving=per_serving,
-        tags=tag_map.get(recipe.id, []),
-        is_favorite=fav_map.get(recipe.id, False),
-    )
+    return await _recipe_out(loader, recipe)
 
 
-@router.get("", response_model=list[RecipeOut])
+@router.get("", response_model=RecipeListOut)
 async def list_recipes(
     tags: list[str] | None = Query(default=None),
     high_protein: bool = Query(default=False),
     under_30_min: bool = Query(default=False),
     favorites_only: bool = Query(default=False),
+    min_protein_per_serving: Decimal | None = Query(default=None, ge=0),
+    max_protein_per_serving: Decimal | None = Query(default=None, ge=0),
+    min_kcal_per_serving: Decimal | None = Query(default=None, ge=0),
+    max_kcal_per_serving: Decimal | None = Query(default=None, ge=0),
+    sort: Literal[
+        "created_at", "name", "kcal_per_serving", "protein_per_serving", "protein_density"
+    ] = Query(default="created_at"),
+    cursor: uuid.UUID | None = Query(default=None),
+    # Paging is opt-in: without `limit` the whole list comes back (next_cursor null),
+    # which is what clients that don't follow next_cursor rely on.
+    limit: int | None = Query(default=None, ge=1, le=200),
+    include: list[Literal["items"]] | None = Query(default=None),
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
+    loader: crud_recipes.RecipeDetailsLoader = Depends(get_recipe_loader),
 ):
     # Duration is not modeled yet; fail fast instead of silently ignoring the filter.
     if under_30_min:
@@ -81,33 +115,25 @@ async def list_recipes(
             detail="Filter 'under_30_min' is not supported yet (recipe duration is not available).",
         )
 
-    recipes = await crud_recipes.list_recipes_for_user(
+    include_items = bool(include and "items" in include)
+    recipes, next_cursor = await crud_recipes.list_recipes_for_user(
         session=session,
         user_id=current_user.id,
         tags=tags,
         high_protein=high_protein,
         under_30_min=under_30_min,
         favorites_only=favorites_only,
+        min_protein_per_serving=min_protein_per_serving,
+        max_protein_per_serving=max_protein_per_serving,
+        min_kcal_per_serving=min_kcal_per_serving,
+        max_kcal_per_serving=max_kcal_per_serving,
+        sort=sort,
+        limit=limit,
+        after=cursor,
+        include_items=include_items,
     )
-    tag_map = await crud_recipes.get_recipe_tag_names_for_user(
-        session=session, user_id=current_user.id, recipe_ids=[r.id for r in recipes]
-    )
-    fav_map = await crud_recipes.get_recipe_favorite_map_for_user(
-        session=session, user_id=current_user.id, recipe_ids=[r.id for r in recipes]
-    )
-    out: list[RecipeOut] = []
-    for r in recipes:
-        total, per_serving = await crud_recipes.compute_recipe_macros(session=session, recipe=r, user_id=current_user.id)
-        out.append(
-            _recipe_out(
-                recipe=r,
-                total=total,
-                per_serving=per_serving,
-                tags=tag_map.get(r.id, []),
-                is_favorite=fav_map.get(r.id, False),
-            )
-        )
-    return out
+    out = await _recipes_out(loader, recipes, include_items=include_items)
+    return RecipeListOut(items=out, next_cursor=next_cursor)
 
 
 @router.get("/{recipe_id}", response_model=RecipeOut)
@@ -115,24 +141,12 @@ async def get_recipe(
     recipe_id: uuid.UUID,
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
+    loader: crud_recipes.RecipeDetailsLoader = Depends(get_recipe_loader),
 ):
-    res = await crud_recipes.get_recipe_macros_for_user(
-        session=session,
-        user_id=current_user.id,
-        recipe_id=recipe_id,
-    )
-    if res is None:
+    recipe = await crud_recipes.get_recipe_for_user(session=session, user_id=current_user.id, recipe_id=recipe_id)
+    if recipe is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recipe not found")
-    recipe, total, per_serving = res
-    tag_map = await crud_recipes.get_recipe_tag_names_for_user(session=session, user_id=current_user.id, recipe_ids=[recipe.id])
-    fav_map = await crud_recipes.get_recipe_favorite_map_for_user(session=session, user_id=current_user.id, recipe_ids=[recipe.id])
-    return _recipe_out(
-        recipe=recipe,
-        total=total,
-        per_serving=per_serving,
-        tags=tag_map.get(recipe.id, []),
-        is_favorite=fav_map.get(recipe.id, False),
-    )
+    return await _recipe_out(loader, recipe)
 
 
 @router.patch("/{recipe_id}", response_model=RecipeOut)
@@ -141,6 +155,7 @@ async def update_recipe(
     payload: RecipeUpdate,
     session: AsyncSession = Depends(get_db_session),
     current_user=Depends(get_current_user),
+    loader: crud_recipes.RecipeDetailsLoader = Depends(get_recipe_loader),
 ):
     recipe = await crud_recipes.update_recipe_for_user(
         session=session,
@@ -152,17 +167,7 @@ async def update_recipe(
     )
     if recipe is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recipe not found")
-
-    total, per_serving = await crud_recipes.compute_recipe_macros(session=session, recipe=recipe, user_id=current_user.id)
-    tag_map = await crud_recipes.get_recipe_tag_names_for_user(session=session, user_id=current_user.id, recipe_ids=[recipe.id])
-    fav_map = await crud_recipes.get_recipe_favorite_map_for_user(session=session, user_id=current_user.id, recipe_ids=[recipe.id])
-    return _recipe_out(
-        recipe=recipe,
-        total=total,
-        per_serving=per_serving,
-        tags=tag_map.get(recipe.id, []),
-        is_favorite=fav_map.get(recipe.id, False),
-    )
+    return await _recipe_out(loader, recipe)
 
 
 @router.delete("/{recipe_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -235,6 +240,28 @@ async def add_item(
     return RecipeItemOut.model_validate(item)
 
 
+@router.put("/{recipe_id}/items", response_model=RecipeOut)
+async def replace_items(
+    recipe_id: uuid.UUID,
+    payload: RecipeItemsReplace,
+    session: AsyncSession = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+    loader: crud_recipes.RecipeDetailsLoader = Depends(get_recipe_loader),
+):
+    try:
+        recipe = await crud_recipes.replace_recipe_items_for_user(
+            session=session,
+            user_id=current_user.id,
+            recipe_id=recipe_id,
+            items=[(i.food_id, i.grams) for i in payload.items],
+        )
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Food not found")
+    if recipe is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Recipe not found")
+    return await _recipe_out(loader, recipe)
+
+
 @router.patch("/{recipe_id}/items/{item_id}", response_model=RecipeItemOut)
 async def update_item(
     recipe_id: uuid.UUID,
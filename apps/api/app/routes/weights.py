@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import csv
+import io
+import json
 import uuid
 from datetime import UTC, datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.crud.weight_entries import (
+    bulk_import_weight_entries,
     create_weight_entry,
     delete_weight_entry_for_user,
     list_weight_entries,
@@ -15,7 +21,16 @@ from app.crud.weight_entries import (
 from app.db.session import get_db_session
 from app.models.user import User
 from app.routes.deps import get_current_user
-from app.schemas.weights import WeightEntryCreate, WeightEntryListOut, WeightEntryOut, WeightEntryUpdate
+from app.schemas.weights import (
+    MAX_IMPORT_ERRORS_REPORTED,
+    MAX_IMPORT_ROWS,
+    WeightEntryCreate,
+    WeightEntryListOut,
+    WeightEntryOut,
+    WeightEntryUpdate,
+    WeightImportOut,
+    WeightImportRowError,
+)
 
 router = APIRouter(prefix="/weights", tags=["weights"])
 
@@ -28,6 +43,95 @@ def _normalize_query_dt(dt: datetime | None) -> datetime | None:
     return dt.astimezone(UTC)
 
 
+# Header aliases seen in common smart-scale exports (compared case-insensitively).
+# Exports with separate Date and Time columns are joined into one datetime; a Date
+# column on its own may hold the full datetime.
+_CSV_COLUMN_ALIASES: dict[str, str] = {
+    "datetime": "datetime",
+    "date": "date",
+    "time": "time",
+    "timestamp": "datetime",
+    "weight_kg": "weight_kg",
+    "weight": "weight_kg",
+    "weight (kg)": "weight_kg",
+    "note": "note",
+    "notes": "note",
+    "comment": "note",
+}
+
+
+def _parse_import_rows(*, content_type: str, body: bytes) -> list[dict]:
+    """Parse an import payload into raw row dicts (validated later, row by row).
+
+    Accepted formats:
+      - `text/csv`: header row with datetime (or date[+time])/weight_kg[/note] columns
+        (common aliases allowed; each field may come from one column only)
+      - `application/json`: a list of rows or `{"items": [...]}`
+    """
+
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Import payload must be UTF-8")
+
+    if content_type.startswith("text/csv"):
+        reader = csv.DictReader(io.StringIO(text))
+        if reader.fieldnames is None:
+            return []
+        columns = {name: _CSV_COLUMN_ALIASES.get(name.strip().lower()) for name in reader.fieldnames}
+        fields = [f for f in columns.values() if f]
+        repeated = sorted({f for f in fields if fields.count(f) > 1})
+        if repeated:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"CSV header has more than one column for: {', '.join(repeated)}",
+            )
+        if "datetime" in fields and "date" in fields:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="CSV header has both datetime and date columns",
+            )
+        if "time" in fields and "date" not in fields:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="CSV time column needs a date column",
+            )
+        if ("datetime" not in fields and "date" not in fields) or "weight_kg" not in fields:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="CSV header must include datetime and weight_kg columns",
+            )
+        rows: list[dict] = []
+        for raw in reader:
+            row = {columns[k]: (v.strip() if isinstance(v, str) else v) for k, v in raw.items() if columns.get(k)}
+            if "date" in row:
+                day, clock = row.pop("date"), row.pop("time", None)
+                row["datetime"] = f"{day}T{clock}" if day and clock else day
+            if row.get("note") == "":
+                row["note"] = None
+            rows.append(row)
+        return rows
+
+    if content_type.startswith("application/json"):
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid JSON payload")
+        if isinstance(data, dict):
+            data = data.get("items")
+        if not isinstance(data, list):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="JSON payload must be a list of rows or an object with an 'items' list",
+            )
+        return data
+
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Import payload must be text/csv or application/json",
+    )
+
+
 def _to_out(entry) -> dict:
     dt = entry.datetime_utc
     dt_str = dt.isoformat().replace("+00:00", "Z")
@@ -46,17 +150,74 @@ async def create_weight(
     session: AsyncSession = Depends(get_db_session),
     user: User = Depends(get_current_user),
 ) -> dict:
-    entry = await create_weight_entry(
-        session=session,
-        user_id=user.id,
-        datetime_utc=payload.datetime_,
-        weight_kg=payload.weight_kg,
-        note=payload.note,
-    )
-    await session.commit()
+    try:
+        entry = await create_weight_entry(
+            session=session,
+            user_id=user.id,
+            datetime_utc=payload.datetime_,
+            weight_kg=payload.weight_kg,
+            note=payload.note,
+        )
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Weight entry already exists at this datetime")
     return _to_out(entry)
 
 
+@router.post("/import", response_model=WeightImportOut)
+async def import_weights(
+    request: Request,
+    session: AsyncSession = Depends(get_db_session),
+    user: User = Depends(get_current_user),
+) -> WeightImportOut:
+    """Bulk import weigh-ins (e.g. smart-scale exports).
+
+    Rows are validated with the same rules as `POST /weights`; invalid rows are
+    reported and skipped rather than failing the whole import. Rows whose datetime
+    already exists for the user (in the DB or earlier in the same payload) are
+    counted as duplicates. Re-running the same import is therefore idempotent.
+    """
+
+    rows = _parse_import_rows(content_type=request.headers.get("content-type", ""), body=await request.body())
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Import is limited to {MAX_IMPORT_ROWS} rows per request",
+        )
+
+    errors: list[WeightImportRowError] = []
+    invalid = 0
+    seen: set[datetime] = set()
+    valid: list[tuple[datetime, float, str | None]] = []
+    for idx, raw in enumerate(rows, start=1):
+        try:
+            entry = WeightEntryCreate.model_validate(raw)
+        except ValidationError as e:
+            invalid += 1
+            if len(errors) < MAX_IMPORT_ERRORS_REPORTED:
+                err = e.errors()[0]
+                loc = ".".join(str(p) for p in err.get("loc", ()))
+                errors.append(WeightImportRowError(row=idx, message=f"{loc}: {err['msg']}" if loc else err["msg"]))
+            continue
+
+        if entry.datetime_ in seen:
+            continue
+        seen.add(entry.datetime_)
+        valid.append((entry.datetime_, entry.weight_kg, entry.note))
+
+    inserted = await bulk_import_weight_entries(session=session, user_id=user.id, rows=valid)
+    await session.commit()
+
+    return WeightImportOut(
+        received=len(rows),
+        inserted=inserted,
+        duplicates=len(rows) - invalid - inserted,
+        invalid=invalid,
+        errors=errors,
+    )
+
+
 @router.get("", response_model=None)
 async def list_weights(
     from_: datetime | None = Query(default=None, alias="from"),
@@ -85,18 +246,22 @@ async def patch_weight(
     session: AsyncSession = Depends(get_db_session),
     user: User = Depends(get_current_user),
 ) -> WeightEntryOut:
-    entry = await update_weight_entry_for_user(
-        session=session,
-        user_id=user.id,
-        entry_id=entry_id,
-        datetime_utc=payload.datetime_,
-        weight_kg=payload.weight_kg,
-        note=payload.note,
-        note_is_set=("note" in payload.model_fields_set),
-    )
-    if entry is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weight entry not found")
-    await session.commit()
+    try:
+        entry = await update_weight_entry_for_user(
+            session=session,
+            user_id=user.id,
+            entry_id=entry_id,
+            datetime_utc=payload.datetime_,
+            weight_kg=payload.weight_kg,
+            note=payload.note,
+            note_is_set=("note" in payload.model_fields_set),
+        )
+        if entry is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weight entry not found")
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Weight entry already exists at this datetime")
     return _to_out(entry)
 
 
@@ -110,3 +110,16 @@ class FoodOut(FoodBase):
 
 class FoodListOut(BaseModel):
     items: list[FoodOut]
+
+
+class SimilarFoodOut(FoodOut):
+    # Euclidean distance between protein/carbs/fat energy shares; 0 = same split.
+    distance: float
+
+    @classmethod
+    def from_similar(cls, food, *, distance: float, is_favorite: bool = False) -> "SimilarFoodOut":
+        return cls(**FoodOut.from_model(food, is_favorite=is_favorite).model_dump(), distance=round(distance, 4))
+
+
+class SimilarFoodListOut(BaseModel):
+    items: list[SimilarFoodOut]
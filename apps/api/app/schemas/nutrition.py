@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import uuid
+from decimal import Decimal
+
+from pydantic import BaseModel, Field
+
+from app.schemas.recipes import Macros
+
+# Upper bound for lines in a single calculation request.
+MAX_CALCULATE_LINES = 500
+
+
+class NutritionLineIn(BaseModel):
+    food_id: uuid.UUID
+    grams: Decimal = Field(gt=0)
+
+
+class NutritionCalculateIn(BaseModel):
+    lines: list[NutritionLineIn] = Field(max_length=MAX_CALCULATE_LINES)
+    servings: int | None = Field(default=None, gt=0)
+
+
+class NutritionLineOut(BaseModel):
+    food_id: uuid.UUID
+    grams: Decimal
+    macros: Macros
+
+
+class NutritionCalculateOut(BaseModel):
+    lines: list[NutritionLineOut]
+    total_macros: Macros
+    # Present only when `servings` was given.
+    macros_per_serving: Macros | None = None
@@ -7,7 +7,7 @@ from decimal import Decimal
 from pydantic import BaseModel, Field, model_validator
 
 from app.models.meal_entry import MealType
-from app.schemas.recipes import Macros
+from app.schemas.days import MacroTotals
 
 
 class MacroSplitPercent(BaseModel):
@@ -59,6 +59,17 @@ class GenerateWeeklyPlanRequest(BaseModel):
         return self
 
 
+MAX_PLAN_RANGE_WEEKS = 12
+
+
+class GenerateWeeklyPlanRangeRequest(GenerateWeeklyPlanRequest):
+    """Generate `weeks` consecutive plans starting at `week_start`, with shared settings."""
+
+    weeks: int = Field(ge=1, le=MAX_PLAN_RANGE_WEEKS)
+    # Penalize reusing a recipe that earlier weeks of the range already use.
+    cross_week_variety: bool = False
+
+
 class WeeklyPlanMealOut(BaseModel):
     id: uuid.UUID
     meal_type: MealType
@@ -70,12 +81,22 @@ class WeeklyPlanMealOut(BaseModel):
         from_attributes = True
 
 
+class WeeklyPlanMacroDeviation(BaseModel):
+    """Planned minus target; a macro is null when the plan has no target for it."""
+
+    kcal: float
+    protein_g: float | None = None
+    carbs_g: float | None = None
+    fat_g: float | None = None
+
+
 class WeeklyPlanDayOut(BaseModel):
     id: uuid.UUID
     date: date
     meals: list[WeeklyPlanMealOut]
 
-    totals: Macros | None = None
+    totals: MacroTotals | None = None
+    deviation: WeeklyPlanMacroDeviation | None = None
 
     class Config:
         from_attributes = True
@@ -97,6 +118,10 @@ class WeeklyPlanOut(BaseModel):
 
     days: list[WeeklyPlanDayOut]
 
+    # Whole-week totals; deviation is against 7 x the daily targets.
+    totals: MacroTotals | None = None
+    deviation: WeeklyPlanMacroDeviation | None = None
+
     # Optional regen summary; present on generate endpoint.
     generation_summary: WeeklyPlanGenerationSummary | None = None
 
@@ -104,11 +129,98 @@ class WeeklyPlanOut(BaseModel):
         from_attributes = True
 
 
+class WeeklyPlanRangeOut(BaseModel):
+    plans: list[WeeklyPlanOut]
+
+
+class AcceptWeeklyPlanPreviewRequest(GenerateWeeklyPlanRequest):
+    """The inputs of a preview plus its token; commits that exact plan."""
+
+    preview_token: str = Field(min_length=1, max_length=64)
+
+
+class WeeklyPlanPreviewMealOut(BaseModel):
+    meal_type: MealType
+    recipe_id: uuid.UUID
+    servings: Decimal
+    locked: bool
+
+    class Config:
+        from_attributes = True
+
+
+class WeeklyPlanPreviewDayOut(BaseModel):
+    date: date
+    meals: list[WeeklyPlanPreviewMealOut]
+
+    totals: MacroTotals | None = None
+    deviation: WeeklyPlanMacroDeviation | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class WeeklyPlanPreviewOut(BaseModel):
+    """A proposed plan that was not saved (no ids); accept it with `preview_token`."""
+
+    week_start: date
+    target_kcal: int
+    protein_g: int | None
+    carbs_g: int | None
+    fat_g: int | None
+
+    days: list[WeeklyPlanPreviewDayOut]
+
+    totals: MacroTotals | None = None
+    deviation: WeeklyPlanMacroDeviation | None = None
+
+    preview_token: str
+
+    class Config:
+        from_attributes = True
+
+
+class WeeklyPlanMealEditOut(BaseModel):
+    """Meal edit response with `view=meal`: the changed meal and its day's totals."""
+
+    meal: WeeklyPlanMealOut
+    day_id: uuid.UUID
+    date: date
+    day_totals: MacroTotals
+    day_deviation: WeeklyPlanMacroDeviation
+
+
+class WeeklyPlanMealAlternativeOut(BaseModel):
+    recipe_id: uuid.UUID
+    name: str
+    # Best-fitting servings for the slot; pass to meals:swap to use them.
+    servings: Decimal
+    day_totals: MacroTotals
+    # Against the day's own targets, as ranked: training days get more kcal/carbs and
+    # a macro split yields per-day gram targets.
+    day_deviation: WeeklyPlanMacroDeviation
+
+
+class WeeklyPlanMealAlternativesOut(BaseModel):
+    meal_id: uuid.UUID
+    date: date
+    alternatives: list[WeeklyPlanMealAlternativeOut]
+
+
+class WeeklyPlanDiaryLogOut(BaseModel):
+    week_start: date
+    # Diary days the plan was logged into.
+    dates: list[date]
+    entries_created: int
+
+
 class SwapWeeklyPlanMealRequest(BaseModel):
     date: date
     meal_type: MealType
     new_recipe_id: uuid.UUID
     lock: bool = True
+    # Keep the slot's current servings unless given (e.g. from /alternatives).
+    servings: Decimal | None = Field(default=None, gt=0, max_digits=10, decimal_places=2)
 
 
 class GroceryListBreakdownItem(BaseModel):
@@ -42,8 +42,16 @@ class RecipeBase(BaseModel):
     tags: list[str] = Field(default_factory=list, max_length=30)
 
 
+# Upper bound for items sent in a single create/replace request.
+MAX_RECIPE_ITEMS = 200
+
+
+class RecipeItemsReplace(BaseModel):
+    items: list[RecipeItemCreate] = Field(max_length=MAX_RECIPE_ITEMS)
+
+
 class RecipeCreate(RecipeBase):
-    pass
+    items: list[RecipeItemCreate] = Field(default_factory=list, max_length=MAX_RECIPE_ITEMS)
 
 
 class RecipeUpdate(BaseModel):
@@ -58,7 +66,8 @@ class RecipeOut(RecipeBase):
     created_at: datetime
     updated_at: datetime
 
-    items: list[RecipeItemOut]
+    # None when the listing was requested without `include=items`.
+    items: list[RecipeItemOut] | None = None
 
     total_macros: Macros
     macros_per_serving: Macros
@@ -67,3 +76,9 @@ class RecipeOut(RecipeBase):
 
     class Config:
         from_attributes = True
+
+
+class RecipeListOut(BaseModel):
+    items: list[RecipeOut]
+    # Pass as `cursor` to fetch the next page; None on the last page.
+    next_cursor: uuid.UUID | None = None
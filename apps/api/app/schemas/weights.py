@@ -77,3 +77,24 @@ class WeightEntryOut(BaseModel):
 
 class WeightEntryListOut(BaseModel):
     items: list[WeightEntryOut]
+
+
+# Bulk import guardrails.
+MAX_IMPORT_ROWS = 50_000
+MAX_IMPORT_ERRORS_REPORTED = 100
+
+
+class WeightImportRowError(BaseModel):
+    row: int = Field(..., description="1-based row number in the uploaded payload (CSV: excluding the header).")
+    message: str
+
+
+class WeightImportOut(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int = Field(..., description="Rows skipped because a weigh-in already exists at that datetime.")
+    invalid: int
+    errors: list[WeightImportRowError] = Field(
+        default_factory=list,
+        description=f"Validation errors for the first {MAX_IMPORT_ERRORS_REPORTED} invalid rows.",
+    )
@@ -0,0 +1,159 @@
+"""Background job worker.
+
+Routes enqueue a `Job` row and return its id; workers claim jobs with
+`FOR UPDATE SKIP LOCKED` (crud.jobs.claim_next_job), run the handler registered for
+the job's kind in its own transaction, and record the result or error. Any number of
+workers can run side by side: as lifespan tasks in the API processes (JOBS_WORKER)
+or standalone via `python -m app.worker`.
+
+The claim needs Postgres row locking. On SQLite (tests, local dev) routes run jobs
+in-process instead (`run_job_inline`), so the API behaves the same minus the
+asynchrony.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.logging import get_logger
+from app.crud import jobs as crud_jobs
+from app.crud import plans as crud_plans
+from app.models.job import Job
+from app.schemas.plans import GenerateWeeklyPlanRequest
+
+logger = get_logger(__name__)
+
+JobHandler = Callable[[AsyncSession, uuid.UUID, dict[str, Any]], Awaitable[dict[str, Any]]]
+
+_handlers: dict[str, JobHandler] = {}
+
+WEEKLY_PLAN_GENERATE = "weekly_plan.generate"
+
+
+def job_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    def register(fn: JobHandler) -> JobHandler:
+        _handlers[kind] = fn
+        return fn
+
+    return register
+
+
+@job_handler(WEEKLY_PLAN_GENERATE)
+async def _generate_weekly_plan(session: AsyncSession, user_id: uuid.UUID, payload: dict[str, Any]) -> dict[str, Any]:
+    plan, summary = await crud_plans.generate_weekly_plan_for_user(
+        session=session,
+        user_id=user_id,
+        payload=GenerateWeeklyPlanRequest.model_validate(payload),
+    )
+    await session.flush()
+    return {"plan_id": str(plan.id), "week_start": plan.week_start.isoformat(), "generation_summary": summary}
+
+
+def _error_message(e: Exception) -> str:
+    # ValueError is the crud layer's "invalid input" signal and safe to show;
+    # anything else is an internal error whose details stay in the logs.
+    return str(e) if isinstance(e, ValueError) else "internal error"
+
+
+async def _run_handler(session: AsyncSession, job: Job) -> dict[str, Any]:
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        raise ValueError(f"unknown job kind: {job.kind}")
+    return await handler(session, job.user_id, json.loads(job.payload_json))
+
+
+async def run_job_inline(*, session: AsyncSession, job: Job) -> None:
+    """Run a just-created job in the caller's transaction (the SQLite fallback).
+
+    The handler runs in a savepoint, so a failure rolls back its writes but keeps
+    the job row, which is then marked failed.
+    """
+
+    crud_jobs.mark_job_running(job)
+    try:
+        async with session.begin_nested():
+            result = await _run_handler(session, job)
+    except Exception as e:
+        if not isinstance(e, ValueError):
+            logger.exception("job %s (%s) failed", job.id, job.kind)
+        await crud_jobs.fail_job(session=session, job=job, error=_error_message(e))
+    else:
+        await crud_jobs.complete_job(session=session, job=job, result=result)
+
+
+async def run_next_job(sessionmaker: async_sessionmaker[AsyncSession]) -> bool:
+    """Claim and run one job; returns False if there was nothing to do."""
+
+    async with sessionmaker() as session:
+        job = await crud_jobs.claim_next_job(session=session)
+        if job is None:
+            await session.rollback()
+            return False
+        # Commit the claim so it survives a failing handler and releases the row lock.
+        await session.commit()
+        job_id, kind = job.id, job.kind
+
+        try:
+            result = await _run_handler(session, job)
+            await crud_jobs.complete_job(session=session, job=job, result=result)
+            await session.commit()
+        except Exception as e:
+            if not isinstance(e, ValueError):
+                logger.exception("job %s (%s) failed", job_id, kind)
+            await session.rollback()
+            job = await session.get(Job, job_id, populate_existing=True)
+            if job is not None:
+                await crud_jobs.fail_job(session=session, job=job, error=_error_message(e))
+                await session.commit()
+    return True
+
+
+async def run_worker(
+    sessionmaker: async_sessionmaker[AsyncSession],
+    *,
+    poll_interval_s: float = 1.0,
+    stop: asyncio.Event | None = None,
+) -> None:
+    """Run jobs until `stop` is set (or the task is cancelled), polling when idle."""
+
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            ran = await run_next_job(sessionmaker)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("job worker iteration failed")
+            ran = False
+        if not ran:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=poll_interval_s)
+            except TimeoutError:
+                pass
+
+
+def main() -> None:
+    from app.core.logging import setup_logging
+    from app.core.planner import configure_solver_pool, shutdown_solver_pool
+    from app.core.settings import get_settings
+    from app.db.session import get_sessionmaker
+
+    settings = get_settings()
+    setup_logging(level=settings.log_level)
+    configure_solver_pool(settings.planner_process_workers)
+    try:
+        asyncio.run(run_worker(get_sessionmaker(), poll_interval_s=settings.jobs_poll_interval_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_solver_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Microbenchmark: similar-food k-d tree vs. a linear scan over a synthetic catalog.
+
+Run from apps/api:
+
+    python -m benchmarks.bench_food_knn [--foods 500000] [--k 10] [--queries 200]
+
+Not part of the test suite; numbers are for comparing implementations on one machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+import time
+
+from app.core.knn import KDTree
+from app.crud.foods import macro_profile
+
+
+def _make_profiles(n: int, *, seed: int = 7) -> list[tuple[float, float, float]]:
+    rng = random.Random(seed)
+    profiles = []
+    while len(profiles) < n:
+        p, c, f = rng.uniform(0, 40), rng.uniform(0, 80), rng.uniform(0, 40)
+        kcal = p * 4 + c * 4 + f * 9 + rng.uniform(0, 20)
+        profile = macro_profile(kcal_100g=kcal, protein_100g=p, carbs_100g=c, fat_100g=f)
+        if profile is not None:
+            profiles.append(profile)
+    return profiles
+
+
+def linear_scan(points, q, k: int) -> list[tuple[float, int]]:
+    return heapq.nsmallest(k, ((sum((a - b) ** 2 for a, b in zip(p, q)), i) for i, p in enumerate(points)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--foods", type=int, default=500_000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    points = _make_profiles(args.foods)
+    started = time.perf_counter()
+    tree = KDTree(points, list(range(len(points))))
+    print(f"{args.foods} foods, build {time.perf_counter() - started:.2f} s")
+
+    queries = random.Random(11).sample(points, args.queries)
+    started = time.perf_counter()
+    results = [tree.query(q, args.k) for q in queries]
+    per_query = (time.perf_counter() - started) / args.queries
+    print(f"  {'k-d tree':<12} {per_query * 1e3:9.3f} ms/query")
+
+    sample = queries[:3]
+    started = time.perf_counter()
+    expected = [linear_scan(points, q, args.k) for q in sample]
+    print(f"  {'linear scan':<12} {(time.perf_counter() - started) / len(sample) * 1e3:9.3f} ms/query")
+
+    for got, want in zip(results, expected):
+        assert [d for d, _ in got] == [d for d, _ in want], "k-d tree diverges from linear scan"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Microbenchmark: fixed-point macro kernel vs. the previous Decimal/float code paths.
+
+Run from apps/api:
+
+    python -m benchmarks.bench_nutrition [--lines 300] [--repeat 200]
+
+Not part of the test suite; numbers are for comparing implementations on one machine.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+from decimal import ROUND_HALF_UP, Decimal
+from types import SimpleNamespace
+
+from app.core.nutrition import divide_to_centi, food_vector, micro_to_centi, scale_lines, to_centi
+
+_CENT = Decimal("0.01")
+
+
+def _make_lines(n: int, *, seed: int = 7) -> list[tuple[SimpleNamespace, Decimal]]:
+    rng = random.Random(seed)
+
+    def _d(lo: float, hi: float) -> Decimal:
+        return Decimal(str(round(rng.uniform(lo, hi), 2)))
+
+    return [
+        (
+            SimpleNamespace(
+                kcal_100g=_d(10, 900), protein_100g=_d(0, 90), carbs_100g=_d(0, 90), fat_100g=_d(0, 90)
+            ),
+            _d(1, 500),
+        )
+        for _ in range(n)
+    ]
+
+
+def legacy_decimal(lines, servings: int) -> tuple[list[Decimal], list[Decimal]]:
+    """Former crud.recipes path: Decimal(str(...)) per field, quantize at the end."""
+
+    total = {"kcal": Decimal("0"), "protein": Decimal("0"), "carbs": Decimal("0"), "fat": Decimal("0")}
+    for food, grams in lines:
+        factor = grams / Decimal("100")
+        total["kcal"] += Decimal(str(food.kcal_100g)) * factor
+        total["protein"] += Decimal(str(food.protein_100g)) * factor
+        total["carbs"] += Decimal(str(food.carbs_100g)) * factor
+        total["fat"] += Decimal(str(food.fat_100g)) * factor
+    s = Decimal(servings)
+    return (
+        [v.quantize(_CENT, rounding=ROUND_HALF_UP) for v in total.values()],
+        [(v / s).quantize(_CENT, rounding=ROUND_HALF_UP) for v in total.values()],
+    )
+
+
+def legacy_float(lines) -> list[float]:
+    """Former crud.days path: float per field, round() at the end."""
+
+    total = [0.0, 0.0, 0.0, 0.0]
+    for food, grams in lines:
+        factor = float(grams) / 100.0
+        total[0] += float(food.kcal_100g) * factor
+        total[1] += float(food.protein_100g) * factor
+        total[2] += float(food.carbs_100g) * factor
+        total[3] += float(food.fat_100g) * factor
+    return [round(v, 2) for v in total]
+
+
+def fixed_point(lines, servings: int):
+    _, total = scale_lines([food_vector(f) for f, _ in lines], [to_centi(g) for _, g in lines])
+    return micro_to_centi(total), divide_to_centi(total, servings * 100)
+
+
+def fixed_point_preconverted(vectors, grams_c, servings: int):
+    """Kernel only, with inputs already in centi-units (e.g. cached per food)."""
+
+    _, total = scale_lines(vectors, grams_c)
+    return micro_to_centi(total), divide_to_centi(total, servings * 100)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    lines = _make_lines(args.lines)
+    vectors = [food_vector(f) for f, _ in lines]
+    grams_c = [to_centi(g) for _, g in lines]
+
+    cases = {
+        "legacy decimal": lambda: legacy_decimal(lines, 4),
+        "legacy float": lambda: legacy_float(lines),
+        "fixed-point": lambda: fixed_point(lines, 4),
+        "fixed-point (kernel only)": lambda: fixed_point_preconverted(vectors, grams_c, 4),
+    }
+
+    print(f"{args.lines} lines, best of 5 x {args.repeat} runs")
+    for name, fn in cases.items():
+        best = min(timeit.repeat(fn, number=args.repeat, repeat=5)) / args.repeat
+        print(f"  {name:<28} {best * 1e6:9.1f} us")
+
+    legacy_total, _ = legacy_decimal(lines, 4)
+    fixed_total, _ = fixed_point(lines, 4)
+    assert [int(v.scaleb(2)) for v in legacy_total] == list(fixed_total), "fixed-point totals diverge from Decimal"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark: weekly plan optimizer on large recipe libraries.
+
+Run from apps/api:
+
+    python -m benchmarks.bench_planner [--recipes 1000] [--runs 5]
+
+Reports wall time per `optimize_week` call (7 days x 4 slots, macro targets set) and
+the resulting deviation from the daily targets. Not part of the test suite.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from app.core.planner import DayTargets, optimize_week
+
+
+def _library(n: int, *, seed: int = 1) -> list[tuple[float, float, float, float]]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        kcal = rng.uniform(150, 900)
+        protein = rng.uniform(5, 60)
+        fat = rng.uniform(3, 40)
+        carbs = max(0.0, (kcal - protein * 4 - fat * 9) / 4)
+        out.append((kcal, protein, carbs, fat))
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    library = _library(args.recipes)
+    targets = [DayTargets(kcal=2200, protein=160, carbs=230, fat=70)] * 5 + [
+        DayTargets(kcal=2420, protein=160, carbs=285, fat=70)
+    ] * 2
+
+    timings = []
+    for run in range(args.runs):
+        started = time.perf_counter()
+        solution = optimize_week(recipe_macros=library, day_targets=targets, seed=run)
+        timings.append(time.perf_counter() - started)
+
+        worst = max(
+            abs(total[0] - t.kcal) / t.kcal for total, t in zip(solution.day_totals, targets)
+        )
+        print(
+            f"run {run}: {timings[-1] * 1000:7.1f} ms  iterations={solution.iterations:5d}"
+            f"  timed_out={solution.timed_out}  worst kcal deviation={worst:.2%}"
+        )
+
+    print(f"{args.recipes} recipes: median {statistics.median(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
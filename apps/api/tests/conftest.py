@@ -15,6 +15,9 @@ from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession, a
 os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./.pytest_auth.db")
 
 from app.core.settings import get_settings
+from app.crud.foods import clear_global_food_index
+from app.crud.plans import get_grocery_list_cache
+from app.crud.recipes import clear_tag_id_cache
 from app.db.session import get_db_session
 from app.main import create_app
 from app.models.base import Base
@@ -228,6 +231,26 @@ def _reset_settings_cache() -> None:
     get_settings.cache_clear()
 
 
+@pytest.fixture(autouse=True)
+def _reset_tag_id_cache() -> None:
+    # Each test's transaction is rolled back, so tag ids cached by a previous test
+    # would point at rows that no longer exist.
+    clear_tag_id_cache()
+
+
+@pytest.fixture(autouse=True)
+def _reset_grocery_list_cache() -> None:
+    # Rolled back plans can reuse (plan_id, version) keys only by accident, but keep
+    # tests independent of each other anyway.
+    get_grocery_list_cache().clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_global_food_index() -> None:
+    # The per-process similarity index would otherwise hold rolled back global foods.
+    clear_global_food_index()
+
+
 @pytest.fixture()
 async def db_connection(engine: AsyncEngine, _create_schema: None) -> AsyncIterator[AsyncConnection]:
     async with engine.connect() as conn:
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker
+
+from app.batch_generate import run_batch
+from app.models.user import User
+from app.models.weekly_plan import WeeklyPlan
+
+
+def _auth_headers(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register(client: TestClient, email: str) -> str:
+    resp = client.post("/auth/register", json={"email": email, "password": "password123"})
+    assert resp.status_code == 201
+    return resp.json()["access_token"]
+
+
+def _seed_user(client: TestClient, email: str, *, target: bool = True, recipes: int = 3) -> str:
+    token = _register(client, email)
+    food = client.post(
+        "/foods",
+        headers=_auth_headers(token),
+        json={"name": "Rice", "kcal_100g": 350, "protein_100g": 7, "carbs_100g": 78, "fat_100g": 1},
+    ).json()["id"]
+    for i in range(recipes):
+        rid = client.post("/recipes", headers=_auth_headers(token), json={"name": f"R{i}", "servings": 1}).json()["id"]
+        item = client.post(
+            f"/recipes/{rid}/items", headers=_auth_headers(token), json={"food_id": food, "grams": 100 + 40 * i}
+        )
+        assert item.status_code == 201
+    if target:
+        resp = client.put(
+            "/targets",
+            headers=_auth_headers(token),
+            json={"kcal_target": 2200, "protein_g": 140, "carbs_g": 250, "fat_g": 70},
+        )
+        assert resp.status_code == 200
+    return token
+
+
+@pytest.mark.anyio
+async def test_batch_generates_missing_plans_in_chunks_and_resumes(
+    client: TestClient, session: AsyncSession, db_connection: AsyncConnection
+) -> None:
+    week_start = date(2026, 3, 2)
+    tokens = [_seed_user(client, f"batch_{i}@example.com") for i in range(3)]
+    _seed_user(client, "batch_no_target@example.com", target=False)
+    _seed_user(client, "batch_no_recipes@example.com", recipes=0)
+
+    # Already planned: left as is.
+    existing = client.post(
+        "/plans/weekly/generate",
+        headers=_auth_headers(tokens[0]),
+        json={"week_start": str(week_start), "target_kcal": 1500},
+    )
+    assert existing.status_code == 201
+    await session.commit()
+
+    maker = async_sessionmaker(bind=db_connection, expire_on_commit=False, join_transaction_mode="create_savepoint")
+    stats = await run_batch(maker, week_start=week_start, chunk_size=1)
+    assert (stats.users, stats.plans_created, stats.skipped, stats.chunks) == (2, 2, 0, 2)
+    assert stats.plans_per_second > 0
+
+    for token in tokens[1:]:
+        plan = client.get(f"/plans/weekly/{week_start}", headers=_auth_headers(token))
+        assert plan.status_code == 200
+        body = plan.json()
+        assert body["target_kcal"] == 2200
+        assert (body["protein_g"], body["carbs_g"], body["fat_g"]) == (140, 250, 70)
+        assert [len(d["meals"]) for d in body["days"]] == [4] * 7
+
+        # Same plan the generate endpoint produces for the same inputs.
+        regenerated = client.post(
+            "/plans/weekly/generate",
+            headers=_auth_headers(token),
+            json={
+                "week_start": str(week_start),
+                "target_kcal": 2200,
+                "macro_grams": {"protein_g": 140, "carbs_g": 250, "fat_g": 70},
+            },
+        ).json()
+        assert regenerated["id"] == body["id"]
+        assert regenerated["generation_summary"]["unlocked_changed"] == 0
+
+    first = client.get(f"/plans/weekly/{week_start}", headers=_auth_headers(tokens[0])).json()
+    assert first["id"] == existing.json()["id"]
+    assert first["target_kcal"] == 1500
+
+    # A second run finds nothing left to do.
+    again = await run_batch(maker, week_start=week_start, chunk_size=1)
+    assert (again.users, again.plans_created) == (0, 0)
+
+    no_target = (await session.execute(sa.select(User.id).where(User.email == "batch_no_target@example.com"))).scalar_one()
+    count = await session.execute(sa.select(sa.func.count()).select_from(WeeklyPlan).where(WeeklyPlan.user_id == no_target))
+    assert count.scalar_one() == 0
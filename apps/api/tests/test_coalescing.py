@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.coalescing import WriteCoalescer
+
+
+@pytest.mark.anyio
+async def test_coalescer_merges_concurrent_submits_last_write_wins() -> None:
+    coalescer = WriteCoalescer(window_s=0.02)
+    flushed: list[dict] = []
+
+    async def flush(items: dict) -> None:
+        await asyncio.sleep(0)
+        flushed.append(dict(items))
+
+    async def submit(i: int) -> None:
+        await coalescer.submit(("u", "w"), {"milk": i % 2 == 0, f"item {i}": True}, flush)
+
+    await asyncio.gather(*(submit(i) for i in range(10)))
+
+    assert len(flushed) == 1
+    assert flushed[0]["milk"] is False  # submitted last by i == 9
+    assert len(flushed[0]) == 11
+
+    stats = coalescer.stats
+    assert stats.requests == 10
+    assert stats.flushes == 1
+    assert stats.coalescing_ratio == 10
+    assert stats.items_submitted == 20
+    assert stats.items_written == 11
+    assert stats.flush_seconds_max >= stats.flush_seconds_avg > 0
+
+
+@pytest.mark.anyio
+async def test_coalescer_keeps_keys_apart_and_orders_batches() -> None:
+    coalescer = WriteCoalescer(window_s=0.01)
+    flushed: list[tuple[str, dict]] = []
+
+    def flusher(key: str):
+        async def flush(items: dict) -> None:
+            await asyncio.sleep(0.02)
+            flushed.append((key, dict(items)))
+
+        return flush
+
+    first = asyncio.ensure_future(coalescer.submit("a", {"x": 1}, flusher("a")))
+    other = asyncio.ensure_future(coalescer.submit("b", {"x": 2}, flusher("b")))
+    await asyncio.sleep(0.015)  # first batch of "a" is flushing now
+    second = asyncio.ensure_future(coalescer.submit("a", {"x": 3}, flusher("a")))
+    await asyncio.gather(first, other, second)
+
+    assert [items for key, items in flushed if key == "a"] == [{"x": 1}, {"x": 3}]
+    assert ("b", {"x": 2}) in flushed
+    assert coalescer.stats.flushes == 3
+
+
+@pytest.mark.anyio
+async def test_coalescer_propagates_flush_failure_to_every_request() -> None:
+    coalescer = WriteCoalescer(window_s=0.01)
+
+    async def flush(items: dict) -> None:
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(
+        *(coalescer.submit("k", {"x": i}, flush) for i in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert coalescer.stats.failed_flushes == 1
+
+    # The key is usable again afterwards.
+    done: list[dict] = []
+
+    async def ok(items: dict) -> None:
+        done.append(items)
+
+    await coalescer.submit("k", {"x": 9}, ok)
+    assert done == [{"x": 9}]
+
+
+def test_metricsz_reports_coalescer_stats(client: TestClient) -> None:
+    resp = client.get("/metricsz")
+    assert resp.status_code == 200
+    stats = resp.json()["grocery_checks_coalescer"]
+    assert {"requests", "flushes", "coalescing_ratio", "flush_seconds_avg", "flush_seconds_max"} <= stats.keys()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import random
+import uuid
+
+import anyio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.knn import KDTree
+from app.crud import foods as crud_foods
+from app.models.food import Food
+from app.models.user import User
+
+
+def test_kdtree_matches_brute_force():
+    rng = random.Random(3)
+    points = [(rng.random(), rng.random(), rng.random()) for _ in range(2000)]
+    ids = list(range(len(points)))
+    tree = KDTree(points, ids)
+
+    for _ in range(20):
+        q = (rng.random(), rng.random(), rng.random())
+        expected = sorted((sum((a - b) ** 2 for a, b in zip(p, q)), i) for i, p in zip(ids, points) if i % 7)[:5]
+        got = tree.query(q, 5, exclude=lambda i: i % 7 == 0)
+        assert [i for _, i in got] == [i for _, i in expected]
+
+    assert KDTree([], []).query((0.0, 0.0, 0.0), 3) == []
+
+
+def test_similar_foods_merges_global_and_own_foods(client, auth_headers, session, user_id_for_auth):
+    other_user = uuid.uuid4()
+
+    async def _seed() -> dict[str, str]:
+        session.add(User(id=other_user, email="other@example.com", password_hash="x"))
+        await session.flush()
+        # (kcal, protein, carbs, fat) per 100 g.
+        rows = {
+            "chicken": (None, 120, 25, 0, 2),
+            "tofu": (None, 140, 15, 3, 8),
+            "tuna": (None, 110, 25, 0, 1),
+            "rice": (None, 130, 3, 28, 0),
+            "water": (None, 0, 0, 0, 0),
+            "my seitan": (user_id_for_auth, 120, 25, 4, 1),
+            "their whey": (other_user, 120, 27, 2, 1),
+        }
+        ids = {}
+        for name, (owner, kcal, p, c, f) in rows.items():
+            food = Food(user_id=owner, name=name, kcal_100g=kcal, protein_100g=p, carbs_100g=c, fat_100g=f)
+            session.add(food)
+            await session.flush()
+            ids[name] = str(food.id)
+        return ids
+
+    ids = anyio.run(_seed)
+
+    r = client.get(f"/foods/{ids['chicken']}/similar?k=3", headers=auth_headers)
+    assert r.status_code == 200
+    items = r.json()["items"]
+    assert [i["name"] for i in items] == ["tuna", "my seitan", "tofu"]
+    assert items[0]["owner"] == "global" and items[1]["owner"] == "user"
+    assert [i["distance"] for i in items] == sorted(i["distance"] for i in items)
+
+    r = client.get(f"/foods/{ids['their whey']}/similar", headers=auth_headers)
+    assert r.status_code == 404
+
+    r = client.get(f"/foods/{ids['water']}/similar", headers=auth_headers)
+    assert r.status_code == 422
+
+
+def test_warm_global_food_index_builds_before_the_first_request(client, auth_headers, session):
+    async def _seed() -> str:
+        for name, kcal, p, c, f in [("chicken", 120, 25, 0, 2), ("rice", 130, 3, 28, 0), ("water", 0, 0, 0, 0)]:
+            session.add(Food(user_id=None, name=name, kcal_100g=kcal, protein_100g=p, carbs_100g=c, fat_100g=f))
+        await session.flush()
+        return str((await session.execute(select(Food.id).where(Food.name == "chicken"))).scalar_one())
+
+    chicken = anyio.run(_seed)
+    anyio.run(crud_foods.warm_global_food_index, async_sessionmaker(bind=session.bind, expire_on_commit=False))
+    index = crud_foods._global_food_index
+    assert index is not None and len(index.tree) == 2
+
+    r = client.get(f"/foods/{chicken}/similar", headers=auth_headers)
+    assert r.status_code == 200
+    assert [i["name"] for i in r.json()["items"]] == ["rice"]
+    assert crud_foods._global_food_index is index
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime, timedelta
+
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker
+
+from app import worker
+from app.crud import jobs as jobs_crud
+from app.models.job import Job, JobStatus
+from app.models.user import User
+
+
+def _auth_headers(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register(client: TestClient, email: str) -> str:
+    resp = client.post("/auth/register", json={"email": email, "password": "password123"})
+    assert resp.status_code == 201
+    return resp.json()["access_token"]
+
+
+def _seed_recipe(client: TestClient, token: str) -> None:
+    food = client.post(
+        "/foods",
+        headers=_auth_headers(token),
+        json={"name": "Oats", "kcal_100g": 380, "protein_100g": 13, "carbs_100g": 67, "fat_100g": 7},
+    )
+    assert food.status_code == 201
+    recipe = client.post("/recipes", headers=_auth_headers(token), json={"name": "Porridge", "servings": 1})
+    assert recipe.status_code == 201
+    item = client.post(
+        f"/recipes/{recipe.json()['id']}/items",
+        headers=_auth_headers(token),
+        json={"food_id": food.json()["id"], "grams": 100},
+    )
+    assert item.status_code == 201
+
+
+def test_async_generate_returns_job_and_job_reports_plan(client: TestClient) -> None:
+    token = _register(client, "jobs_generate@example.com")
+    _seed_recipe(client, token)
+
+    resp = client.post(
+        "/plans/weekly/generate?async=true",
+        headers=_auth_headers(token),
+        json={"week_start": "2026-02-16", "target_kcal": 2000},
+    )
+    assert resp.status_code == 202
+    job = resp.json()
+    assert resp.headers["location"] == f"/jobs/{job['id']}"
+    assert job["kind"] == worker.WEEKLY_PLAN_GENERATE
+
+    # SQLite has no SKIP LOCKED claim: the job ran inline and is already finished.
+    polled = client.get(f"/jobs/{job['id']}", headers=_auth_headers(token))
+    assert polled.status_code == 200
+    body = polled.json()
+    assert body["status"] == "succeeded"
+    assert body["attempts"] == 1
+    assert body["error"] is None
+
+    plan = client.get("/plans/weekly/2026-02-16", headers=_auth_headers(token))
+    assert plan.status_code == 200
+    assert body["result"]["plan_id"] == plan.json()["id"]
+    assert body["result"]["week_start"] == "2026-02-16"
+
+    other = _register(client, "jobs_other@example.com")
+    assert client.get(f"/jobs/{job['id']}", headers=_auth_headers(other)).status_code == 404
+    assert client.get(f"/jobs/{uuid.uuid4()}", headers=_auth_headers(token)).status_code == 404
+
+
+def test_async_generate_failure_is_reported_on_the_job(client: TestClient) -> None:
+    token = _register(client, "jobs_fail@example.com")
+
+    # No recipes: the generator raises ValueError, which becomes the job's error.
+    resp = client.post(
+        "/plans/weekly/generate?async=true",
+        headers=_auth_headers(token),
+        json={"week_start": "2026-02-16", "target_kcal": 2000},
+    )
+    assert resp.status_code == 202
+    body = client.get(f"/jobs/{resp.json()['id']}", headers=_auth_headers(token)).json()
+    assert body["status"] == "failed"
+    assert body["result"] is None
+    assert "recipes" in body["error"].lower()
+
+    assert client.get("/plans/weekly/2026-02-16", headers=_auth_headers(token)).status_code == 404
+
+
+@pytest.mark.anyio
+async def test_worker_claims_oldest_job_and_records_outcome(
+    client: TestClient, session: AsyncSession, db_connection: AsyncConnection
+) -> None:
+    token = _register(client, "jobs_worker@example.com")
+    _seed_recipe(client, token)
+    user = (await session.execute(sa.select(User).where(User.email == "jobs_worker@example.com"))).scalar_one()
+
+    payload = {"week_start": "2026-02-16", "target_kcal": 2000}
+    first = await jobs_crud.create_job(session=session, user_id=user.id, kind=worker.WEEKLY_PLAN_GENERATE, payload=payload)
+    first.created_at = datetime.now(UTC) - timedelta(minutes=1)
+    second = await jobs_crud.create_job(session=session, user_id=user.id, kind="no.such.kind", payload={})
+    await session.commit()
+
+    # The worker's own sessions share the test connection; savepoints keep its
+    # commits inside the test transaction.
+    maker = async_sessionmaker(bind=db_connection, expire_on_commit=False, join_transaction_mode="create_savepoint")
+
+    assert await worker.run_next_job(maker) is True
+    assert await worker.run_next_job(maker) is True
+    assert await worker.run_next_job(maker) is False
+
+    first_row = await session.get(Job, first.id, populate_existing=True)
+    second_row = await session.get(Job, second.id, populate_existing=True)
+    assert first_row.status == JobStatus.succeeded
+    assert first_row.attempts == 1
+    assert first_row.started_at <= second_row.started_at
+    assert second_row.status == JobStatus.failed
+    assert second_row.error == "unknown job kind: no.such.kind"
+
+
+@pytest.mark.anyio
+async def test_claim_retries_expired_leases_until_attempts_run_out(
+    client: TestClient, session: AsyncSession
+) -> None:
+    _register(client, "jobs_lease@example.com")
+    user = (await session.execute(sa.select(User).where(User.email == "jobs_lease@example.com"))).scalar_one()
+
+    job = await jobs_crud.create_job(session=session, user_id=user.id, kind=worker.WEEKLY_PLAN_GENERATE, payload={})
+    now = datetime.now(UTC)
+    assert (await jobs_crud.claim_next_job(session=session, now=now)) is job
+    assert await jobs_crud.claim_next_job(session=session, now=now) is None
+
+    # A worker that died mid-job: once the lease expires, the job is claimed again.
+    for attempt in range(2, jobs_crud.MAX_JOB_ATTEMPTS + 1):
+        now += timedelta(seconds=jobs_crud.JOB_LEASE_SECONDS + 1)
+        assert (await jobs_crud.claim_next_job(session=session, now=now)) is job
+        assert job.attempts == attempt
+
+    now += timedelta(seconds=jobs_crud.JOB_LEASE_SECONDS + 1)
+    assert await jobs_crud.claim_next_job(session=session, now=now) is None
+    await session.refresh(job)
+    assert job.status == JobStatus.failed
+    assert job.error == "job lease expired"
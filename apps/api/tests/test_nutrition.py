@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app.core.nutrition import divide_to_centi, div_round, micro_to_centi, scale_line, scale_lines, to_centi
+
+
+def _auth_headers(token: str) -> dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _register(client: TestClient, email: str) -> str:
+    resp = client.post("/auth/register", json={"email": email, "password": "password123"})
+    assert resp.status_code == 201
+    return resp.json()["access_token"]
+
+
+def _create_food(client: TestClient, token: str, *, name: str, kcal: float, protein: float, carbs: float, fat: float) -> str:
+    resp = client.post(
+        "/foods",
+        headers=_auth_headers(token),
+        json={"name": name, "kcal_100g": kcal, "protein_100g": protein, "carbs_100g": carbs, "fat_100g": fat},
+    )
+    assert resp.status_code == 201
+    return resp.json()["id"]
+
+
+def test_fixed_point_kernel() -> None:
+    assert to_centi(Decimal("12.34")) == 1234
+    assert to_centi(2.675) == 268  # float repr error absorbed
+    assert to_centi(7) == 700
+    assert to_centi("0.005") == 1
+    assert div_round(5, 2) == 3 and div_round(-5, 2) == -3 and div_round(4, 3) == 1
+
+    lines, total = scale_lines([(10000, 1000, 2000, 500), (5000, 0, 1000, 100)], [15000, 20000])
+    assert micro_to_centi(lines[0]) == (15000, 1500, 3000, 750)
+    assert micro_to_centi(total) == (25000, 1500, 5000, 950)
+    # 1/3 of 10 kcal rounds to 3.33 once, at the boundary.
+    assert divide_to_centi(scale_line((1000, 0, 0, 0), 10000), 300) == (333, 0, 0, 0)
+
+    assert scale_lines([], []) == ([], (0, 0, 0, 0))
+
+
+def test_diary_and_recipe_totals_agree(client: TestClient) -> None:
+    token = _register(client, "nutrition_agree@example.com")
+    # Values chosen so per-entry rounding would drift from exact summation.
+    food_a = _create_food(client, token, name="A", kcal=33.33, protein=3.33, carbs=1.11, fat=0.05)
+    food_b = _create_food(client, token, name="B", kcal=66.67, protein=6.67, carbs=2.22, fat=0.05)
+    lines = [{"food_id": food_a, "grams": 10.5}, {"food_id": food_b, "grams": 10.5}, {"food_id": food_a, "grams": 0.15}]
+
+    r = client.post(
+        "/days/2026-03-01/entries",
+        headers=_auth_headers(token),
+        json=[{"meal_type": "lunch", **line} for line in lines],
+    )
+    assert r.status_code == 201
+    day = client.get("/days/2026-03-01", headers=_auth_headers(token)).json()
+
+    r = client.post("/recipes", headers=_auth_headers(token), json={"name": "Same", "servings": 1, "items": lines})
+    assert r.status_code == 201
+    recipe_total = r.json()["total_macros"]
+
+    assert Decimal(str(day["totals"]["kcal"])) == Decimal(str(recipe_total["kcal"]))
+    assert Decimal(str(day["totals"]["protein_g"])) == Decimal(str(recipe_total["protein"]))
+    assert Decimal(str(day["totals"]["carbs_g"])) == Decimal(str(recipe_total["carbs"]))
+    assert Decimal(str(day["totals"]["fat_g"])) == Decimal(str(recipe_total["fat"]))
+
+
+def test_calculate_matches_saved_recipe_and_writes_nothing(client: TestClient) -> None:
+    token = _register(client, "nutrition_calc@example.com")
+    oats = _create_food(client, token, name="Oats", kcal=389, protein=16.9, carbs=66.3, fat=6.9)
+    milk = _create_food(client, token, name="Milk", kcal=64, protein=3.3, carbs=4.8, fat=3.6)
+    lines = [{"food_id": oats, "grams": 80}, {"food_id": milk, "grams": 250}]
+
+    r = client.post("/nutrition/calculate", headers=_auth_headers(token), json={"lines": lines, "servings": 3})
+    assert r.status_code == 200
+    body = r.json()
+    assert [Decimal(str(line["macros"]["kcal"])) for line in body["lines"]] == [Decimal("311.2"), Decimal("160")]
+    assert Decimal(str(body["total_macros"]["kcal"])) == Decimal("471.2")
+    assert Decimal(str(body["macros_per_serving"]["protein"])) == Decimal("7.26")
+
+    assert client.get("/recipes", headers=_auth_headers(token)).json()["items"] == []
+
+    r = client.post("/recipes", headers=_auth_headers(token), json={"name": "Porridge", "servings": 3, "items": lines})
+    assert r.status_code == 201
+    assert r.json()["total_macros"] == body["total_macros"]
+    assert r.json()["macros_per_serving"] == body["macros_per_serving"]
+
+    r = client.post("/nutrition/calculate", headers=_auth_headers(token), json={"lines": []})
+    assert r.status_code == 200
+    assert r.json()["macros_per_serving"] is None
+    assert Decimal(str(r.json()["total_macros"]["kcal"])) == Decimal("0")
+
+
+def test_calculate_rejects_out_of_scope_foods_and_requires_auth(client: TestClient) -> None:
+    token_a = _register(client, "nutrition_a@example.com")
+    token_b = _register(client, "nutrition_b@example.com")
+    food_b = _create_food(client, token_b, name="Private", kcal=100, protein=1, carbs=1, fat=1)
+
+    payload = {"lines": [{"food_id": food_b, "grams": 100}]}
+    assert client.post("/nutrition/calculate", json=payload).status_code == 401
+    assert client.post("/nutrition/calculate", headers=_auth_headers(token_a), json=payload).status_code == 404
+    assert client.post("/nutrition/calculate", headers=_auth_headers(token_b), json=payload).status_code == 200
+
+    bad = {"lines": [{"food_id": food_b, "grams": 0}]}
+    assert client.post("/nutrition/calculate", headers=_auth_headers(token_b), json=bad).status_code == 422
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import uuid
 from datetime import date
 from decimal import Decimal
@@ -148,20 +149,21 @@ def test_grocery_list_totals_match_recipe_ingredients_times_servings(client: Tes
     assert grocery.status_code == 200
     items = grocery.json()["items"]
 
-    # Generator uses servings=1.00 for unlocked meals.
-    # With one recipe and 28 meals/week -> total servings = 28.
-    # Factor per recipe = total_servings/recipe.servings = 28/2 = 14
-    # Total grams = item_grams * factor = 200 * 14 = 2800
+    # The optimizer picks servings per slot; with one recipe all 28 meals use it.
+    # Factor per recipe = total_servings/recipe.servings; grams = item_grams * factor.
+    total_servings = sum(Decimal(str(m["servings"])) for d in gen.json()["days"] for m in d["meals"])
+    expected_grams = (Decimal("200") * total_servings / Decimal("2")).quantize(Decimal("0.01"))
+
     rice = next(i for i in items if i["food_id"] == food_id)
     assert "item_key" in rice
     assert rice["checked"] is False
-    assert Decimal(str(rice["total_grams"])) == Decimal("2800.00")
+    assert Decimal(str(rice["total_grams"])) == expected_grams
 
     per_recipe = rice["per_recipe"]
     assert len(per_recipe) == 1
     assert per_recipe[0]["recipe_id"] == recipe_id
-    assert Decimal(str(per_recipe[0]["servings"])) == Decimal("28.00")
-    assert Decimal(str(per_recipe[0]["grams"])) == Decimal("2800.00")
+    assert Decimal(str(per_recipe[0]["servings"])) == total_servings
+    assert Decimal(str(per_recipe[0]["grams"])) == expected_grams
 
 
 def test_grocery_list_checked_state_persists_per_user_and_week(client: TestClient) -> None:
@@ -296,7 +298,7 @@ def test_locked_meals_preserved_on_regeneration(client: TestClient, monkeypatch)
     assert set(summary.keys()) == {"locked_kept", "locked_changed", "unlocked_changed"}
 
     monday = regen.json()["days"][0]
-    assert monday["id"] != day_id  # children are replaced
+    assert monday["id"] == day_id  # children are diffed in place, ids are stable
     b2 = next(m for m in monday["meals"] if m["meal_type"] == "breakfast")
     assert b2["locked"] is True
     assert b2["recipe_id"] == r2
@@ -512,3 +514,802 @@ def test_toggle_lock_endpoint_updates_meal_lock_state(client: TestClient) -> Non
     monday3 = next(d for d in unlock.json()["days"] if d["date"] == week_start)
     meal3 = next(m for m in monday3["meals"] if m["id"] == meal["id"])
     assert meal3["locked"] is False
+
+
+def test_optimizer_is_deterministic_respects_locks_and_hits_targets() -> None:
+    from app.core.planner import DayTargets, optimize_week
+
+    # (kcal, protein, carbs, fat) per serving
+    library = [
+        (400.0, 30.0, 40.0, 12.0),
+        (650.0, 45.0, 60.0, 22.0),
+        (250.0, 20.0, 20.0, 8.0),
+        (150.0, 5.0, 25.0, 3.0),
+        (800.0, 35.0, 90.0, 30.0),
+        (500.0, 40.0, 45.0, 15.0),
+    ]
+    targets = [DayTargets(kcal=2200, protein=150, carbs=230, fat=70)] * 7
+    locked = {(0, 0): (3, 2.0)}
+
+    a = optimize_week(recipe_macros=library, day_targets=targets, locked=locked, seed=123)
+    b = optimize_week(recipe_macros=library, day_targets=targets, locked=locked, seed=123)
+    assert a.assignments == b.assignments
+    assert a.assignments[0][0] == (3, 2.0)
+
+    for day in a.assignments:
+        for _, servings in day:
+            assert 0.5 <= servings <= 3.0
+            assert servings * 4 == int(servings * 4)
+    for total in a.day_totals:
+        assert abs(total[0] - 2200) / 2200 < 0.05
+
+
+def test_optimizer_result_does_not_depend_on_wall_clock(monkeypatch, caplog) -> None:
+    import itertools
+    import random
+
+    from app.core import planner
+
+    rng = random.Random(5)
+    library = [(rng.uniform(150, 900), rng.uniform(5, 60), rng.uniform(10, 100), rng.uniform(3, 40)) for _ in range(300)]
+    targets = [planner.DayTargets(kcal=2200, protein=150, carbs=230, fat=70)] * 7
+    expected = planner.optimize_week(recipe_macros=library, day_targets=targets, seed=9)
+    assert not expected.timed_out
+
+    # A loaded machine: every clock read sees 50 ms more. Only the iteration and stall
+    # limits stop the search, so the plan is the same as on an idle machine.
+    ticks = itertools.count()
+    monkeypatch.setattr(planner.time, "perf_counter", lambda: next(ticks) * 0.05)
+    slow = planner.optimize_week(recipe_macros=library, day_targets=targets, seed=9)
+    assert not slow.timed_out
+    assert slow.assignments == expected.assignments
+
+    # The guard still fires on a runaway solve, and says so.
+    with caplog.at_level("WARNING", logger="app.core.planner"):
+        guarded = planner.optimize_week(recipe_macros=library, day_targets=targets, seed=9, time_budget_s=0.0)
+    assert guarded.timed_out
+    assert all(idx >= 0 for day in guarded.assignments for idx, _ in day)
+    assert "time guard" in caplog.text
+
+
+def test_generate_fits_servings_to_target_kcal_and_training_days(client: TestClient) -> None:
+    token = _register(client, "p_optimizer@example.com")
+    food = _create_food(client, token, name="Base", kcal_100g=200, protein_100g=20, carbs_100g=20, fat_100g=5)
+
+    recipe_kcal: dict[str, Decimal] = {}
+    for name, grams in [("Small", 100), ("Medium", 250), ("Large", 400)]:
+        rid = _create_recipe(client, token, name=name, servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=grams)
+        recipe_kcal[rid] = Decimal(grams) * 2
+
+    week_start = "2026-02-16"
+    payload = {
+        "week_start": week_start,
+        "target_kcal": 2000,
+        "training_schedule": [{"date": "2026-02-18", "name": "Legs"}],
+    }
+    gen = client.post("/plans/weekly/generate", headers=_auth_headers(token), json=payload)
+    assert gen.status_code == 201
+
+    day_kcal = {
+        d["date"]: sum(recipe_kcal[m["recipe_id"]] * Decimal(str(m["servings"])) for m in d["meals"])
+        for d in gen.json()["days"]
+    }
+    for day, kcal in day_kcal.items():
+        target = Decimal("2200") if day == "2026-02-18" else Decimal("2000")
+        assert abs(kcal - target) <= target * Decimal("0.05"), (day, kcal)
+
+    # Same inputs -> same plan.
+    regen = client.post("/plans/weekly/generate", headers=_auth_headers(token), json=payload)
+    strip = lambda body: [[(m["meal_type"], m["recipe_id"], m["servings"]) for m in d["meals"]] for d in body["days"]]  # noqa: E731
+    assert strip(regen.json()) == strip(gen.json())
+
+
+def test_generate_uses_constant_statement_budget(client: TestClient, engine) -> None:
+    token = _register(client, "p_stmt_budget@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=150, protein_100g=10, carbs_100g=15, fat_100g=5)
+    for i in range(5):
+        rid = _create_recipe(client, token, name=f"R{i}", servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=100 + 50 * i)
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()).upper())
+
+    payload = {"week_start": "2026-02-16", "target_kcal": 2000}
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        resp = client.post("/plans/weekly/generate", headers=_auth_headers(token), json=payload)
+    finally:
+        sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    assert resp.status_code == 201
+    assert len(resp.json()["days"]) == 7
+    assert all(len(d["meals"]) == 4 for d in resp.json()["days"])
+
+    assert sum(s.startswith("INSERT INTO WEEKLY_PLAN_DAYS") for s in statements) == 1
+    assert sum(s.startswith("INSERT INTO WEEKLY_PLAN_MEALS") for s in statements) == 1
+    # auth, recipes, plan lookup, plan, days, meals
+    assert len(statements) <= 8, statements
+
+    fetched = client.get("/plans/weekly/2026-02-16", headers=_auth_headers(token)).json()
+    assert [d["id"] for d in fetched["days"]] == [d["id"] for d in resp.json()["days"]]
+
+
+def test_regeneration_only_rewrites_changed_meals(client: TestClient, engine) -> None:
+    token = _register(client, "p_regen_diff@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=150, protein_100g=10, carbs_100g=15, fat_100g=5)
+    for i in range(5):
+        rid = _create_recipe(client, token, name=f"R{i}", servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=100 + 50 * i)
+
+    week_start = "2026-02-16"
+    first = client.post(
+        "/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": week_start, "target_kcal": 2000}
+    ).json()
+    meal_ids = {(d["date"], m["meal_type"]): m["id"] for d in first["days"] for m in d["meals"]}
+    day_ids = [d["id"] for d in first["days"]]
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()).upper())
+
+    def _regenerate(target_kcal: int) -> dict:
+        statements.clear()
+        sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+        try:
+            resp = client.post(
+                "/plans/weekly/generate",
+                headers=_auth_headers(token),
+                json={"week_start": week_start, "target_kcal": target_kcal},
+            )
+        finally:
+            sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+        assert resp.status_code == 201
+        return resp.json()
+
+    # Same inputs -> same assignment -> nothing is written.
+    same = _regenerate(2000)
+    assert not [s for s in statements if s.startswith(("INSERT", "UPDATE", "DELETE"))], statements
+    assert same["generation_summary"]["unlocked_changed"] == 0
+
+    # New target -> changed slots are updated in place; no rows are replaced.
+    changed = _regenerate(2600)
+    writes = [s for s in statements if s.startswith(("INSERT", "UPDATE", "DELETE"))]
+    assert writes
+    assert all(s.startswith(("UPDATE WEEKLY_PLAN_MEALS", "UPDATE WEEKLY_PLANS")) for s in writes), writes
+    assert [d["id"] for d in changed["days"]] == day_ids
+    assert {(d["date"], m["meal_type"]): m["id"] for d in changed["days"] for m in d["meals"]} == meal_ids
+    assert changed["generation_summary"]["unlocked_changed"] > 0
+
+
+def test_plan_responses_include_day_and_week_totals(client: TestClient) -> None:
+    token = _register(client, "p_totals@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=150, protein_100g=10, carbs_100g=15, fat_100g=5)
+    rid = _create_recipe(client, token, name="Only", servings=1)
+    _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=200)  # 300 kcal / 20 P / 30 C / 10 F
+
+    week_start = "2026-02-16"
+    gen = client.post(
+        "/plans/weekly/generate",
+        headers=_auth_headers(token),
+        json={"week_start": week_start, "target_kcal": 2000, "macro_grams": {"protein_g": 150}},
+    )
+    assert gen.status_code == 201
+
+    def check(plan: dict) -> None:
+        week_servings = Decimal("0")
+        for day in plan["days"]:
+            servings = sum(Decimal(str(m["servings"])) for m in day["meals"])
+            week_servings += servings
+            assert Decimal(str(day["totals"]["kcal"])) == servings * 300
+            assert Decimal(str(day["totals"]["protein_g"])) == servings * 20
+            assert Decimal(str(day["totals"]["fat_g"])) == servings * 10
+            assert Decimal(str(day["deviation"]["kcal"])) == servings * 300 - 2000
+            assert Decimal(str(day["deviation"]["protein_g"])) == servings * 20 - 150
+            assert day["deviation"]["carbs_g"] is None
+        assert Decimal(str(plan["totals"]["carbs_g"])) == week_servings * 30
+        assert Decimal(str(plan["deviation"]["kcal"])) == week_servings * 300 - 7 * 2000
+
+    check(gen.json())
+
+    monday = gen.json()["days"][0]
+    meal = monday["meals"][0]
+    swapped = client.patch(
+        f"/plans/weekly/{week_start}/meals:swap",
+        headers=_auth_headers(token),
+        json={"date": week_start, "meal_type": meal["meal_type"], "new_recipe_id": rid, "lock": True},
+    )
+    assert swapped.status_code == 200
+    check(swapped.json())
+
+    toggled = client.patch(
+        f"/plans/weekly/{week_start}/meals/{meal['id']}?locked=false", headers=_auth_headers(token)
+    )
+    assert toggled.status_code == 200
+    check(toggled.json())
+
+    fetched = client.get(f"/plans/weekly/{week_start}", headers=_auth_headers(token))
+    assert fetched.status_code == 200
+    check(fetched.json())
+
+
+def test_grocery_list_is_cached_per_plan_version_with_etag(client: TestClient, monkeypatch) -> None:
+    token = _register(client, "p_grocery_cache@example.com")
+    food_id = _create_food(client, token, name="Oats")
+    recipe_id = _create_recipe(client, token, name="Porridge", servings=2)
+    _add_recipe_item(client, token, recipe_id=recipe_id, food_id=food_id, grams=100)
+
+    week_start = "2026-02-16"
+    url = f"/plans/weekly/{week_start}/grocery-list"
+    gen = client.post(
+        "/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": week_start, "target_kcal": 2000}
+    )
+    assert gen.status_code == 201
+
+    computed = 0
+    orig = plans_crud.grocery_list_for_weekly_plan
+
+    async def counting(**kwargs):
+        nonlocal computed
+        computed += 1
+        return await orig(**kwargs)
+
+    monkeypatch.setattr(plans_crud, "grocery_list_for_weekly_plan", counting)
+
+    first = client.get(url, headers=_auth_headers(token))
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    second = client.get(url, headers=_auth_headers(token))
+    assert second.json() == first.json()
+    assert second.headers["etag"] == etag
+    assert computed == 1
+
+    not_modified = client.get(url, headers={**_auth_headers(token), "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    # Checking an item changes the response (and ETag) but not the cached aggregation.
+    item_key = first.json()["items"][0]["item_key"]
+    put = client.put(
+        f"/plans/weekly/{week_start}/grocery-list/checks",
+        headers=_auth_headers(token),
+        json={"items": [{"item_key": item_key, "checked": True}]},
+    )
+    assert put.status_code == 204
+    checked = client.get(url, headers={**_auth_headers(token), "If-None-Match": etag})
+    assert checked.status_code == 200
+    assert checked.json()["items"][0]["checked"] is True
+    assert checked.headers["etag"] != etag
+    assert computed == 1
+
+    # A recipe edit bumps the plan version, so the list is recomputed.
+    items = client.get(f"/recipes/{recipe_id}", headers=_auth_headers(token)).json()["items"]
+    upd = client.patch(
+        f"/recipes/{recipe_id}/items/{items[0]['id']}", headers=_auth_headers(token), json={"grams": 300}
+    )
+    assert upd.status_code == 200
+    edited = client.get(url, headers=_auth_headers(token))
+    assert computed == 2
+    assert Decimal(str(edited.json()["items"][0]["total_grams"])) == 3 * Decimal(
+        str(first.json()["items"][0]["total_grams"])
+    )
+
+    # So do plan mutations (lock toggle here).
+    meal_id = gen.json()["days"][0]["meals"][0]["id"]
+    lock = client.patch(f"/plans/weekly/{week_start}/meals/{meal_id}?locked=true", headers=_auth_headers(token))
+    assert lock.status_code == 200
+    relocked = client.get(url, headers=_auth_headers(token))
+    assert relocked.headers["etag"] != edited.headers["etag"]
+    assert computed == 3
+
+
+def test_grocery_checks_bulk_update_is_one_statement(client: TestClient, engine) -> None:
+    token = _register(client, "p_grocery_bulk@example.com")
+    food_id = _create_food(client, token, name="Rice")
+    recipe_id = _create_recipe(client, token, name="Bowl", servings=2)
+    _add_recipe_item(client, token, recipe_id=recipe_id, food_id=food_id, grams=100)
+
+    week_start = "2026-02-16"
+    gen = client.post(
+        "/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": week_start, "target_kcal": 2000}
+    )
+    assert gen.status_code == 201
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()).upper())
+
+    def _put(items: list[dict]) -> None:
+        statements.clear()
+        sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+        try:
+            resp = client.put(
+                f"/plans/weekly/{week_start}/grocery-list/checks",
+                headers=_auth_headers(token),
+                json={"items": items},
+            )
+        finally:
+            sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+        assert resp.status_code == 204
+
+    url = f"/plans/weekly/{week_start}/grocery-list"
+    rice_key = client.get(url, headers=_auth_headers(token)).json()["items"][0]["item_key"]
+    keys = [rice_key] + [f"item {i}" for i in range(59)]
+
+    _put([{"item_key": k, "checked": True} for k in keys])
+    assert sum(s.startswith("INSERT INTO GROCERY_LIST_ITEM_CHECKS") for s in statements) == 1
+    # auth, plan existence, upsert
+    assert len(statements) <= 3, statements
+    assert client.get(url, headers=_auth_headers(token)).json()["items"][0]["checked"] is True
+
+    # Existing rows are updated in place; the last duplicate in a payload wins.
+    _put([{"item_key": rice_key, "checked": True}, {"item_key": rice_key, "checked": False}])
+    assert sum(s.startswith("INSERT INTO GROCERY_LIST_ITEM_CHECKS") for s in statements) == 1
+    assert client.get(url, headers=_auth_headers(token)).json()["items"][0]["checked"] is False
+
+    missing = client.put(
+        "/plans/weekly/2026-03-02/grocery-list/checks",
+        headers=_auth_headers(token),
+        json={"items": [{"item_key": rice_key, "checked": True}]},
+    )
+    assert missing.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_grocery_check_events_stream_snapshot_and_deltas(client: TestClient, session) -> None:
+    # TestClient buffers whole responses, so the (endless) stream is driven directly.
+    from app.models.user import User
+    from app.routes.plans import stream_grocery_list_checks
+
+    token = _register(client, "p_grocery_sse@example.com")
+    food_id = _create_food(client, token, name="Eggs")
+    recipe_id = _create_recipe(client, token, name="Omelette", servings=1)
+    _add_recipe_item(client, token, recipe_id=recipe_id, food_id=food_id, grams=100)
+
+    week_start = date(2026, 2, 16)
+    gen = client.post(
+        "/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": str(week_start), "target_kcal": 2000}
+    )
+    assert gen.status_code == 201
+    checks_url = f"/plans/weekly/{week_start}/grocery-list/checks"
+    put = client.put(checks_url, headers=_auth_headers(token), json={"items": [{"item_key": "eggs", "checked": True}]})
+    assert put.status_code == 204
+
+    missing = client.get("/plans/weekly/2026-03-02/grocery-list/checks/events", headers=_auth_headers(token))
+    assert missing.status_code == 404
+
+    user = (await session.execute(sa.select(User).where(User.email == "p_grocery_sse@example.com"))).scalar_one()
+    resp = await stream_grocery_list_checks(week_start=week_start, session=session, current_user=user)
+    assert resp.media_type == "text/event-stream"
+    events = resp.body_iterator
+
+    def parse(chunk: str) -> tuple[str, dict]:
+        event, data = chunk.strip().split("\n")
+        return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+    try:
+        assert parse(await events.__anext__()) == ("snapshot", {"items": [{"item_key": "eggs", "checked": True}]})
+
+        await plans_crud.coalesced_upsert_grocery_item_checks(
+            session=session,
+            user_id=user.id,
+            week_start=week_start,
+            items=[("eggs", False), ("milk", True)],
+        )
+        assert parse(await events.__anext__()) == (
+            "checks",
+            {"items": [{"item_key": "eggs", "checked": False}, {"item_key": "milk", "checked": True}]},
+        )
+    finally:
+        await events.aclose()
+
+
+def test_generate_range_creates_consecutive_weeks_in_one_flush(client: TestClient, engine) -> None:
+    token = _register(client, "p_range@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=150, protein_100g=10, carbs_100g=15, fat_100g=5)
+    for i in range(12):
+        rid = _create_recipe(client, token, name=f"R{i}", servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=150 + 10 * i)
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()).upper())
+
+    payload = {"week_start": "2026-02-16", "target_kcal": 2000, "weeks": 4}
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        resp = client.post("/plans/weekly/generate-range", headers=_auth_headers(token), json=payload)
+    finally:
+        sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    assert resp.status_code == 201, resp.text
+    plans = resp.json()["plans"]
+    assert [p["week_start"] for p in plans] == ["2026-02-16", "2026-02-23", "2026-03-02", "2026-03-09"]
+    assert all(len(p["days"]) == 7 and p["totals"] is not None for p in plans)
+
+    # One recipe pool for all weeks (plus one per-serving lookup for the response totals).
+    assert sum(s.startswith("SELECT RECIPES.") and "ORDER BY RECIPES.ID" in s for s in statements) == 1
+    assert sum(s.startswith("SELECT RECIPES.") for s in statements) == 2
+    for table in ("WEEKLY_PLANS", "WEEKLY_PLAN_DAYS", "WEEKLY_PLAN_MEALS"):
+        assert sum(s.startswith(f"INSERT INTO {table} ") for s in statements) == 1, table
+
+    # Each week is the same plan the single-week endpoint produces and can be read back.
+    third = client.get("/plans/weekly/2026-03-02", headers=_auth_headers(token))
+    assert third.status_code == 200
+    assert third.json()["id"] == plans[2]["id"]
+
+    # Regenerating the range diffs in place and keeps ids.
+    again = client.post("/plans/weekly/generate-range", headers=_auth_headers(token), json=payload)
+    assert [p["id"] for p in again.json()["plans"]] == [p["id"] for p in plans]
+
+    # Cross-week variety spreads recipes over the month.
+    def distinct_per_week(body: dict) -> list[set[str]]:
+        return [{m["recipe_id"] for d in p["days"] for m in d["meals"]} for p in body["plans"]]
+
+    varied = client.post(
+        "/plans/weekly/generate-range",
+        headers=_auth_headers(token),
+        json={**payload, "week_start": "2026-04-06", "cross_week_variety": True},
+    )
+    assert varied.status_code == 201
+    assert len(set().union(*distinct_per_week(varied.json()))) >= len(set().union(*distinct_per_week(resp.json())))
+
+    bad = client.post("/plans/weekly/generate-range", headers=_auth_headers(token), json={**payload, "weeks": 0})
+    assert bad.status_code == 422
+
+
+def test_optimizer_prior_uses_discourage_repeats() -> None:
+    from app.core.planner import DayTargets, optimize_week
+
+    library = [(500.0, 30.0, 50.0, 15.0)] * 40
+    targets = [DayTargets(kcal=2000)] * 7
+    fresh = optimize_week(recipe_macros=library, day_targets=targets, seed=1)
+    used = {idx for day in fresh.assignments for idx, _ in day}
+    carried = optimize_week(
+        recipe_macros=library, day_targets=targets, seed=1, prior_uses={i: 50 for i in used}
+    )
+    assert {idx for day in carried.assignments for idx, _ in day} - used
+
+
+def test_preview_writes_nothing_and_accept_commits_the_previewed_plan(client: TestClient, engine) -> None:
+    token = _register(client, "p_preview@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=150, protein_100g=10, carbs_100g=15, fat_100g=5)
+    for i in range(5):
+        rid = _create_recipe(client, token, name=f"R{i}", servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=100 + 50 * i)
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()).upper())
+
+    payload = {"week_start": "2026-02-16", "target_kcal": 2000, "macro_split_pct": {"protein_pct": 30, "carbs_pct": 40, "fat_pct": 30}}
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        first = client.post("/plans/weekly/generate/preview", headers=_auth_headers(token), json=payload)
+        second = client.post("/plans/weekly/generate/preview", headers=_auth_headers(token), json=payload)
+    finally:
+        sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    assert first.status_code == 200
+    preview = first.json()
+    assert len(preview["days"]) == 7
+    assert all(len(d["meals"]) == 4 and d["totals"]["kcal"] > 0 for d in preview["days"])
+    assert preview["totals"]["kcal"] == pytest.approx(sum(d["totals"]["kcal"] for d in preview["days"]), abs=0.1)
+    assert second.json() == preview
+
+    assert not [s for s in statements if s.startswith(("INSERT", "UPDATE", "DELETE"))]
+    # The recipe pool is loaded once and then served from the cache.
+    assert sum("FROM RECIPES" in s and "ORDER BY RECIPES.ID" in s for s in statements) == 1
+    assert client.get("/plans/weekly/2026-02-16", headers=_auth_headers(token)).status_code == 404
+
+    # Different inputs than previewed: rejected, nothing saved.
+    mismatched = client.post(
+        "/plans/weekly/generate/accept",
+        headers=_auth_headers(token),
+        json={**payload, "target_kcal": 2100, "preview_token": preview["preview_token"]},
+    )
+    assert mismatched.status_code == 409
+    assert client.get("/plans/weekly/2026-02-16", headers=_auth_headers(token)).status_code == 404
+
+    accepted = client.post(
+        "/plans/weekly/generate/accept",
+        headers=_auth_headers(token),
+        json={**payload, "preview_token": preview["preview_token"]},
+    )
+    assert accepted.status_code == 201
+    plan = accepted.json()
+
+    def meals(body: dict) -> list[tuple]:
+        return [(d["date"], m["meal_type"], m["recipe_id"], float(m["servings"])) for d in body["days"] for m in d["meals"]]
+
+    assert meals(plan) == meals(preview)
+    assert plan["totals"] == preview["totals"]
+
+    # Recipe macros changed since the preview: the cached pool is refreshed and the
+    # old preview can no longer be accepted.
+    updated = client.put(
+        f"/foods/{food}",
+        headers=_auth_headers(token),
+        json={"name": "F", "kcal_100g": 300, "protein_100g": 20, "carbs_100g": 30, "fat_100g": 10},
+    )
+    assert updated.status_code == 200
+    fresh = client.post("/plans/weekly/generate/preview", headers=_auth_headers(token), json=payload)
+    assert fresh.json()["preview_token"] != preview["preview_token"]
+    stale = client.post(
+        "/plans/weekly/generate/accept",
+        headers=_auth_headers(token),
+        json={**payload, "preview_token": preview["preview_token"]},
+    )
+    assert stale.status_code == 409
+
+
+def test_accept_on_a_loaded_worker_commits_the_previewed_plan(client: TestClient, monkeypatch) -> None:
+    import itertools
+
+    from app.core import planner
+
+    token = _register(client, "p_preview_loaded@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=150, protein_100g=10, carbs_100g=15, fat_100g=5)
+    for i in range(12):
+        rid = _create_recipe(client, token, name=f"R{i}", servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=80 + 35 * i)
+
+    payload = {"week_start": "2026-02-16", "target_kcal": 2000}
+    preview = client.post("/plans/weekly/generate/preview", headers=_auth_headers(token), json=payload).json()
+
+    # Accept lands on a busy worker: every clock read in the solver sees 50 ms more,
+    # far past the old 0.15 s deadline. The re-solve must still match the preview.
+    ticks = itertools.count()
+    monkeypatch.setattr(planner.time, "perf_counter", lambda: next(ticks) * 0.05)
+    accepted = client.post(
+        "/plans/weekly/generate/accept",
+        headers=_auth_headers(token),
+        json={**payload, "preview_token": preview["preview_token"]},
+    )
+    assert accepted.status_code == 201, accepted.text
+    assert [(m["recipe_id"], float(m["servings"])) for d in accepted.json()["days"] for m in d["meals"]] == [
+        (m["recipe_id"], float(m["servings"])) for d in preview["days"] for m in d["meals"]
+    ]
+
+
+def test_meal_edits_with_meal_view_are_targeted_updates(client: TestClient, engine) -> None:
+    token = _register(client, "p_meal_view@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=150, protein_100g=10, carbs_100g=15, fat_100g=5)
+    recipes = []
+    for i in range(3):
+        rid = _create_recipe(client, token, name=f"R{i}", servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=food, grams=100 + 50 * i)
+        recipes.append(rid)
+
+    week_start = "2026-02-16"
+    gen = client.post("/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": week_start, "target_kcal": 2000})
+    assert gen.status_code == 201
+    tuesday = gen.json()["days"][1]
+    meal = tuesday["meals"][0]
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()).upper())
+
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        lock = client.patch(
+            f"/plans/weekly/{week_start}/meals/{meal['id']}?locked=true&view=meal", headers=_auth_headers(token)
+        )
+    finally:
+        sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    assert lock.status_code == 200
+    body = lock.json()
+    assert body["meal"]["id"] == meal["id"]
+    assert body["meal"]["locked"] is True
+    assert (body["day_id"], body["date"]) == (tuesday["id"], tuesday["date"])
+    assert body["day_totals"] == tuesday["totals"]
+    # auth, meal UPDATE .. RETURNING, version bump, day totals
+    assert [s.split()[0] for s in statements].count("UPDATE") == 2
+    assert len(statements) <= 4, statements
+
+    other = next(r for r in recipes if r != meal["recipe_id"])
+    swap = client.patch(
+        f"/plans/weekly/{week_start}/meals:swap?view=meal",
+        headers=_auth_headers(token),
+        json={"date": tuesday["date"], "meal_type": meal["meal_type"], "new_recipe_id": other, "lock": False},
+    )
+    assert swap.status_code == 200
+    swapped = swap.json()
+    assert swapped["meal"]["id"] == meal["id"]
+    assert (swapped["meal"]["recipe_id"], swapped["meal"]["locked"]) == (other, False)
+
+    # The full view (default) reflects the targeted edit.
+    plan = client.get(f"/plans/weekly/{week_start}", headers=_auth_headers(token)).json()
+    assert plan["days"][1]["totals"] == swapped["day_totals"]
+    assert plan["days"][1]["meals"][0]["recipe_id"] == other
+
+    missing = client.patch(
+        f"/plans/weekly/2026-03-02/meals/{meal['id']}?locked=true&view=meal", headers=_auth_headers(token)
+    )
+    assert missing.status_code == 404
+    assert "Weekly plan not found" in missing.text
+
+
+def test_meal_alternatives_rank_by_day_fit_and_filter_by_tags(client: TestClient) -> None:
+    token = _register(client, "p_alternatives@example.com")
+    food = _create_food(client, token, name="F", kcal_100g=100, protein_100g=5, carbs_100g=15, fat_100g=2)
+    for i in range(8):
+        resp = client.post(
+            "/recipes",
+            headers=_auth_headers(token),
+            json={"name": f"R{i}", "servings": 1, "tags": ["quick"] if i % 2 else ["slow"]},
+        )
+        assert resp.status_code == 201
+        _add_recipe_item(client, token, recipe_id=resp.json()["id"], food_id=food, grams=150 + 90 * i)
+
+    week_start = "2026-02-16"
+    gen = client.post("/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": week_start, "target_kcal": 2000})
+    assert gen.status_code == 201
+    wednesday = gen.json()["days"][2]
+    meal = wednesday["meals"][1]
+    url = f"/plans/weekly/{week_start}/meals/{meal['id']}/alternatives"
+
+    resp = client.get(url, headers=_auth_headers(token), params={"limit": 5})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["date"] == wednesday["date"]
+    alternatives = body["alternatives"]
+    assert len(alternatives) == 5
+    assert meal["recipe_id"] not in {a["recipe_id"] for a in alternatives}
+    # kcal-only target: the cost is the squared kcal deviation of the day.
+    deviations = [abs(a["day_deviation"]["kcal"]) for a in alternatives]
+    assert deviations == sorted(deviations)
+
+    quick = client.get(url, headers=_auth_headers(token), params={"tags": "quick", "limit": 50}).json()["alternatives"]
+    assert quick and all(a["name"] in {"R1", "R3", "R5", "R7"} for a in quick)
+
+    # Swapping in the suggestion with its servings gives the totals it promised.
+    best = alternatives[0]
+    swap = client.patch(
+        f"/plans/weekly/{week_start}/meals:swap?view=meal",
+        headers=_auth_headers(token),
+        json={
+            "date": wednesday["date"],
+            "meal_type": meal["meal_type"],
+            "new_recipe_id": best["recipe_id"],
+            "servings": best["servings"],
+        },
+    )
+    assert swap.status_code == 200
+    assert swap.json()["day_totals"] == best["day_totals"]
+    assert swap.json()["meal"]["servings"] == best["servings"]
+
+    other = _register(client, "p_alternatives_other@example.com")
+    assert client.get(url, headers=_auth_headers(other)).status_code == 404
+    missing = client.get(f"/plans/weekly/{week_start}/meals/{uuid.uuid4()}/alternatives", headers=_auth_headers(token))
+    assert missing.status_code == 404
+
+
+def test_meal_alternatives_deviation_uses_training_day_and_macro_split_targets(client: TestClient) -> None:
+    from app.core.planner import KCAL_WEIGHT, MACRO_WEIGHT
+
+    token = _register(client, "p_alternatives_targets@example.com")
+    lean = _create_food(client, token, name="Lean", kcal_100g=120, protein_100g=20, carbs_100g=2, fat_100g=3)
+    starch = _create_food(client, token, name="Starch", kcal_100g=350, protein_100g=8, carbs_100g=75, fat_100g=2)
+    for i in range(8):
+        rid = _create_recipe(client, token, name=f"R{i}", servings=1)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=lean, grams=100 + 40 * i)
+        _add_recipe_item(client, token, recipe_id=rid, food_id=starch, grams=160 - 20 * i)
+
+    week_start = "2026-02-16"
+    split = {"protein_pct": 30, "carbs_pct": 45, "fat_pct": 25}
+    gen = client.post(
+        "/plans/weekly/generate",
+        headers=_auth_headers(token),
+        json={
+            "week_start": week_start,
+            "target_kcal": 2000,
+            "macro_split_pct": split,
+            "training_schedule": [{"date": "2026-02-18"}],
+        },
+    )
+    assert gen.status_code == 201
+    wednesday = gen.json()["days"][2]
+    url = f"/plans/weekly/{week_start}/meals/{wednesday['meals'][1]['id']}/alternatives"
+    alternatives = client.get(url, headers=_auth_headers(token), params={"limit": 7}).json()["alternatives"]
+    assert alternatives
+
+    # Training day: 2000 kcal * 1.10, with the split applied to that.
+    kcal = 2200.0
+    goals = {"kcal": kcal, "protein_g": kcal * 0.30 / 4, "carbs_g": kcal * 0.45 / 4, "fat_g": kcal * 0.25 / 9}
+    weights = {"kcal": KCAL_WEIGHT, "protein_g": MACRO_WEIGHT, "carbs_g": MACRO_WEIGHT, "fat_g": MACRO_WEIGHT}
+    for a in alternatives:
+        for key, goal in goals.items():
+            assert a["day_deviation"][key] == pytest.approx(a["day_totals"][key] - goal, abs=0.02)
+
+    # The reported deviations rank the list the way it is sorted.
+    costs = [sum(weights[k] * (a["day_deviation"][k] / goals[k]) ** 2 for k in goals) for a in alternatives]
+    assert costs == sorted(costs)
+
+
+def test_log_plan_to_diary_expands_recipes_in_set_based_inserts(client: TestClient, engine) -> None:
+    token = _register(client, "p_log_diary@example.com")
+    oats = _create_food(client, token, name="Oats", kcal_100g=380, protein_100g=13, carbs_100g=60, fat_100g=7)
+    milk = _create_food(client, token, name="Milk", kcal_100g=60, protein_100g=3, carbs_100g=5, fat_100g=3)
+    recipe_id = _create_recipe(client, token, name="Porridge", servings=3)
+    _add_recipe_item(client, token, recipe_id=recipe_id, food_id=oats, grams=100)
+    _add_recipe_item(client, token, recipe_id=recipe_id, food_id=milk, grams=250)
+
+    week_start = "2026-02-16"
+    gen = client.post("/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": week_start, "target_kcal": 2000})
+    assert gen.status_code == 201
+    wednesday = gen.json()["days"][2]
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(" ".join(statement.split()).upper())
+
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        resp = client.post(
+            f"/plans/weekly/{week_start}/log", headers=_auth_headers(token), params={"date": wednesday["date"]}
+        )
+    finally:
+        sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    assert resp.status_code == 201
+    assert resp.json() == {"week_start": week_start, "dates": [wednesday["date"]], "entries_created": 8}
+    assert sum(s.startswith("INSERT INTO DAYS") for s in statements) == 1
+    assert sum(s.startswith("INSERT INTO MEAL_ENTRIES") for s in statements) == 1
+
+    day = client.get(f"/days/{wednesday['date']}", headers=_auth_headers(token)).json()
+    for planned, logged in zip(wednesday["meals"], day["meals"]):
+        assert planned["meal_type"] == logged["meal_type"]
+        factor = Decimal(str(planned["servings"])) / 3
+        assert sorted(Decimal(str(e["grams"])) for e in logged["entries"]) == sorted(
+            (Decimal(g) * factor).quantize(Decimal("0.01")) for g in (100, 250)
+        )
+    assert abs(day["totals"]["kcal"] - wednesday["totals"]["kcal"]) < 1
+
+    # The whole week: Wednesday is already logged and is not duplicated.
+    resp = client.post(f"/plans/weekly/{week_start}/log", headers=_auth_headers(token))
+    assert resp.status_code == 201
+    assert len(resp.json()["dates"]) == 7
+    assert resp.json()["entries_created"] == 6 * 8
+    again = client.post(f"/plans/weekly/{week_start}/log", headers=_auth_headers(token))
+    assert again.json()["entries_created"] == 0
+
+    outside = client.post(f"/plans/weekly/{week_start}/log", headers=_auth_headers(token), params={"date": "2026-02-23"})
+    assert outside.status_code == 422
+    other = _register(client, "p_log_diary_other@example.com")
+    assert client.post(f"/plans/weekly/{week_start}/log", headers=_auth_headers(other)).status_code == 404
+
+
+def test_log_plan_to_diary_keeps_trace_ingredients_above_zero_grams(client: TestClient) -> None:
+    token = _register(client, "p_log_diary_trace@example.com")
+    rice = _create_food(client, token, name="Rice", kcal_100g=130, protein_100g=3, carbs_100g=28, fat_100g=0)
+    salt = _create_food(client, token, name="Salt", kcal_100g=0)
+    recipe_id = _create_recipe(client, token, name="Rice pot", servings=12)
+    _add_recipe_item(client, token, recipe_id=recipe_id, food_id=rice, grams=2400)
+    resp = client.post(
+        f"/recipes/{recipe_id}/items", headers=_auth_headers(token), json={"food_id": salt, "grams": "0.1"}
+    )
+    assert resp.status_code == 201
+
+    week_start = "2026-02-16"
+    gen = client.post("/plans/weekly/generate", headers=_auth_headers(token), json={"week_start": week_start, "target_kcal": 2000})
+    assert gen.status_code == 201
+    monday = gen.json()["days"][0]["date"]
+    # 0.1 g * 0.5 / 12 servings = 0.004 g, which rounds to 0.00.
+    swap = client.patch(
+        f"/plans/weekly/{week_start}/meals:swap",
+        headers=_auth_headers(token),
+        json={"date": monday, "meal_type": "snack", "new_recipe_id": recipe_id, "servings": "0.5"},
+    )
+    assert swap.status_code == 200
+
+    resp = client.post(f"/plans/weekly/{week_start}/log", headers=_auth_headers(token), params={"date": monday})
+    assert resp.status_code == 201
+    day = client.get(f"/days/{monday}", headers=_auth_headers(token)).json()
+    snack = next(m for m in day["meals"] if m["meal_type"] == "snack")
+    assert sorted(e["grams"] for e in snack["entries"]) == [0.01, 100.0]
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.core.pubsub import PG_MAX_PAYLOAD_BYTES, RESYNC, PubSub, bridge_payload
+
+
+@pytest.mark.anyio
+async def test_pubsub_fans_out_per_channel() -> None:
+    pubsub = PubSub()
+    async with pubsub.subscription("a") as a1, pubsub.subscription("a") as a2, pubsub.subscription("b") as b:
+        assert pubsub.publish_local("a", "hello") == 2
+        assert await a1.get() == "hello"
+        assert await a2.get() == "hello"
+        assert b._queue.empty()
+    assert pubsub.subscriber_count("a") == 0
+    assert pubsub.publish_local("a", "nobody") == 0
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_gets_resync_instead_of_blocking() -> None:
+    pubsub = PubSub()
+    async with pubsub.subscription("a") as sub:
+        for i in range(500):
+            pubsub.publish_local("a", str(i))
+        first = await sub.get()
+        assert first is RESYNC or first == "0"
+        seen = [first]
+        while not sub._queue.empty():
+            seen.append(await sub.get())
+        assert RESYNC in seen
+        assert len(seen) < 500
+
+
+def test_bridge_payload_respects_notify_limit() -> None:
+    small = bridge_payload("c", "m")
+    assert small is not None
+    assert json.loads(small) == {"c": "c", "m": "m"}
+    assert bridge_payload("c", "x" * PG_MAX_PAYLOAD_BYTES) is None
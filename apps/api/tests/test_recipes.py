@@ -7,6 +7,8 @@ from fastapi.testclient import TestClient
 
 import pytest
 
+from app.crud import recipes as crud_recipes
+
 
 def _auth_headers(token: str) -> dict[str, str]:
     return {"Authorization": f"Bearer {token}"}
@@ -315,7 +317,7 @@ def test_recipe_favorite_endpoints_and_favorites_filter(client: TestClient) -> N
 
     r = client.get("/recipes?favorites_only=true", headers=_auth_headers(token))
     assert r.status_code == 200
-    items = r.json()
+    items = r.json()["items"]
     assert len(items) == 1
     assert items[0]["id"] == rid_a
     assert items[0]["is_favorite"] is True
@@ -325,7 +327,7 @@ def test_recipe_favorite_endpoints_and_favorites_filter(client: TestClient) -> N
 
     r = client.get("/recipes?favorites_only=true", headers=_auth_headers(token))
     assert r.status_code == 200
-    assert r.json() == []
+    assert r.json()["items"] == []
 
 
 def test_recipe_tags_filter(client: TestClient) -> None:
@@ -336,7 +338,7 @@ def test_recipe_tags_filter(client: TestClient) -> None:
 
     r = client.get("/recipes?tags=quick&tags=dinner", headers=_auth_headers(token))
     assert r.status_code == 200
-    items = r.json()
+    items = r.json()["items"]
     assert len(items) == 1
     assert items[0]["id"] == rid_a
     assert set([t.lower() for t in items[0]["tags"]]) == {"quick", "dinner"}
@@ -348,3 +350,275 @@ def test_under_30_min_filter_returns_422_until_duration_supported(client: TestCl
 
     r = client.get("/recipes?under_30_min=true", headers=_auth_headers(token))
     assert r.status_code == 422
+
+
+def test_stored_macros_follow_item_and_food_changes(client: TestClient) -> None:
+    token = _register(client, "r_stored_macros@example.com")
+    food_id = _create_food(client, token, name="F", kcal_100g=100, protein_100g=10, carbs_100g=0, fat_100g=0)
+    recipe_id = _create_recipe(client, token, name="R", servings=2)
+
+    r = client.post(
+        f"/recipes/{recipe_id}/items",
+        headers=_auth_headers(token),
+        json={"food_id": food_id, "grams": 200},
+    )
+    assert r.status_code == 201
+    item_id = r.json()["id"]
+
+    body = client.get(f"/recipes/{recipe_id}", headers=_auth_headers(token)).json()
+    assert Decimal(str(body["total_macros"]["kcal"])) == Decimal("200")
+    assert Decimal(str(body["macros_per_serving"]["protein"])) == Decimal("10")
+
+    r = client.patch(f"/recipes/{recipe_id}/items/{item_id}", headers=_auth_headers(token), json={"grams": 300})
+    assert r.status_code == 200
+    body = client.get(f"/recipes/{recipe_id}", headers=_auth_headers(token)).json()
+    assert Decimal(str(body["total_macros"]["kcal"])) == Decimal("300")
+
+    # Editing the referenced food's macros updates the recipe in the same transaction.
+    r = client.put(f"/foods/{food_id}", headers=_auth_headers(token), json={"kcal_100g": 50, "protein_100g": 20})
+    assert r.status_code == 200
+    body = client.get(f"/recipes/{recipe_id}", headers=_auth_headers(token)).json()
+    assert Decimal(str(body["total_macros"]["kcal"])) == Decimal("150")
+    assert Decimal(str(body["macros_per_serving"]["protein"])) == Decimal("30")
+
+    r = client.delete(f"/recipes/{recipe_id}/items/{item_id}", headers=_auth_headers(token))
+    assert r.status_code == 204
+    body = client.get(f"/recipes/{recipe_id}", headers=_auth_headers(token)).json()
+    assert Decimal(str(body["total_macros"]["kcal"])) == Decimal("0")
+    assert Decimal(str(body["macros_per_serving"]["kcal"])) == Decimal("0")
+
+
+def test_macro_filters_and_protein_density_sort(client: TestClient) -> None:
+    token = _register(client, "r_macro_filters@example.com")
+    lean = _create_food(client, token, name="Lean", kcal_100g=100, protein_100g=25, carbs_100g=0, fat_100g=0)
+    carb = _create_food(client, token, name="Carb", kcal_100g=400, protein_100g=5, carbs_100g=90, fat_100g=0)
+    leaner = _create_food(client, token, name="Leaner", kcal_100g=100, protein_100g=30, carbs_100g=0, fat_100g=0)
+
+    def _recipe(name: str, food_id: str, grams: int) -> str:
+        rid = _create_recipe(client, token, name=name, servings=1)
+        r = client.post(
+            f"/recipes/{rid}/items",
+            headers=_auth_headers(token),
+            json={"food_id": food_id, "grams": grams},
+        )
+        assert r.status_code == 201
+        return rid
+
+    # protein/serving: 50g (200 kcal), 10g (800 kcal), 30g (100 kcal)
+    big_lean = _recipe("Big lean", lean, 200)
+    pasta = _recipe("Pasta", carb, 200)
+    small_lean = _recipe("Small lean", leaner, 100)
+
+    r = client.get("/recipes?high_protein=true", headers=_auth_headers(token))
+    assert r.status_code == 200
+    assert {i["id"] for i in r.json()["items"]} == {big_lean, small_lean}
+
+    r = client.get(
+        "/recipes",
+        headers=_auth_headers(token),
+        params={"min_protein_per_serving": 20, "max_kcal_per_serving": 150},
+    )
+    assert [i["id"] for i in r.json()["items"]] == [small_lean]
+
+    r = client.get("/recipes?sort=protein_density", headers=_auth_headers(token))
+    assert r.status_code == 200
+    assert [i["id"] for i in r.json()["items"]] == [small_lean, big_lean, pasta]
+
+    r = client.get("/recipes?sort=bogus", headers=_auth_headers(token))
+    assert r.status_code == 422
+
+
+def test_list_recipes_keyset_pagination_sorts_and_include_items(client: TestClient) -> None:
+    token = _register(client, "r_pages@example.com")
+    food_id = _create_food(client, token, name="F", kcal_100g=100, protein_100g=10, carbs_100g=0, fat_100g=0)
+
+    ids_by_name: dict[str, str] = {}
+    for name, grams in [("Delta", 100), ("Alpha", 400), ("Charlie", 300), ("Bravo", 200), ("Echo", 500)]:
+        rid = _create_recipe(client, token, name=name, servings=1)
+        r = client.post(
+            f"/recipes/{rid}/items",
+            headers=_auth_headers(token),
+            json={"food_id": food_id, "grams": grams},
+        )
+        assert r.status_code == 201
+        ids_by_name[name] = rid
+
+    def _walk(sort: str) -> list[str]:
+        seen: list[str] = []
+        cursor = None
+        while True:
+            params = {"sort": sort, "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            r = client.get("/recipes", headers=_auth_headers(token), params=params)
+            assert r.status_code == 200
+            body = r.json()
+            assert len(body["items"]) <= 2
+            seen.extend(i["name"] for i in body["items"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return seen
+
+    assert _walk("name") == ["Alpha", "Bravo", "Charlie", "Delta", "Echo"]
+    assert _walk("kcal_per_serving") == ["Delta", "Bravo", "Charlie", "Alpha", "Echo"]
+    assert _walk("protein_per_serving") == ["Echo", "Alpha", "Charlie", "Bravo", "Delta"]
+    assert sorted(_walk("created_at")) == sorted(ids_by_name)
+
+    # Items are only loaded on request.
+    r = client.get("/recipes?limit=1&sort=name", headers=_auth_headers(token))
+    assert r.json()["items"][0]["items"] is None
+    assert Decimal(str(r.json()["items"][0]["macros_per_serving"]["kcal"])) == Decimal("400")
+
+    r = client.get("/recipes?limit=1&sort=name&include=items", headers=_auth_headers(token))
+    assert [Decimal(str(i["grams"])) for i in r.json()["items"][0]["items"]] == [Decimal("400")]
+
+    r = client.get("/recipes?limit=0", headers=_auth_headers(token))
+    assert r.status_code == 422
+
+
+def test_list_recipes_without_limit_returns_everything(client: TestClient) -> None:
+    token = _register(client, "r_no_limit@example.com")
+    for i in range(60):
+        _create_recipe(client, token, name=f"R{i:02d}", servings=1)
+
+    r = client.get("/recipes", headers=_auth_headers(token))
+    assert r.status_code == 200
+    assert len(r.json()["items"]) == 60
+    assert r.json()["next_cursor"] is None
+
+
+def test_recipe_tags_are_shared_case_insensitively_and_cached(client: TestClient) -> None:
+    token = _register(client, "r_tag_upsert@example.com")
+
+    rid_a = _create_recipe(client, token, name="A", servings=1, tags=["Meal  Prep", "meal prep", "Spicy"])
+    rid_b = _create_recipe(client, token, name="B", servings=1, tags=["MEAL PREP", "spicy", "New"])
+
+    a = client.get(f"/recipes/{rid_a}", headers=_auth_headers(token)).json()
+    b = client.get(f"/recipes/{rid_b}", headers=_auth_headers(token)).json()
+    assert sorted(a["tags"]) == ["Meal Prep", "Spicy"]
+    # Existing tags are reused with their stored casing.
+    assert sorted(b["tags"]) == ["Meal Prep", "New", "Spicy"]
+
+    # Tags inserted by the (never committed) test transaction must not be cached.
+    assert not {"meal prep", "spicy", "new"} & set(crud_recipes._TAG_ID_CACHE)
+
+    r = client.patch(f"/recipes/{rid_b}", headers=_auth_headers(token), json={"tags": ["spicy"]})
+    assert r.status_code == 200
+    assert r.json()["tags"] == ["Spicy"]
+
+
+@pytest.mark.anyio
+async def test_preexisting_recipe_tags_are_cached(client: TestClient, session) -> None:
+    token = _register(client, "r_tag_cache@example.com")
+
+    # A tag committed by some earlier transaction.
+    await session.execute(sa.text("INSERT INTO recipe_tags (id, name, created_at) VALUES (9001, 'Vegan', CURRENT_TIMESTAMP)"))
+
+    rid = _create_recipe(client, token, name="A", servings=1, tags=["vegan"])
+    assert crud_recipes._TAG_ID_CACHE.get("vegan") == 9001
+
+    # Served from the cache on the next write.
+    rid_2 = _create_recipe(client, token, name="B", servings=1, tags=["VEGAN"])
+    for recipe_id in (rid, rid_2):
+        r = client.get(f"/recipes/{recipe_id}", headers=_auth_headers(token))
+        assert r.json()["tags"] == ["Vegan"]
+
+
+def test_nested_recipe_create_and_replace_items(client: TestClient, engine) -> None:
+    token = _register(client, "r_nested@example.com")
+    token_other = _register(client, "r_nested_other@example.com")
+    foods = [
+        _create_food(client, token, name=f"F{i}", kcal_100g=100, protein_100g=10, carbs_100g=0, fat_100g=0)
+        for i in range(12)
+    ]
+    foreign = _create_food(client, token_other, name="Foreign", kcal_100g=1, protein_100g=0, carbs_100g=0, fat_100g=0)
+
+    r = client.post(
+        "/recipes",
+        headers=_auth_headers(token),
+        json={"name": "Big", "servings": 2, "items": [{"food_id": f, "grams": 50} for f in foods]},
+    )
+    assert r.status_code == 201
+    body = r.json()
+    recipe_id = body["id"]
+    assert len(body["items"]) == 12
+    assert Decimal(str(body["total_macros"]["kcal"])) == Decimal("600")
+    assert Decimal(str(body["macros_per_serving"]["protein"])) == Decimal("30")
+
+    # Out-of-scope foods are rejected before anything is written.
+    r = client.post(
+        "/recipes",
+        headers=_auth_headers(token),
+        json={"name": "Bad", "servings": 1, "items": [{"food_id": foods[0], "grams": 1}, {"food_id": foreign, "grams": 1}]},
+    )
+    assert r.status_code == 404
+    names = [i["name"] for i in client.get("/recipes", headers=_auth_headers(token)).json()["items"]]
+    assert names == ["Big"]
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(statement)
+
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        r = client.put(
+            f"/recipes/{recipe_id}/items",
+            headers=_auth_headers(token),
+            json={"items": [{"food_id": f, "grams": 100} for f in foods[:3]]},
+        )
+    finally:
+        sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    assert r.status_code == 200
+    body = r.json()
+    assert sorted(i["food_id"] for i in body["items"]) == sorted(foods[:3])
+    assert Decimal(str(body["total_macros"]["kcal"])) == Decimal("300")
+    assert sum(s.lstrip().upper().startswith("INSERT INTO RECIPE_ITEMS") for s in statements) == 1
+    # auth + ownership + foods + delete + insert + macro refresh + reload + tags/favorites
+    assert len(statements) <= 12
+
+    r = client.put(
+        f"/recipes/{recipe_id}/items",
+        headers=_auth_headers(token),
+        json={"items": [{"food_id": foreign, "grams": 100}]},
+    )
+    assert r.status_code == 404
+    r = client.put(f"/recipes/{recipe_id}/items", headers=_auth_headers(token), json={"items": []})
+    assert r.status_code == 200
+    assert r.json()["items"] == []
+    assert Decimal(str(r.json()["total_macros"]["kcal"])) == Decimal("0")
+
+    r = client.put(
+        "/recipes/00000000-0000-0000-0000-000000000000/items", headers=_auth_headers(token), json={"items": []}
+    )
+    assert r.status_code == 404
+
+
+def test_recipe_list_loads_tags_and_favorites_in_one_query(client: TestClient, engine) -> None:
+    token = _register(client, "r_loader@example.com")
+    tagged = _create_recipe(client, token, name="Tagged", servings=1, tags=["b", "a"])
+    plain = _create_recipe(client, token, name="Plain", servings=1)
+    for i in range(5):
+        _create_recipe(client, token, name=f"Extra {i}", servings=1, tags=["x"])
+    assert client.post(f"/recipes/{plain}/favorite", headers=_auth_headers(token)).status_code == 204
+
+    statements: list[str] = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append(statement)
+
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", _count)
+    try:
+        r = client.get("/recipes?sort=name", headers=_auth_headers(token))
+    finally:
+        sa.event.remove(engine.sync_engine, "before_cursor_execute", _count)
+    assert r.status_code == 200
+
+    by_id = {i["id"]: i for i in r.json()["items"]}
+    assert by_id[tagged]["tags"] == ["a", "b"]
+    assert by_id[tagged]["is_favorite"] is False
+    assert by_id[plain]["tags"] == []
+    assert by_id[plain]["is_favorite"] is True
+
+    assert sum("recipe_tag_links" in s for s in statements) == 1
+    assert sum("user_recipe_favorites" in s for s in statements) == 1
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-from datetime import date
+import uuid
+from datetime import UTC, date, datetime
 
 import pytest
 from fastapi.testclient import TestClient
 
+from app.crud.targets import pick_active_user_target
+from app.models.user_target import UserTarget
+
 
 def _register_and_get_access_token(*, client: TestClient) -> str:
     r = client.post(
@@ -144,6 +148,29 @@ async def test_targets_second_null_effective_date_fails(session) -> None:
         await session.flush()
 
 
+def test_pick_active_user_target_over_preloaded_rows() -> None:
+    def target(effective_date: date | None, created_hour: int) -> UserTarget:
+        return UserTarget(
+            id=uuid.uuid4(),
+            effective_date=effective_date,
+            created_at=datetime(2026, 1, 1, created_hour, tzinfo=UTC),
+        )
+
+    default = target(None, 0)
+    january = target(date(2026, 1, 1), 1)
+    march = target(date(2026, 3, 1), 2)
+    march_again = target(date(2026, 3, 1), 3)
+    rows = [default, january, march, march_again]
+
+    assert pick_active_user_target(rows) is default
+    assert pick_active_user_target([january, march]) is march
+    assert pick_active_user_target(rows, at_date=date(2025, 12, 31)) is default
+    assert pick_active_user_target(rows, at_date=date(2026, 2, 1)) is january
+    assert pick_active_user_target(rows, at_date=date(2026, 3, 1)) is march_again
+    assert pick_active_user_target([january], at_date=date(2025, 1, 1)) is None
+    assert pick_active_user_target([]) is None
+
+
 def test_targets_validation_rejects_macro_mismatch(client: TestClient) -> None:
     token = _register_and_get_access_token(client=client)
 
@@ -162,3 +162,123 @@ def test_weight_validation_range(client: TestClient) -> None:
         json={"datetime": "2026-02-16T10:00:00Z", "weight_kg": 999},
     )
     assert high.status_code == 422
+
+
+def test_import_csv_dedupes_and_reports_invalid_rows(client: TestClient) -> None:
+    token = _register(client, "w_import_csv@example.com")
+
+    csv_body = "\n".join(
+        [
+            "Date,Weight,Notes",
+            "2026-01-01T07:00:00Z,80.1,",
+            "2026-01-02T07:00:00Z,80.0,after run",
+            "2026-01-02T07:00:00Z,80.0,same reading twice",
+            "2026-01-03T07:00:00Z,5,",
+            "not-a-date,80.0,",
+        ]
+    )
+    resp = client.post(
+        "/weights/import",
+        headers={**_auth_headers(token), "Content-Type": "text/csv"},
+        content=csv_body,
+    )
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["received"] == 5
+    assert body["inserted"] == 2
+    assert body["duplicates"] == 1
+    assert body["invalid"] == 2
+    assert [e["row"] for e in body["errors"]] == [4, 5]
+
+    items = client.get("/weights", headers=_auth_headers(token)).json()["items"]
+    assert [i["weight_kg"] for i in items] == [80.1, 80.0]
+    assert items[1]["note"] == "after run"
+
+    # Re-importing the same file is idempotent.
+    again = client.post(
+        "/weights/import",
+        headers={**_auth_headers(token), "Content-Type": "text/csv"},
+        content=csv_body,
+    )
+    assert again.status_code == 200
+    assert again.json()["inserted"] == 0
+    assert again.json()["duplicates"] == 3
+    assert len(client.get("/weights", headers=_auth_headers(token)).json()["items"]) == 2
+
+
+def test_import_csv_joins_separate_date_and_time_columns(client: TestClient) -> None:
+    token = _register(client, "w_import_date_time@example.com")
+
+    resp = client.post(
+        "/weights/import",
+        headers={**_auth_headers(token), "Content-Type": "text/csv"},
+        content="Date,Time,Weight (kg)\n2026-01-01,07:00:00Z,80.1\n2026-01-01,19:30:00Z,80.9\n",
+    )
+    assert resp.status_code == 200
+    assert resp.json()["inserted"] == 2
+
+    items = client.get("/weights", headers=_auth_headers(token)).json()["items"]
+    # SQLite drops the offset on read; compare the wall-clock part.
+    assert [(i["datetime"][:19], i["weight_kg"]) for i in items] == [
+        ("2026-01-01T07:00:00", 80.1),
+        ("2026-01-01T19:30:00", 80.9),
+    ]
+
+
+def test_import_csv_rejects_columns_mapping_to_the_same_field(client: TestClient) -> None:
+    token = _register(client, "w_import_columns@example.com")
+
+    for header in ["Datetime,Weight,Weight (kg)", "Datetime,Date,Weight", "Time,Weight"]:
+        resp = client.post(
+            "/weights/import",
+            headers={**_auth_headers(token), "Content-Type": "text/csv"},
+            content=f"{header}\n2026-01-01T07:00:00Z,80.1,80.2\n",
+        )
+        assert resp.status_code == 422, header
+
+
+def test_import_json_skips_existing_entries(client: TestClient) -> None:
+    token = _register(client, "w_import_json@example.com")
+
+    created = client.post(
+        "/weights",
+        headers=_auth_headers(token),
+        json={"datetime": "2026-02-01T08:00:00+01:00", "weight_kg": 81.0},
+    )
+    assert created.status_code == 201
+
+    resp = client.post(
+        "/weights/import",
+        headers=_auth_headers(token),
+        json={
+            "items": [
+                {"datetime": "2026-02-01T07:00:00Z", "weight_kg": 82.0},
+                {"datetime": "2026-02-02T07:00:00Z", "weight_kg": 80.5, "note": "imported"},
+            ]
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.json()["inserted"] == 1
+    assert resp.json()["duplicates"] == 1
+
+    items = client.get("/weights", headers=_auth_headers(token)).json()["items"]
+    assert [i["weight_kg"] for i in items] == [81.0, 80.5]
+
+
+def test_import_rejects_unsupported_content_type(client: TestClient) -> None:
+    token = _register(client, "w_import_type@example.com")
+
+    resp = client.post(
+        "/weights/import",
+        headers={**_auth_headers(token), "Content-Type": "text/plain"},
+        content="hello",
+    )
+    assert resp.status_code == 415
+
+
+def test_duplicate_weigh_in_datetime_returns_409(client: TestClient) -> None:
+    token = _register(client, "w_dup@example.com")
+
+    payload = {"datetime": "2026-02-16T10:00:00Z", "weight_kg": 80.0}
+    assert client.post("/weights", headers=_auth_headers(token), json=payload).status_code == 201
+    assert client.post("/weights", headers=_auth_headers(token), json=payload).status_code == 409
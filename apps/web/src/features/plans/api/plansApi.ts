@@ -13,18 +13,28 @@ export type WeeklyPlanMeal = {
   locked: boolean;
 };
 
+export type WeeklyPlanMacroTotals = {
+  kcal: number;
+  protein_g: number;
+  carbs_g: number;
+  fat_g: number;
+};
+
+// Planned minus target; a macro is null when the plan has no target for it.
+export type WeeklyPlanMacroDeviation = {
+  kcal: number;
+  protein_g: number | null;
+  carbs_g: number | null;
+  fat_g: number | null;
+};
+
 export type WeeklyPlanDay = {
   id: string;
   date: string; // YYYY-MM-DD
   meals: WeeklyPlanMeal[];
 
-  // Optional; backend may add this later.
-  totals?: {
-    kcal: number;
-    protein_g: number;
-    carbs_g: number;
-    fat_g: number;
-  } | null;
+  totals?: WeeklyPlanMacroTotals | null;
+  deviation?: WeeklyPlanMacroDeviation | null;
 };
 
 export type WeeklyPlanGenerationSummary = {
@@ -42,6 +52,9 @@ export type WeeklyPlan = {
   fat_g: number | null;
   days: WeeklyPlanDay[];
 
+  totals?: WeeklyPlanMacroTotals | null;
+  deviation?: WeeklyPlanMacroDeviation | null;
+
   generation_summary?: WeeklyPlanGenerationSummary | null;
 };
 